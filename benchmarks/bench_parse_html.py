@@ -0,0 +1,201 @@
+"""Benchmark parse_html against the previous recursive implementation.
+
+Compares output and timing on saved pages (``.html`` files or directories of
+them) and on generated pages, including a deeply nested one where the old
+per-element ``itertext()`` scan is quadratic. It also compares a new
+``multiprocessing.Pool`` per batch with the persistent parse worker pool.
+
+Usage (from the repository root):
+    python benchmarks/bench_parse_html.py [PAGE_OR_DIR ...] [--repeat N] [--batches N]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from multiprocessing import Pool
+from typing import Callable, List, Optional, Tuple
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import html5lib
+
+from src.agents.web_scraper import _extract_lines, close_parse_pool, parse_html, parse_html_async
+
+
+def legacy_extract(document) -> str:
+    """parse_html before the single-pass rewrite, minus the html5lib parse."""
+    result = []
+    seen_texts = set()
+
+    def should_skip_element(elem) -> bool:
+        if elem.tag in ['{http://www.w3.org/1999/xhtml}script',
+                        '{http://www.w3.org/1999/xhtml}style']:
+            return True
+        if not any(text.strip() for text in elem.itertext()):
+            return True
+        return False
+
+    def process_element(elem, depth=0):
+        if should_skip_element(elem):
+            return
+        if hasattr(elem, 'text') and elem.text:
+            text = elem.text.strip()
+            if text and text not in seen_texts:
+                if elem.tag == '{http://www.w3.org/1999/xhtml}a':
+                    href = None
+                    for attr, value in elem.items():
+                        if attr.endswith('href'):
+                            href = value
+                            break
+                    if href and not href.startswith(('#', 'javascript:')):
+                        link_text = f"[{text}]({href})"
+                        result.append("  " * depth + link_text)
+                        seen_texts.add(text)
+                else:
+                    result.append("  " * depth + text)
+                    seen_texts.add(text)
+        for child in elem:
+            process_element(child, depth + 1)
+        if hasattr(elem, 'tail') and elem.tail:
+            tail = elem.tail.strip()
+            if tail and tail not in seen_texts:
+                result.append("  " * depth + tail)
+                seen_texts.add(tail)
+
+    body = document.find('.//{http://www.w3.org/1999/xhtml}body')
+    if body is not None:
+        process_element(body)
+    else:
+        process_element(document)
+
+    filtered_result = []
+    for line in result:
+        if any(pattern in line.lower() for pattern in [
+            'var ', 'function()', '.js', '.css', 'google-analytics', 'disqus', '{', '}'
+        ]):
+            continue
+        filtered_result.append(line)
+    return '\n'.join(filtered_result)
+
+
+def legacy_parse_html(html_content: Optional[str]) -> str:
+    if not html_content:
+        return ""
+    try:
+        return legacy_extract(html5lib.parse(html_content))
+    except Exception:
+        return ""
+
+
+def extract(document) -> str:
+    """The current extraction step on an already parsed document."""
+    body = document.find('.//{http://www.w3.org/1999/xhtml}body')
+    lines = _extract_lines(body if body is not None else document)
+    return '\n'.join(line for line in lines
+                     if not any(pattern in line.lower()
+                                for pattern in ('var ', 'function()', '.js', '.css',
+                                                'google-analytics', 'disqus', '{', '}')))
+
+
+def generated_pages() -> List[Tuple[str, str]]:
+    """Synthetic pages covering typical and pathological shapes."""
+    paragraphs = "".join(
+        f"<p>Paragraph {i} with <a href='/page/{i}'>link {i}</a> and <b>bold {i}</b> text.</p>"
+        f"<!-- comment {i} --><script>var x{i} = {i};</script>"
+        for i in range(2000)
+    )
+    article = f"<html><head><style>p {{}}</style></head><body><article>{paragraphs}</article></body></html>"
+
+    # Text only at the leaves: the old code re-scans each chain once per level
+    depth = 400
+    chain = "<div>" * depth + "leaf {i}" + "</div>" * depth
+    nested = "<html><body>" + "".join(chain.format(i=i) for i in range(5)) + "</body></html>"
+
+    rows = "".join(f"<tr><td>{r}</td>" + "".join(f"<td>cell {r}.{c}</td>" for c in range(10)) + "</tr>"
+                   for r in range(1000))
+    table = f"<html><body><nav><a href='#top'>Top</a><a href='javascript:void(0)'>JS</a></nav><table>{rows}</table></body></html>"
+
+    empty_wrappers = ("<html><body>" + "<div><span> </span></div> orphan tail " * 500
+                      + "<p>content</p></body></html>")
+    return [("generated:article", article), ("generated:nested", nested),
+            ("generated:table", table), ("generated:empty-wrappers", empty_wrappers)]
+
+
+def saved_pages(paths: List[str]) -> List[Tuple[str, str]]:
+    pages = []
+    for path in paths:
+        files = ([os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith((".html", ".htm"))]
+                 if os.path.isdir(path) else [path])
+        for file in files:
+            with open(file, encoding="utf-8", errors="replace") as f:
+                pages.append((file, f.read()))
+    return pages
+
+
+def best_of(func: Callable, arg, repeat: int) -> float:
+    """Median wall time of ``func(arg)`` in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(arg)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def bench_pool(pages: List[str], batches: int) -> Tuple[float, float]:
+    """Seconds per batch: a new Pool per batch (old) vs the persistent parse workers."""
+    started = time.perf_counter()
+    for _ in range(batches):
+        with Pool() as pool:
+            pool.map(legacy_parse_html, pages)
+    per_call_pool = (time.perf_counter() - started) / batches
+
+    async def run_batches():
+        await parse_html_async("<p>warm up</p>")
+        started = time.perf_counter()
+        for _ in range(batches):
+            await asyncio.gather(*(parse_html_async(page) for page in pages))
+        return (time.perf_counter() - started) / batches
+
+    try:
+        persistent_pool = asyncio.run(run_batches())
+    finally:
+        close_parse_pool()
+    return per_call_pool, persistent_pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parse_html against the previous implementation.")
+    parser.add_argument("pages", nargs="*", help="Saved .html files or directories of them")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per page (default: 5)")
+    parser.add_argument("--batches", type=int, default=5, help="Batches for the worker pool comparison (default: 5)")
+    args = parser.parse_args()
+
+    pages = saved_pages(args.pages) + generated_pages()
+    print(f"{'page':<40} {'KB':>7} {'lines':>6} {'old ms':>9} {'new ms':>9} {'extract old':>12} {'extract new':>12}")
+    mismatches = 0
+    for name, content in pages:
+        old, new = legacy_parse_html(content), parse_html(content)
+        if old != new:
+            mismatches += 1
+            print(f"OUTPUT MISMATCH: {name}")
+        document = html5lib.parse(content)
+        print(f"{name[-40:]:<40} {len(content) / 1024:>7.0f} {new.count(chr(10)) + 1:>6} "
+              f"{best_of(legacy_parse_html, content, args.repeat):>9.1f} {best_of(parse_html, content, args.repeat):>9.1f} "
+              f"{best_of(legacy_extract, document, args.repeat):>12.1f} {best_of(extract, document, args.repeat):>12.1f}")
+
+    per_call_pool, persistent_pool = bench_pool([content for _, content in pages], args.batches)
+    print(f"\nBatch of {len(pages)} pages: new Pool per call {per_call_pool * 1000:.0f} ms, "
+          f"persistent workers {persistent_pool * 1000:.0f} ms")
+
+    if mismatches:
+        sys.exit(f"{mismatches} page(s) differ from the previous implementation")
+    print("Output identical on all pages")
+
+
+if __name__ == "__main__":
+    main()
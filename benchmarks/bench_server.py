@@ -0,0 +1,422 @@
+"""End-to-end benchmark of the agent server.
+
+Starts ``unified_server.app`` in-process on a local port with the
+recorded-stream mock LLM backend (``benchmarks/recordings/agent_turns.jsonl``),
+opens synthetic notebooks of 50, 500 and 5000 cells over a real WebSocket
+connection and measures for each size:
+
+- time to first token and full-turn latency of agent turns (p50/p95/p99)
+- notebook open and save latency
+- table of contents (``list_notebook_cells``) latency, cold and warm
+- search index build and ``search_notebook`` latency
+- resident memory after the notebook is loaded
+
+The mock streams as fast as possible by default, so the numbers are server
+overhead only; ``--llm-latency`` and ``--tokens-per-second`` add model pacing.
+Results are written as JSON to ``benchmarks/results/`` (ignored by git). With
+``--baseline`` they are compared against a stored run and the script exits
+non-zero if a metric got slower or bigger than the tolerance allows.
+
+Timings depend on the machine, so no baseline is committed. Record one on the
+machine that runs the comparison and keep it next to the results::
+
+    python benchmarks/bench_server.py --output benchmarks/results/baseline.json
+    python benchmarks/bench_server.py --baseline benchmarks/results/baseline.json
+
+Usage (from the repository root):
+    python benchmarks/bench_server.py [--sizes 50 500 5000] [--turns N] [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import websockets
+
+DEFAULT_RECORDINGS = os.path.join(project_root, "benchmarks", "recordings", "agent_turns.jsonl")
+RESULTS_DIR = os.path.join(project_root, "benchmarks", "results")
+
+# One prompt per recorded scenario: TOC tool, search tool, read tool, plain answer
+TURN_PROMPTS = [
+    "Give me an overview of this notebook",
+    "Where do I train the model? Search for it",
+    "Show me the first cells and explain them",
+    "How should I structure my preprocessing?",
+]
+
+FINAL_STATUSES = {"completed", "failed", "cancelled", "timed_out"}
+
+
+def synthetic_notebook(cells: int, seed: int = 0) -> Dict[str, Any]:
+    """A data-science style nbformat notebook with ``cells`` distinct cells.
+
+    Roughly a third are markdown; code cells define functions, transform data
+    and plot, and some carry stream or execute_result outputs.
+    """
+    rng = random.Random(seed)
+    topics = ["loading", "cleaning", "features", "training", "evaluation", "plots"]
+    columns = ["age", "income", "score", "region", "label", "visits", "duration"]
+    notebook_cells = []
+    for index in range(cells):
+        topic = topics[index * len(topics) // max(cells, 1)]
+        column = rng.choice(columns)
+        kind = rng.random()
+        if kind < 0.33:
+            source = (f"## Step {index}: {topic}\n\n"
+                      f"We look at `{column}` and check how it relates to the label "
+                      f"before moving on to the next {topic} step.")
+            notebook_cells.append({"cell_type": "markdown", "id": f"md-{index}", "metadata": {}, "source": source})
+            continue
+        if kind < 0.55:
+            source = (f"def {topic}_step_{index}(df, column=\"{column}\"):\n"
+                      f"    \"\"\"{topic.capitalize()} helper for {column}.\"\"\"\n"
+                      f"    values = df[column].fillna(df[column].median())\n"
+                      f"    return (values - values.mean()) / values.std()\n")
+            outputs = []
+        elif kind < 0.8:
+            source = (f"df[\"{column}_{index}\"] = df[\"{column}\"].rolling({rng.randint(2, 30)}).mean()\n"
+                      f"model = model.fit(df[features], df[\"label\"]) if {index} % 7 == 0 else model\n"
+                      f"print(df[\"{column}_{index}\"].describe())")
+            outputs = [{"output_type": "stream", "name": "stdout",
+                        "text": [f"count    {rng.randint(100, 9999)}.0\n", f"mean     {rng.random():.4f}\n"]}]
+        else:
+            source = (f"ax = df.plot.scatter(x=\"{column}\", y=\"label\", alpha=0.{rng.randint(1, 9)})\n"
+                      f"accuracy_{index} = (model.predict(df[features]) == df[\"label\"]).mean()\n"
+                      f"accuracy_{index}")
+            outputs = [{"output_type": "execute_result", "execution_count": index, "metadata": {},
+                        "data": {"text/plain": [f"{rng.random():.4f}"]}}]
+        notebook_cells.append({"cell_type": "code", "id": f"code-{index}", "metadata": {}, "source": source,
+                               "outputs": outputs, "execution_count": index if outputs else None})
+    return {"cells": notebook_cells, "metadata": {"kernelspec": {"name": "python3"}}, "nbformat": 4, "nbformat_minor": 5}
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Count, mean and nearest-rank percentiles of millisecond samples."""
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {"n": len(ordered), "mean": statistics.fmean(ordered), "p50": percentile(50),
+            "p95": percentile(95), "p99": percentile(99), "max": ordered[-1]}
+
+
+def rss_mb() -> float:
+    """Resident set size of this process in MiB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class BenchClient:
+    """WebSocket client that timestamps every server message on arrival."""
+
+    def __init__(self, uri: str):
+        self.uri = uri
+        self.messages: "asyncio.Queue[Tuple[float, Dict[str, Any]]]" = asyncio.Queue()
+
+    async def __aenter__(self) -> "BenchClient":
+        self.websocket = await websockets.connect(self.uri, max_size=None)
+        self._reader = asyncio.create_task(self._read())
+        await self.wait_for(lambda m: m.get("content") == "Connected to server", 10)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._reader.cancel()
+        await self.websocket.close()
+
+    async def _read(self) -> None:
+        async for raw in self.websocket:
+            await self.messages.put((time.perf_counter(), json.loads(raw)))
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        await self.websocket.send(json.dumps(message))
+
+    async def wait_for(self, predicate: Callable[[Dict[str, Any]], bool], timeout: float) -> Tuple[float, Dict[str, Any]]:
+        """Skip messages until one matches; returns its arrival time and the message."""
+        deadline = time.perf_counter() + timeout
+        while True:
+            received, message = await asyncio.wait_for(self.messages.get(), max(0.0, deadline - time.perf_counter()))
+            if predicate(message):
+                return received, message
+
+    def drain(self) -> None:
+        while not self.messages.empty():
+            self.messages.get_nowait()
+
+
+async def run_turn(client: BenchClient, prompt: str, timeout: float) -> Tuple[Optional[float], float, str]:
+    """Send one user_input; returns (time to first token, turn time) in ms and the final status."""
+    client.drain()
+    started = time.perf_counter()
+    await client.send({"type": "user_input", "message": prompt, "selected_cells": ""})
+    first_token = None
+    while True:
+        received, message = await client.wait_for(
+            lambda m: m.get("type") == "agent_status" or (m.get("type") == "message" and m.get("agent") == "Assistant"),
+            timeout)
+        if message.get("type") == "message":
+            if first_token is None:
+                first_token = (received - started) * 1000
+        elif message.get("status") in FINAL_STATUSES:
+            return first_token, (received - started) * 1000, message["status"]
+
+
+async def wait_for_version(server, previous: Optional[int], timeout: float = 60) -> None:
+    """Wait until the server has committed a notebook version after ``previous``."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        current = server.manager.notebook
+        if current is not None and current.version != previous:
+            return
+        if time.perf_counter() > deadline:
+            raise TimeoutError("notebook was not loaded by the server")
+        await asyncio.sleep(0.001)
+
+
+async def time_call(func, *args) -> Tuple[float, Any]:
+    started = time.perf_counter()
+    result = func(*args)
+    if asyncio.iscoroutine(result):
+        result = await result
+    return (time.perf_counter() - started) * 1000, result
+
+
+async def bench_notebook(server, uri: str, cells: int, args) -> Dict[str, Any]:
+    from src.agents import tools
+    from src.agents.search_notebook import get_search_engine
+    from src.agents.tool_registry import registry
+
+    notebook = synthetic_notebook(cells, seed=cells)
+    payload = json.dumps(notebook)
+    result: Dict[str, Any] = {"cells": cells, "payload_kb": len(payload) / 1024, "rss_before_mb": rss_mb()}
+
+    async with BenchClient(uri) as client:
+        previous = server.manager.notebook.version if server.manager.notebook is not None else None
+        started = time.perf_counter()
+        await client.send({"type": "notebook_opened", "content": payload})
+        await wait_for_version(server, previous)
+        result["open_ms"] = (time.perf_counter() - started) * 1000
+
+        save_samples = []
+        for save in range(args.saves):
+            edited = dict(notebook["cells"][save % cells], source=f"# edited {save}\n" + notebook["cells"][save % cells]["source"])
+            content = dict(notebook, cells=notebook["cells"][:save % cells] + [edited] + notebook["cells"][save % cells + 1:])
+            previous = server.manager.notebook.version
+            started = time.perf_counter()
+            await client.send({"type": "notebook_updated", "content": json.dumps(content)})
+            await wait_for_version(server, previous)
+            save_samples.append((time.perf_counter() - started) * 1000)
+        result["save_ms"] = summarize(save_samples)
+        result["rss_after_load_mb"] = rss_mb()
+
+        # Table of contents: the first call summarizes every cell, later ones hit the summary cache
+        tools._summary_cache.clear()
+        result["toc_cold_ms"], _ = await time_call(registry.call, "list_notebook_cells", {})
+        result["toc_warm_ms"] = summarize([(await time_call(registry.call, "list_notebook_cells", {}))[0]
+                                           for _ in range(args.repeat)])
+
+        try:
+            engine = get_search_engine()
+            engine._embedding_cache.clear()
+            result["index_ms"], _ = await time_call(asyncio.to_thread, engine.index_notebook, server.manager.notebook)
+            query = {"query": "train the model and evaluate accuracy", "keywords": ["fit", "accuracy"]}
+            result["search_ms"] = summarize([(await time_call(registry.call, "search_notebook", query))[0]
+                                             for _ in range(args.repeat)])
+        except Exception as e:
+            result["search_error"] = str(e)
+
+        await run_turn(client, "clear_history", args.turn_timeout)
+        ttft, turns, statuses = [], [], {}
+        for turn in range(args.turns):
+            first_token, turn_ms, status = await run_turn(client, TURN_PROMPTS[turn % len(TURN_PROMPTS)], args.turn_timeout)
+            statuses[status] = statuses.get(status, 0) + 1
+            turns.append(turn_ms)
+            if first_token is not None:
+                ttft.append(first_token)
+        result["ttft_ms"] = summarize(ttft)
+        result["turn_ms"] = summarize(turns)
+        result["turn_statuses"] = statuses
+    result["rss_after_turns_mb"] = rss_mb()
+    return result
+
+
+def flatten(metrics: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in metrics.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta: float) -> List[str]:
+    """Print latency percentiles and memory next to the baseline; returns the regressed ones.
+
+    A metric regressed if it grew by more than ``tolerance`` (a fraction) and
+    by more than ``min_delta`` in its unit (ms or MiB), which keeps sub-millisecond
+    jitter from failing the run.
+    """
+    regressions = []
+    print(f"\n{'metric':<40} {'baseline':>10} {'current':>10} {'change':>8}")
+    for size, metrics in current["sizes"].items():
+        base = flatten(baseline.get("sizes", {}).get(size, {}))
+        for name, value in flatten(metrics).items():
+            gated = ("_ms" in name or "_mb" in name) and not name.endswith((".n", ".mean", ".max"))
+            if not gated or name.startswith("rss_before") or name not in base:
+                continue
+            old = base[name]
+            change = (value - old) / old if old else 0.0
+            regressed = value > old * (1 + tolerance) and value - old > min_delta
+            marker = "  REGRESSED" if regressed else ""
+            print(f"{size + ' cells ' + name:<40} {old:>10.2f} {value:>10.2f} {change:>+8.0%}{marker}")
+            if regressed:
+                regressions.append(f"{size} cells {name}: {old:.2f} -> {value:.2f}")
+    return regressions
+
+
+async def start_server(recordings: str = DEFAULT_RECORDINGS, llm_latency: float = 0.0, tokens_per_second: float = 0.0,
+                       log_level: str = "warning", host: str = "127.0.0.1", port: Optional[int] = None):
+    """Serve the app and its request worker on the running loop with the mock LLM backend.
+
+    Returns the server module, the port and a coroutine function that stops both.
+    """
+    # Must be set before the server module is imported
+    os.environ["LLM_BACKEND"] = "mock"
+    os.environ.setdefault("WEB_SEARCH_PROVIDER", "local")
+    os.environ.setdefault("FRONTEND_BUILD_DIR", tempfile.mkdtemp(prefix="bench-frontend-"))
+
+    import uvicorn
+
+    from src.agents import unified_server
+    from src.agents.llm_backend import MockLLMBackend
+
+    logging.getLogger().setLevel(log_level.upper())
+    unified_server.agent.backend = MockLLMBackend.from_file(
+        recordings, first_token_latency=llm_latency, tokens_per_second=tokens_per_second)
+
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(unified_server.app, host=host, port=port, log_level=log_level))
+    serving = asyncio.create_task(server.serve())
+    worker = asyncio.create_task(unified_server.process_requests())
+    while not server.started:
+        if serving.done():
+            worker.cancel()
+            serving.result()
+            raise RuntimeError("server exited during startup")
+        await asyncio.sleep(0.01)
+
+    async def stop() -> None:
+        worker.cancel()
+        server.should_exit = True
+        await asyncio.gather(serving, worker, return_exceptions=True)
+
+    return unified_server, port, stop
+
+
+async def run(args) -> Dict[str, Any]:
+    unified_server, port, stop = await start_server(args.recordings, args.llm_latency, args.tokens_per_second, args.log_level)
+
+    results = {
+        "benchmark": "bench_server",
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"sizes": args.sizes, "turns": args.turns, "saves": args.saves, "repeat": args.repeat,
+                   "llm_latency": args.llm_latency, "tokens_per_second": args.tokens_per_second},
+        "sizes": {},
+    }
+    try:
+        for cells in args.sizes:
+            print(f"Benchmarking a {cells}-cell notebook...")
+            results["sizes"][str(cells)] = await bench_notebook(unified_server, f"ws://127.0.0.1:{port}/ws", cells, args)
+        results["server_metrics"] = await unified_server.metrics()
+    finally:
+        await stop()
+    return results
+
+
+def report(results: Dict[str, Any]) -> None:
+    print(f"\n{'cells':>6} {'open ms':>9} {'save p50':>9} {'toc cold':>9} {'toc p50':>8} {'index ms':>9} "
+          f"{'search p50':>11} {'ttft p50':>9} {'ttft p95':>9} {'ttft p99':>9} {'turn p50':>9} {'turn p99':>9} {'rss MiB':>8}")
+    for size, r in results["sizes"].items():
+        print(f"{size:>6} {r['open_ms']:>9.1f} {r['save_ms'].get('p50', 0):>9.1f} {r['toc_cold_ms']:>9.1f} "
+              f"{r['toc_warm_ms'].get('p50', 0):>8.1f} {r.get('index_ms', float('nan')):>9.1f} "
+              f"{r.get('search_ms', {}).get('p50', float('nan')):>11.1f} {r['ttft_ms'].get('p50', 0):>9.1f} "
+              f"{r['ttft_ms'].get('p95', 0):>9.1f} {r['ttft_ms'].get('p99', 0):>9.1f} {r['turn_ms'].get('p50', 0):>9.1f} "
+              f"{r['turn_ms'].get('p99', 0):>9.1f} {r['rss_after_turns_mb']:>8.1f}")
+        if "search_error" in r:
+            print(f"       search skipped: {r['search_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the agent server with a mock LLM.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000], help="Notebook sizes in cells (default: 50 500 5000)")
+    parser.add_argument("--turns", type=int, default=20, help="Agent turns per notebook (default: 20)")
+    parser.add_argument("--saves", type=int, default=10, help="notebook_updated saves per notebook (default: 10)")
+    parser.add_argument("--repeat", type=int, default=10, help="Warm TOC and search calls per notebook (default: 10)")
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS, help="Mock LLM recordings (JSON lines)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Mock seconds to first token (default: 0)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Mock streaming rate, 0 for unthrottled")
+    parser.add_argument("--turn-timeout", type=float, default=120.0, help="Seconds to wait for one turn (default: 120)")
+    parser.add_argument("--output", help="Where to write the JSON results (default: benchmarks/results/bench_server-<time>.json)")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (default: 0.25)")
+    parser.add_argument("--min-delta", type=float, default=2.0, help="Ignore changes smaller than this many ms/MiB (default: 2)")
+    parser.add_argument("--log-level", default="warning", help="Server log level (default: warning)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report(results)
+    if args.output is None:
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        args.output = os.path.join(RESULTS_DIR, f"bench_server-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""Multi-client WebSocket load generator for the agent server.
+
+Opens N concurrent ``/ws`` clients. Each follows a scenario: open a notebook
+(``notebook_opened``), save it repeatedly (``notebook_updated``) and ask the
+agent questions (``user_input``). One level runs per client count, and for
+each the tool reports:
+
+- messages sent and received per second
+- broadcast fan-out latency: from the server's message timestamp to arrival
+  at each client, and the spread between the first and last client to receive
+  the same broadcast
+- failed connects and dropped connections
+- server event loop lag and queue rejections, sampled from ``/metrics``
+
+By default the server runs in a child process with the mock LLM backend, so
+the clients do not share an event loop with it; ``--url`` targets a running
+server instead. Delivery latency compares the server's clock with the
+client's, so it is only meaningful when both run on the same host.
+
+Usage (from the repository root):
+    python benchmarks/load_generator.py [--clients 1 10 50 100] [--scenario student] [--output FILE]
+    python benchmarks/load_generator.py --url ws://localhost:8765/ws --clients 25 --scenario my_scenarios.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import websockets
+
+from benchmarks.bench_server import DEFAULT_RECORDINGS, TURN_PROMPTS, free_port, start_server, summarize, synthetic_notebook
+
+# Scenario fields: notebook size, number of saves and questions, and the mean
+# seconds between them; intervals vary by +/- jitter (a fraction)
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "browse": {"cells": 100, "saves": 0, "save_interval": 0.0, "questions": 0, "question_interval": 0.0, "jitter": 0.5},
+    "edit": {"cells": 200, "saves": 20, "save_interval": 0.5, "questions": 0, "question_interval": 0.0, "jitter": 0.5},
+    "student": {"cells": 200, "saves": 10, "save_interval": 1.0, "questions": 2, "question_interval": 4.0, "jitter": 0.5},
+    "heavy": {"cells": 2000, "saves": 10, "save_interval": 1.0, "questions": 3, "question_interval": 2.0, "jitter": 0.5},
+}
+
+# Distinct notebook_updated payloads pre-built per notebook size
+SAVE_VARIANTS = 5
+
+
+def load_scenarios(names: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Resolve scenario names and JSON files ({"name": {fields...}}) to (name, spec) pairs."""
+    resolved = []
+    for name in names:
+        if name in SCENARIOS:
+            resolved.append((name, SCENARIOS[name]))
+            continue
+        with open(name, encoding="utf-8") as f:
+            for custom, spec in json.load(f).items():
+                resolved.append((custom, {**SCENARIOS["student"], **spec}))
+    return resolved
+
+
+def build_payloads(cells: int) -> Tuple[str, List[str]]:
+    """Serialized notebook_opened and notebook_updated messages for a notebook size."""
+    notebook = synthetic_notebook(cells, seed=cells)
+    opened = json.dumps({"type": "notebook_opened", "content": notebook})
+    saves = []
+    for variant in range(SAVE_VARIANTS):
+        index = variant * cells // SAVE_VARIANTS
+        edited = dict(notebook["cells"][index], source=f"# save {variant}\n" + notebook["cells"][index]["source"])
+        content = dict(notebook, cells=notebook["cells"][:index] + [edited] + notebook["cells"][index + 1:])
+        saves.append(json.dumps({"type": "notebook_updated", "content": content}))
+    return opened, saves
+
+
+def fetch_json(url: str, timeout: float = 5.0) -> Dict[str, Any]:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+@dataclass
+class LevelStats:
+    """Counters shared by the clients of one level."""
+    clients: int
+    connected: int = 0
+    connect_failed: int = 0
+    dropped: int = 0
+    scripted: int = 0
+    sent: int = 0
+    sent_bytes: int = 0
+    received: int = 0
+    received_bytes: int = 0
+    delivery_ms: List[float] = field(default_factory=list)
+    # Arrival times of each distinct message, keyed by its raw text
+    arrivals: Dict[str, List[float]] = field(default_factory=dict)
+    statuses: Dict[str, set] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+
+    def record(self, raw: str, arrived: float) -> None:
+        self.received += 1
+        self.received_bytes += len(raw)
+        self.arrivals.setdefault(raw, []).append(arrived)
+        message = json.loads(raw)
+        if message.get("timestamp"):
+            sent = datetime.datetime.fromisoformat(message["timestamp"]).timestamp()
+            self.delivery_ms.append(max(0.0, (arrived - sent) * 1000))
+        if message.get("type") == "agent_status":
+            self.statuses.setdefault(message.get("status"), set()).add(message.get("request_id"))
+
+
+class LoadClient:
+    """One simulated user following a scenario."""
+
+    def __init__(self, index: int, uri: str, scenario: Dict[str, Any], payloads: Tuple[str, List[str]],
+                 level: LevelStats, stop: asyncio.Event, all_scripted: asyncio.Event, args):
+        self.index = index
+        self.uri = uri
+        self.scenario = scenario
+        self.payloads = payloads
+        self.level = level
+        self.stop = stop
+        self.all_scripted = all_scripted
+        self.args = args
+        self.random = random.Random(index)
+        self.dropped = False
+
+    def _interval(self, mean: float) -> float:
+        jitter = self.scenario.get("jitter", 0.0)
+        return max(0.0, mean * (1 + self.random.uniform(-jitter, jitter)))
+
+    def _mark_dropped(self) -> None:
+        if not self.dropped and not self.stop.is_set():
+            self.dropped = True
+            self.level.dropped += 1
+
+    async def _send(self, websocket, raw: str) -> None:
+        await websocket.send(raw)
+        self.level.sent += 1
+        self.level.sent_bytes += len(raw)
+
+    async def _read(self, websocket) -> None:
+        try:
+            async for raw in websocket:
+                self.level.record(raw, time.time())
+        except websockets.ConnectionClosed:
+            pass
+        self._mark_dropped()
+
+    async def _saves(self, websocket) -> None:
+        for save in range(self.scenario["saves"]):
+            await asyncio.sleep(self._interval(self.scenario["save_interval"]))
+            await self._send(websocket, self.payloads[1][(self.index + save) % len(self.payloads[1])])
+
+    async def _questions(self, websocket) -> None:
+        for question in range(self.scenario["questions"]):
+            await asyncio.sleep(self._interval(self.scenario["question_interval"]))
+            prompt = TURN_PROMPTS[(self.index + question) % len(TURN_PROMPTS)]
+            await self._send(websocket, json.dumps({"type": "user_input", "message": prompt, "selected_cells": ""}))
+
+    def _scripted(self) -> None:
+        self.level.scripted += 1
+        if self.level.scripted == self.level.clients:
+            self.all_scripted.set()
+
+    async def run(self) -> None:
+        await asyncio.sleep(self.index * self.args.ramp / max(1, self.level.clients))
+        try:
+            websocket = await asyncio.wait_for(websockets.connect(self.uri, max_size=None), self.args.connect_timeout)
+        except Exception as e:
+            self.level.connect_failed += 1
+            self.level.errors.append(f"client {self.index} connect: {e!r}")
+            self._scripted()
+            return
+        self.level.connected += 1
+        reader = asyncio.create_task(self._read(websocket))
+        try:
+            await self._send(websocket, self.payloads[0])
+            await asyncio.gather(self._saves(websocket), self._questions(websocket))
+        except websockets.ConnectionClosed as e:
+            self._mark_dropped()
+            self.level.errors.append(f"client {self.index} closed: {e}")
+        finally:
+            self._scripted()
+        try:
+            # Stay connected so later broadcasts still count toward fan-out
+            await self.stop.wait()
+        finally:
+            await websocket.close()
+            reader.cancel()
+
+
+async def poll_metrics(url: str, interval: float, samples: List[Dict[str, Any]], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            samples.append(await asyncio.to_thread(fetch_json, url))
+        except Exception:
+            pass  # The server may be too busy to answer; a missing sample is itself a signal
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def wait_until_idle(url: str, timeout: float) -> bool:
+    """Wait until the server has no queued or running agent requests."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            queue = (await asyncio.to_thread(fetch_json, url))["queue"]
+            if queue["pending"] == 0 and queue["running"] == 0:
+                return True
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    return False
+
+
+async def run_level(clients: int, uri: str, metrics_url: str, scenarios: List[Tuple[str, Dict[str, Any]]],
+                    payloads: Dict[int, Tuple[str, List[str]]], args) -> Dict[str, Any]:
+    level = LevelStats(clients)
+    stop, all_scripted, poll_stop = asyncio.Event(), asyncio.Event(), asyncio.Event()
+    samples: List[Dict[str, Any]] = []
+    poller = asyncio.create_task(poll_metrics(metrics_url, args.metrics_interval, samples, poll_stop))
+
+    started = time.perf_counter()
+    tasks = []
+    for index in range(clients):
+        _, scenario = scenarios[index % len(scenarios)]
+        client = LoadClient(index, uri, scenario, payloads[scenario["cells"]], level, stop, all_scripted, args)
+        tasks.append(asyncio.create_task(client.run()))
+    try:
+        await asyncio.wait_for(all_scripted.wait(), args.level_timeout)
+        idle = await wait_until_idle(metrics_url, args.drain)
+    except asyncio.TimeoutError:
+        idle = False
+        level.errors.append(f"level did not finish within {args.level_timeout:g}s")
+    # Let the last broadcasts arrive before disconnecting
+    await asyncio.sleep(0.5)
+    scripted_seconds = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    poll_stop.set()
+    await poller
+
+    spreads = [(max(times) - min(times)) * 1000 for times in level.arrivals.values() if len(times) > 1]
+    result: Dict[str, Any] = {
+        "clients": clients,
+        "connected": level.connected,
+        "connect_failed": level.connect_failed,
+        "dropped": level.dropped,
+        "seconds": scripted_seconds,
+        "drained": idle,
+        "sent": {"messages": level.sent, "per_second": level.sent / scripted_seconds, "mb": level.sent_bytes / 2 ** 20},
+        "received": {"messages": level.received, "per_second": level.received / scripted_seconds,
+                     "mb": level.received_bytes / 2 ** 20},
+        "delivery_ms": summarize(level.delivery_ms),
+        "fanout_spread_ms": summarize(spreads),
+        "turns": {status: len(ids) for status, ids in level.statuses.items() if status != "started"},
+        "errors": level.errors[:20],
+    }
+    loop_samples = [s["event_loop"] for s in samples if "event_loop" in s]
+    if loop_samples:
+        result["event_loop"] = {
+            "samples": len(loop_samples),
+            "lag_p50_ms": max(s["recent"]["p50"] for s in loop_samples),
+            "lag_p99_ms": max(s["recent"]["p99"] for s in loop_samples),
+            "lag_max_ms": max(s["recent"]["max"] for s in loop_samples),
+            "stalls": loop_samples[-1]["stalls"] - loop_samples[0]["stalls"],
+        }
+    queue_samples = [s["queue"] for s in samples if "queue" in s]
+    if queue_samples:
+        result["queue"] = {
+            "rejected": queue_samples[-1]["rejected"] - queue_samples[0]["rejected"],
+            "replaced": queue_samples[-1]["replaced"] - queue_samples[0]["replaced"],
+            "max_pending": max(q["pending"] for q in queue_samples),
+            "wait_p95_s": queue_samples[-1]["wait_time"]["p95"],
+        }
+    result["metrics_samples"] = len(samples)
+    return result
+
+
+def spawn_server(args) -> Tuple[subprocess.Popen, int]:
+    """Start the server with the mock backend in a child process and wait until it answers."""
+    port = free_port()
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+               "--recordings", args.recordings, "--llm-latency", str(args.llm_latency),
+               "--tokens-per-second", str(args.tokens_per_second), "--log-level", args.log_level]
+    process = subprocess.Popen(command, cwd=project_root)
+    deadline = time.perf_counter() + 120
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            fetch_json(f"http://127.0.0.1:{port}/health", timeout=1)
+            return process, port
+        except Exception:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("server did not start within 120s")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def serve(args) -> None:
+    """Child process mode: run the server until terminated."""
+    await start_server(args.recordings, args.llm_latency, args.tokens_per_second, args.log_level, port=args.port)
+    await asyncio.Event().wait()
+
+
+async def run(args, uri: str) -> Dict[str, Any]:
+    metrics_url = uri.replace("ws://", "http://", 1).replace("wss://", "https://", 1).rsplit("/ws", 1)[0] + "/metrics"
+    scenarios = load_scenarios(args.scenario or ["student"])
+    payloads = {}
+    for _, scenario in scenarios:
+        if scenario["cells"] not in payloads:
+            payloads[scenario["cells"]] = build_payloads(scenario["cells"])
+
+    results = {
+        "benchmark": "load_generator",
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "target": uri,
+        "scenarios": dict(scenarios),
+        "levels": [],
+    }
+    for clients in args.clients:
+        print(f"Running {clients} clients...")
+        results["levels"].append(await run_level(clients, uri, metrics_url, scenarios, payloads, args))
+        await asyncio.sleep(args.pause)
+    return results
+
+
+def report(results: Dict[str, Any]) -> None:
+    print(f"\n{'clients':>7} {'conn':>5} {'fail':>5} {'drop':>5} {'sent/s':>8} {'recv/s':>9} {'deliv p50':>10} "
+          f"{'deliv p99':>10} {'spread p99':>11} {'loop p99':>9} {'loop max':>9} {'stalls':>7} {'turns':>6} {'rejected':>9}")
+    for level in results["levels"]:
+        loop = level.get("event_loop", {})
+        print(f"{level['clients']:>7} {level['connected']:>5} {level['connect_failed']:>5} {level['dropped']:>5} "
+              f"{level['sent']['per_second']:>8.1f} {level['received']['per_second']:>9.1f} "
+              f"{level['delivery_ms'].get('p50', 0):>10.1f} {level['delivery_ms'].get('p99', 0):>10.1f} "
+              f"{level['fanout_spread_ms'].get('p99', 0):>11.1f} {loop.get('lag_p99_ms', float('nan')):>9.1f} "
+              f"{loop.get('lag_max_ms', float('nan')):>9.1f} {loop.get('stalls', 0):>7} "
+              f"{level['turns'].get('completed', 0):>6} {level.get('queue', {}).get('rejected', 0):>9}")
+        for error in level["errors"][:3]:
+            print(f"        {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent WebSocket load against the agent server.")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50, 100], help="Client counts, one level each (default: 1 10 50 100)")
+    parser.add_argument("--scenario", action="append", help=f"Scenario name ({', '.join(SCENARIOS)}) or JSON file; "
+                        "repeat to mix, clients take them in turn (default: student)")
+    parser.add_argument("--url", help="WebSocket URL of a running server; by default one is started with the mock LLM")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which clients connect (default: 2)")
+    parser.add_argument("--drain", type=float, default=60.0, help="Seconds to wait for queued agent turns after the scripts end (default: 60)")
+    parser.add_argument("--level-timeout", type=float, default=300.0, help="Upper bound on one level's scripted phase (default: 300)")
+    parser.add_argument("--connect-timeout", type=float, default=10.0, help="Seconds to wait for a connection (default: 10)")
+    parser.add_argument("--metrics-interval", type=float, default=1.0, help="Seconds between /metrics samples (default: 1)")
+    parser.add_argument("--pause", type=float, default=1.0, help="Seconds between levels (default: 1)")
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS, help="Mock LLM recordings for the started server")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mock seconds to first token (default: 0.5)")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Mock streaming rate (default: 50)")
+    parser.add_argument("--log-level", default="warning", help="Log level of the started server (default: warning)")
+    parser.add_argument("--output", help="Write the JSON results here")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(serve(args))
+        return
+
+    process = None
+    uri = args.url
+    if uri is None:
+        process, port = spawn_server(args)
+        uri = f"ws://127.0.0.1:{port}/ws"
+    try:
+        results = asyncio.run(run(args, uri))
+    finally:
+        if process is not None:
+            stop_server(process)
+    report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
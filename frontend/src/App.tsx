@@ -112,6 +112,7 @@ function App() {
           onSendMessage={handleSendMessage}
           onClearMessages={handleClearMessages}
           onRemoveCell={handleRemoveCell}
+          onCancel={() => websocketService.cancelRequest()}
         />
       </Split>
     </div>
@@ -0,0 +1,89 @@
+import React from 'react';
+import './DiffCell.css';
+import './ChangeSetCard.css';
+
+export interface ChangeSetOp {
+  type: 'update' | 'insert' | 'delete' | 'move';
+  index: number;
+  to?: number;
+  cell_type?: 'code' | 'markdown';
+  new_content?: string;
+}
+
+interface ChangeSetCardProps {
+  ops: ChangeSetOp[];
+  stale?: boolean;
+  onAccept: () => void;
+  onReject: () => void;
+}
+
+const describeOp = (op: ChangeSetOp): string => {
+  switch (op.type) {
+    case 'update':
+      return `Update cell [${op.index}] (${op.cell_type})`;
+    case 'insert':
+      return `Insert ${op.cell_type} cell at [${op.index}]`;
+    case 'delete':
+      return `Delete cell [${op.index}]`;
+    case 'move':
+      return `Move cell [${op.index}] to [${op.to}]`;
+  }
+};
+
+const ChangeSetCard: React.FC<ChangeSetCardProps> = ({ ops, stale, onAccept, onReject }) => {
+  return (
+    <div className="diff-cell change-set">
+      <div className="diff-header">
+        <div className="diff-type">
+          Change set ({ops.length} edits)
+          {stale && <span className="diff-stale" title="The notebook changed after these edits were proposed"> (outdated)</span>}
+        </div>
+        <div className="diff-actions">
+          <button className="diff-action accept" onClick={onAccept}>
+            <span className="icon">✓</span>
+            Accept
+          </button>
+          <button className="diff-action reject" onClick={onReject}>
+            <span className="icon">✕</span>
+            Reject
+          </button>
+        </div>
+      </div>
+      <ol className="change-set-ops">
+        {ops.map((op, i) => (
+          <li key={i} className={`change-set-op op-${op.type}`}>
+            <div className="change-set-op-label">{describeOp(op)}</div>
+            {op.new_content !== undefined && (
+              <pre className="diff-text diff-new">{op.new_content}</pre>
+            )}
+          </li>
+        ))}
+      </ol>
+    </div>
+  );
+};
+
+/** Apply change set operations in order, as the server validated them. */
+export const applyChangeSet = <T extends { source: string[]; cell_type: string }>(
+  cells: T[],
+  ops: ChangeSetOp[],
+  createCell: (cell_type: 'code' | 'markdown', source: string[]) => T
+): T[] => {
+  const result = [...cells];
+  ops.forEach(op => {
+    const source = op.new_content !== undefined ? [op.new_content] : [''];
+    if (op.type === 'update' && op.index < result.length) {
+      result[op.index] = { ...result[op.index], source, cell_type: op.cell_type || result[op.index].cell_type };
+    } else if (op.type === 'insert') {
+      result.splice(op.index, 0, createCell(op.cell_type || 'code', source));
+    } else if (op.type === 'delete') {
+      result.splice(op.index, 1);
+    } else if (op.type === 'move' && op.to !== undefined) {
+      const [moved] = result.splice(op.index, 1);
+      result.splice(op.to, 0, moved);
+    }
+  });
+  return result;
+};
+
+export default ChangeSetCard;
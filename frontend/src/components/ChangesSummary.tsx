@@ -3,7 +3,7 @@ import './ChangesSummary.css';
 
 interface ChangesSummaryProps {
   changes: Array<{
-    type: 'update';
+    type: 'update' | 'change_set';
     status: 'pending' | 'accepted' | 'rejected';
   }>;
   onAcceptAll: () => void;
@@ -16,7 +16,8 @@ const ChangesSummary: React.FC<ChangesSummaryProps> = ({
   onRejectAll
 }) => {
   const pendingChanges = changes.filter(c => c.status === 'pending');
-  const updateCount = pendingChanges.length;
+  const updateCount = pendingChanges.filter(c => c.type === 'update').length;
+  const changeSetCount = pendingChanges.filter(c => c.type === 'change_set').length;
 
   if (pendingChanges.length === 0) {
     return null;
@@ -30,6 +31,13 @@ const ChangesSummary: React.FC<ChangesSummaryProps> = ({
           <span className="stat-count">{updateCount}</span>
           <span className="stat-label">Modified</span>
         </div>
+        {changeSetCount > 0 && (
+          <div className="stat-item">
+            <span className="stat-icon update">☰</span>
+            <span className="stat-count">{changeSetCount}</span>
+            <span className="stat-label">Change sets</span>
+          </div>
+        )}
       </div>
       
       <div className="batch-actions">
@@ -18,6 +18,7 @@ interface ChatPanelProps {
   onSendMessage: (message: string) => void;
   onClearMessages?: () => void;
   onRemoveCell?: (index: number) => void;
+  onCancel?: () => void;
 }
 
 const ChatPanel: React.FC<ChatPanelProps> = ({
@@ -26,6 +27,7 @@ const ChatPanel: React.FC<ChatPanelProps> = ({
   onSendMessage,
   onClearMessages,
   onRemoveCell,
+  onCancel,
 }) => {
   const [inputValue, setInputValue] = useState('');
   const [loading, setLoading] = useState(false);
@@ -224,6 +226,11 @@ const ChatPanel: React.FC<ChatPanelProps> = ({
         <button onClick={handleClearHistory} className="clear-history-button">
           Clear History
         </button>
+        {onCancel && (
+          <button onClick={onCancel} className="clear-history-button" title="Stop the running request">
+            Stop
+          </button>
+        )}
       </div>
       <div className="messages-container">
         {renderMessages()}
@@ -6,6 +6,7 @@ interface DiffCellProps {
   oldCell?: ICell;
   newCell?: ICell;
   changeType: 'update';
+  stale?: boolean;
   onAccept: () => void;
   onReject: () => void;
   index: number;
@@ -15,6 +16,7 @@ const DiffCell: React.FC<DiffCellProps> = ({
   oldCell,
   newCell,
   changeType,
+  stale,
   onAccept,
   onReject,
   index,
@@ -61,7 +63,10 @@ const DiffCell: React.FC<DiffCellProps> = ({
   return (
     <div className="diff-cell diff-update">
       <div className="diff-header">
-        <div className="diff-type">Modified Cell</div>
+        <div className="diff-type">
+          Modified Cell
+          {stale && <span className="diff-stale" title="This cell changed after the change was proposed"> (outdated)</span>}
+        </div>
         <div className="diff-actions">
           <button className="diff-action accept" onClick={onAccept}>
             <span className="icon">✓</span>
@@ -2,10 +2,12 @@ import React, { useState, useRef, useEffect, forwardRef, useImperativeHandle, us
 import { v4 as uuidv4 } from 'uuid';
 import Cell from './Cell';
 import { ICell, INotebook, IOutput } from '../types/notebook';
-import { websocketService } from '../services/websocket';
+import { websocketService, CHUNKED_UPLOAD_THRESHOLD } from '../services/websocket';
+import { applyLineHunks } from '../services/cellDiff';
 import './NotebookPanel.css';
 import DiffCell from './DiffCell';
 import ChangesSummary from './ChangesSummary';
+import ChangeSetCard, { applyChangeSet } from './ChangeSetCard';
 
 interface NotebookPanelProps {
   selectcells: ICell[];
@@ -18,6 +20,10 @@ const NotebookPanel: React.FC<NotebookPanelProps> = ({selectcells, setselectcell
   const [isDirty, setIsDirty] = useState(false);
   const [proposedChanges, setProposedChanges] = useState<any[]>([]);
   const [metadata, setMetadata] = useState(null);
+  const [uploadProgress, setUploadProgress] = useState<number | null>(null);
+  // Latest cells for the message handler, which is not re-created on every edit
+  const cellsRef = useRef<ICell[]>(cells);
+  cellsRef.current = cells;
 
 
   // Handle keyboard shortcuts
@@ -63,14 +69,48 @@ const NotebookPanel: React.FC<NotebookPanelProps> = ({selectcells, setselectcell
         } catch (error) {
           console.error('Error processing file change:', error);
         }
+      } else if (message.type === 'propose_changes' && message.change_set_id) {
+        // Multi-cell edits are accepted or rejected together
+        const changeSet = {
+          id: message.change_set_id,
+          type: 'change_set',
+          ops: message.changes,
+          status: 'pending' as 'pending' | 'accepted' | 'rejected'
+        };
+        setProposedChanges(prev => [...prev.filter(change => change.id !== changeSet.id), changeSet]);
       } else if (message.type === 'propose_changes') {
         // Transform the changes to include IDs and status
-        const changesWithIds = message.changes.map((change: any) => ({
+        const changesWithIds = message.changes.map((change: any) => {
+          if (change.hunks) {
+            // Rebuild the full content from hunks against our copy of the cell
+            const baseCell = cellsRef.current[change.index];
+            try {
+              const { hunks, ...rest } = change;
+              return { ...rest, new_content: applyLineHunks(baseCell ? baseCell.source.join('') : '', hunks) };
+            } catch (error) {
+              console.warn(`Cannot apply change ${change.id} locally, requesting full content:`, error);
+              websocketService.send({ type: 'request_change_content', changeId: change.id });
+              return null;
+            }
+          }
+          return change;
+        }).filter((change: any) => change !== null).map((change: any) => ({
           ...change,
-          id: uuidv4(),
+          id: change.id || uuidv4(),
           status: 'pending' as 'pending' | 'accepted' | 'rejected'
         }));
-        setProposedChanges(prev => [...prev, ...changesWithIds]);
+        const incomingIds = new Set(changesWithIds.map((change: any) => change.id));
+        setProposedChanges(prev => [...prev.filter(change => !incomingIds.has(change.id)), ...changesWithIds]);
+      } else if (message.type === 'proposals_stale') {
+        // The cell these changes were based on has been edited since
+        const staleIds = new Set<string>(message.ids);
+        setProposedChanges(prev => prev.map(change =>
+          staleIds.has(change.id) ? { ...change, stale: true } : change
+        ));
+      } else if (message.type === 'upload_progress') {
+        setUploadProgress(message.total ? Math.round(100 * message.received / message.total) : null);
+      } else if (message.type === 'upload_complete' || message.type === 'upload_error') {
+        setUploadProgress(null);
       }
     };
 
@@ -150,12 +190,17 @@ const NotebookPanel: React.FC<NotebookPanelProps> = ({selectcells, setselectcell
       }
 
       // Send the notebook content to the backend with the file path
-      await websocketService.send({
-        type: 'notebook_opened',
-        path: fileHandle.name,
-        content: JSON.stringify(notebook),
-        timestamp: new Date().toISOString()
-      });
+      if (text.length > CHUNKED_UPLOAD_THRESHOLD) {
+        setUploadProgress(0);
+        await websocketService.uploadNotebook(fileHandle.name, text, 'notebook_opened');
+      } else {
+        await websocketService.send({
+          type: 'notebook_opened',
+          path: fileHandle.name,
+          content: text,
+          timestamp: new Date().toISOString()
+        });
+      }
       
       // Include outputs when extracting cell data
       const notebookWithIds = notebook.cells.map((cell: any) => {
@@ -345,6 +390,16 @@ const NotebookPanel: React.FC<NotebookPanelProps> = ({selectcells, setselectcell
       console.log('Changes to Apply:', changesToApply);
 
       changesToApply.forEach(change => {
+        if (change.type === 'change_set') {
+          const applied = applyChangeSet(updatedCells, change.ops, (cell_type, source): ICell => ({
+            id: uuidv4(),
+            cell_type,
+            source,
+            outputs: []
+          }));
+          updatedCells.splice(0, updatedCells.length, ...applied);
+          return;
+        }
         const targetIndex = change.index;
         
         // Only handle update type
@@ -456,6 +511,9 @@ const NotebookPanel: React.FC<NotebookPanelProps> = ({selectcells, setselectcell
           <button onClick={handleFileOpen} className="toolbar-button">
             Open
           </button>
+          {uploadProgress !== null && (
+            <span className="upload-progress">Uploading notebook… {uploadProgress}%</span>
+          )}
         </div>
 
         {proposedChanges.length > 0 && (
@@ -466,6 +524,18 @@ const NotebookPanel: React.FC<NotebookPanelProps> = ({selectcells, setselectcell
           />
         )}
 
+        {proposedChanges
+          .filter(change => change.type === 'change_set' && change.status === 'pending')
+          .map(changeSet => (
+            <ChangeSetCard
+              key={changeSet.id}
+              ops={changeSet.ops}
+              stale={changeSet.stale}
+              onAccept={() => handleAcceptChange(changeSet.id)}
+              onReject={() => handleRejectChange(changeSet.id)}
+            />
+          ))}
+
         <div className="notebook-content">
           {cells.map((cell, index) => {
             const pendingChange = proposedChanges.find(
@@ -488,6 +558,7 @@ const NotebookPanel: React.FC<NotebookPanelProps> = ({selectcells, setselectcell
                   }}
                   index={index}
                   changeType="update"
+                  stale={pendingChange.stale}
                   onAccept={() => handleAcceptChange(pendingChange.id)}
                   onReject={() => handleRejectChange(pendingChange.id)}
                 />
@@ -0,0 +1,32 @@
+export interface LineHunk {
+  start: number;
+  old: string[];
+  new: string[];
+}
+
+// Split on "\n" only, keeping line endings (mirrors split_lines on the server)
+export function splitLines(text: string): string[] {
+  const lines = text.split('\n');
+  const result = lines.slice(0, -1).map(line => line + '\n');
+  if (lines[lines.length - 1]) {
+    result.push(lines[lines.length - 1]);
+  }
+  return result;
+}
+
+/**
+ * Rebuild the proposed cell content from line hunks against the base cell.
+ * Throws if the base text does not match the lines a hunk expects to replace.
+ */
+export function applyLineHunks(base: string, hunks: LineHunk[]): string {
+  const lines = splitLines(base);
+  const ordered = [...hunks].sort((a, b) => b.start - a.start);
+  for (const hunk of ordered) {
+    const current = lines.slice(hunk.start, hunk.start + hunk.old.length);
+    if (current.length !== hunk.old.length || current.some((line, i) => line !== hunk.old[i])) {
+      throw new Error(`Hunk at line ${hunk.start} does not match the base cell`);
+    }
+    lines.splice(hunk.start, hunk.old.length, ...hunk.new);
+  }
+  return lines.join('');
+}
@@ -1,6 +1,13 @@
 import { ICell } from '../types/notebook';
 
-type MessageType = 'message' | 'notebook_update' | 'user_input' | 'start_processing' | 'save_notebook';
+type MessageType = 'message' | 'notebook_update' | 'user_input' | 'start_processing' | 'save_notebook' | 'cancel'
+  | 'notebook_upload_start' | 'notebook_upload_end';
+
+// Notebooks larger than this are sent as compressed binary chunks
+export const CHUNKED_UPLOAD_THRESHOLD = 1024 * 1024;
+const UPLOAD_CHUNK_SIZE = 256 * 1024;
+// Pause sending while this much data is still buffered in the socket
+const MAX_BUFFERED_AMOUNT = 4 * 1024 * 1024;
 
 interface Message {
   type: MessageType;
@@ -192,6 +199,61 @@ export class WebSocketService {
     }
   }
 
+  cancelRequest() {
+    this.send({
+      type: 'cancel',
+      timestamp: new Date().toISOString()
+    });
+  }
+
+  /**
+   * Upload a notebook as gzip-compressed binary chunks. The server parses it
+   * while it arrives and answers with upload_progress / upload_complete messages.
+   */
+  async uploadNotebook(path: string, content: string, event: 'notebook_opened' | 'notebook_updated' = 'notebook_opened') {
+    if (this.ws?.readyState !== WebSocket.OPEN) {
+      console.error('WebSocket is not connected');
+      return;
+    }
+
+    let payload: Uint8Array = new TextEncoder().encode(content);
+    let compression = 'none';
+    const CompressionStreamCtor = (window as any).CompressionStream;
+    if (CompressionStreamCtor) {
+      const stream = new Blob([payload]).stream().pipeThrough(new CompressionStreamCtor('gzip'));
+      payload = new Uint8Array(await new Response(stream).arrayBuffer());
+      compression = 'gzip';
+    }
+
+    const uploadId = `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    this.send({
+      type: 'notebook_upload_start',
+      upload_id: uploadId,
+      path,
+      event,
+      size: payload.byteLength,
+      compression,
+      timestamp: new Date().toISOString()
+    });
+
+    for (let offset = 0; offset < payload.byteLength; offset += UPLOAD_CHUNK_SIZE) {
+      while (this.ws && this.ws.bufferedAmount > MAX_BUFFERED_AMOUNT) {
+        await new Promise(resolve => setTimeout(resolve, 20));
+      }
+      if (this.ws?.readyState !== WebSocket.OPEN) {
+        console.error('WebSocket closed during notebook upload');
+        return;
+      }
+      this.ws.send(payload.subarray(offset, offset + UPLOAD_CHUNK_SIZE));
+    }
+
+    this.send({
+      type: 'notebook_upload_end',
+      upload_id: uploadId,
+      timestamp: new Date().toISOString()
+    });
+  }
+
   startProcessing(filename: string) {
     this.send({
       type: 'start_processing',
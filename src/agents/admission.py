@@ -0,0 +1,298 @@
+"""Admission control and priority scheduling for queued user requests."""
+
+import asyncio
+import hashlib
+import itertools
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lower values are scheduled first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+# Messages that are cheap to serve and should not wait behind agent runs
+CONTROL_COMMANDS = {"clear_history"}
+
+
+@dataclass
+class QueuedRequest:
+    """A user request waiting for (or being served by) the agent."""
+    session_id: str
+    payload: Dict[str, Any]
+    priority: int
+    sequence: int
+    fingerprint: str
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    cancelled: bool = False
+
+    @property
+    def sort_key(self):
+        return (self.priority, self.sequence)
+
+
+@dataclass
+class AdmissionResult:
+    """Outcome of submitting a request to the admission controller."""
+    status: str  # "queued", "coalesced", "replaced" or "rejected"
+    request: Optional[QueuedRequest] = None
+    position: Optional[int] = None
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Identify duplicate requests by their message and selected cells."""
+    digest = hashlib.sha1()
+    digest.update(payload.get("message", "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(payload.get("selected_cells", "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class AdmissionController:
+    """Bounded, priority-ordered queue in front of the agent.
+
+    - At most ``max_pending`` requests wait at any time; further ones are rejected.
+    - Each session may have at most ``max_per_session`` requests running at once.
+    - Resending a request identical to one that is pending or running is
+      coalesced into the existing one.
+    - A different request from the same session replaces its stale pending one
+      and keeps its place in the queue.
+    """
+
+    def __init__(
+        self,
+        max_pending: int = 32,
+        max_per_session: int = 1,
+        notify: Optional[Callable[[str, str], Awaitable[None]]] = None,
+        metrics_window: int = 500,
+    ):
+        """Initialize the controller.
+
+        Args:
+            max_pending: Maximum number of requests waiting in the queue
+            max_per_session: Maximum number of concurrently running requests per session
+            notify: Optional coroutine ``notify(session_id, text)`` used for queue feedback
+            metrics_window: Number of recent wait times kept for percentiles
+        """
+        self.max_pending = max_pending
+        self.max_per_session = max_per_session
+        self.notify = notify
+        self._pending: List[QueuedRequest] = []
+        self._active: Dict[str, int] = {}
+        self._running: Dict[str, QueuedRequest] = {}
+        self._sequence = itertools.count()
+        self._condition = asyncio.Condition()
+        self._wait_times: Deque[float] = deque(maxlen=metrics_window)
+        self._run_times: Deque[float] = deque(maxlen=metrics_window)
+        self._counters = {
+            "submitted": 0,
+            "queued": 0,
+            "coalesced": 0,
+            "replaced": 0,
+            "rejected": 0,
+            "cancelled": 0,
+            "completed": 0,
+        }
+
+    def _ordered_pending(self) -> List[QueuedRequest]:
+        return sorted(self._pending, key=lambda r: r.sort_key)
+
+    def position(self, request: QueuedRequest) -> Optional[int]:
+        """1-based position of a pending request, or None if it is not pending."""
+        for index, pending in enumerate(self._ordered_pending(), 1):
+            if pending is request:
+                return index
+        return None
+
+    def _pending_for_session(self, session_id: str) -> Optional[QueuedRequest]:
+        for request in self._pending:
+            if request.session_id == session_id:
+                return request
+        return None
+
+    def _running_duplicate(self, session_id: str, fingerprint: str) -> Optional[QueuedRequest]:
+        for request in self._running.values():
+            if request.session_id == session_id and request.fingerprint == fingerprint:
+                return request
+        return None
+
+    async def submit(self, session_id: str, payload: Dict[str, Any]) -> AdmissionResult:
+        """Admit a request from a session into the queue."""
+        fingerprint = request_fingerprint(payload)
+        priority = PRIORITY_HIGH if payload.get("message", "").lower() in CONTROL_COMMANDS else PRIORITY_NORMAL
+
+        async with self._condition:
+            self._counters["submitted"] += 1
+            existing = self._pending_for_session(session_id)
+            running = self._running_duplicate(session_id, fingerprint)
+
+            if existing is not None and existing.fingerprint == fingerprint:
+                self._counters["coalesced"] += 1
+                logger.info(f"Coalesced duplicate request from session {session_id}")
+                result = AdmissionResult("coalesced", existing, self.position(existing))
+            elif running is not None:
+                self._counters["coalesced"] += 1
+                logger.info(f"Coalesced duplicate of running request {running.request_id} from session {session_id}")
+                result = AdmissionResult("coalesced", running)
+            elif existing is not None:
+                # The newer request supersedes the stale one but keeps its place
+                self._pending.remove(existing)
+                request = QueuedRequest(
+                    session_id=session_id,
+                    payload=payload,
+                    priority=min(priority, existing.priority),
+                    sequence=existing.sequence,
+                    fingerprint=fingerprint,
+                    enqueued_at=existing.enqueued_at,
+                )
+                self._pending.append(request)
+                self._counters["replaced"] += 1
+                logger.info(f"Replaced stale request {existing.request_id} from session {session_id}")
+                result = AdmissionResult("replaced", request, self.position(request))
+            elif len(self._pending) >= self.max_pending:
+                self._counters["rejected"] += 1
+                logger.warning(f"Queue full ({self.max_pending}), rejecting request from session {session_id}")
+                result = AdmissionResult("rejected")
+            else:
+                request = QueuedRequest(
+                    session_id=session_id,
+                    payload=payload,
+                    priority=priority,
+                    sequence=next(self._sequence),
+                    fingerprint=fingerprint,
+                )
+                self._pending.append(request)
+                self._counters["queued"] += 1
+                result = AdmissionResult("queued", request, self.position(request))
+
+            self._condition.notify_all()
+
+        await self._notify_result(session_id, result)
+        if result.status in ("queued", "replaced"):
+            await self._broadcast_positions(exclude=session_id)
+        return result
+
+    def _next_eligible(self) -> Optional[QueuedRequest]:
+        for request in self._ordered_pending():
+            if self._active.get(request.session_id, 0) < self.max_per_session:
+                return request
+        return None
+
+    async def get(self) -> QueuedRequest:
+        """Wait for and remove the next request that may run now."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._next_eligible() is not None)
+            request = self._next_eligible()
+            self._pending.remove(request)
+            request.started_at = time.monotonic()
+            self._active[request.session_id] = self._active.get(request.session_id, 0) + 1
+            self._running[request.request_id] = request
+            self._wait_times.append(request.started_at - request.enqueued_at)
+
+        await self._broadcast_positions()
+        return request
+
+    async def complete(self, request: QueuedRequest) -> None:
+        """Mark a request returned by ``get`` as finished."""
+        async with self._condition:
+            if self._running.pop(request.request_id, None) is None:
+                return
+            remaining = self._active.get(request.session_id, 1) - 1
+            if remaining > 0:
+                self._active[request.session_id] = remaining
+            else:
+                self._active.pop(request.session_id, None)
+            if request.started_at is not None:
+                self._run_times.append(time.monotonic() - request.started_at)
+            self._counters["completed"] += 1
+            self._condition.notify_all()
+
+    async def cancel_session(self, session_id: str) -> int:
+        """Drop all pending requests of a session. Returns how many were dropped."""
+        async with self._condition:
+            dropped = [r for r in self._pending if r.session_id == session_id]
+            for request in dropped:
+                self._pending.remove(request)
+            self._counters["cancelled"] += len(dropped)
+            self._condition.notify_all()
+        if dropped:
+            logger.info(f"Cancelled {len(dropped)} pending request(s) from session {session_id}")
+            await self._broadcast_positions()
+        return len(dropped)
+
+    async def _notify_result(self, session_id: str, result: AdmissionResult):
+        if self.notify is None:
+            return
+        if result.status == "rejected":
+            text = "The server is busy. Please try again in a moment."
+        elif result.status == "coalesced" and result.position is None:
+            text = "This request is already being processed."
+        elif result.status == "coalesced":
+            text = f"This request is already queued (position {result.position})."
+        elif result.status == "replaced":
+            text = f"Replaced your earlier pending request (position {result.position} of {len(self._pending)})."
+        elif result.position and result.position > 1 or self._running:
+            text = f"Your request is queued (position {result.position} of {len(self._pending)})."
+        else:
+            return
+        await self._safe_notify(session_id, text)
+
+    async def _broadcast_positions(self, exclude: Optional[str] = None):
+        """Tell every waiting session where its request currently stands."""
+        if self.notify is None:
+            return
+        ordered = self._ordered_pending()
+        for position, request in enumerate(ordered, 1):
+            if request.session_id == exclude:
+                continue
+            await self._safe_notify(
+                request.session_id,
+                f"Your request is queued (position {position} of {len(ordered)})."
+            )
+
+    async def _safe_notify(self, session_id: str, text: str):
+        try:
+            await self.notify(session_id, text)
+        except Exception as e:
+            logger.error(f"Error sending queue feedback to session {session_id}: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of queue counters and wait-time statistics (seconds)."""
+        wait_times = list(self._wait_times)
+        run_times = list(self._run_times)
+        now = time.monotonic()
+        return {
+            **self._counters,
+            "pending": len(self._pending),
+            "running": len(self._running),
+            "max_pending": self.max_pending,
+            "max_per_session": self.max_per_session,
+            "oldest_pending_age": max((now - r.enqueued_at for r in self._pending), default=0.0),
+            "wait_time": {
+                "count": len(wait_times),
+                "mean": sum(wait_times) / len(wait_times) if wait_times else 0.0,
+                "p50": _percentile(wait_times, 50),
+                "p95": _percentile(wait_times, 95),
+                "max": max(wait_times, default=0.0),
+            },
+            "run_time": {
+                "count": len(run_times),
+                "mean": sum(run_times) / len(run_times) if run_times else 0.0,
+                "p95": _percentile(run_times, 95),
+            },
+        }
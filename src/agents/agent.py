@@ -2,20 +2,21 @@ from src.agents.prompt import SYSTEM_MESSAGE_PLANNER, SYSTEM_MESSAGE_EDITOR, GEN
 from src.agents.tools import tools, call_function
 import asyncio
 from src.agents.utils import broadcast_message
-from openai import OpenAI
+from src.agents.result_store import get_result_store
+from src.agents.tool_registry import registry as tool_registry
+from src.agents.llm_backend import LLMBackend, get_llm_backend
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
 
-client = OpenAI()
-
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class Agent:
-    def __init__(self):
+    def __init__(self, backend: Optional[LLMBackend] = None):
         self.message_history = []
+        self.backend = backend or get_llm_backend()
 
     def clear_history(self):
         """Clear the message history and reset to initial state"""
@@ -65,66 +66,12 @@ class Agent:
 
         logger.info(f"Whole Messages: %s", json.dumps(messages, indent=2))
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
+        assistant_message = await self._stream_completion(
+            messages,
             tools=tools,
             tool_choice="auto",
-            stream=True
         )
 
-        assistant_message = {"role": "assistant", "content": ""}
-        
-        # Process the streaming response
-        for chunk in response:
-            delta = chunk.choices[0].delta
-            
-            # Handle content chunks
-            if delta.content:
-                content = delta.content
-                assistant_message["content"] += content
-                await broadcast_message("Assistant", content)
-                await asyncio.sleep(0)
-                
-            # Handle tool calls
-            elif hasattr(delta, 'tool_calls') and delta.tool_calls:
-                if "tool_calls" not in assistant_message:
-                    assistant_message["tool_calls"] = []
-                
-                for tool_call in delta.tool_calls:
-                    tool_call_index = tool_call.index
-                    
-                    # Initialize or update tool call
-                    while len(assistant_message["tool_calls"]) <= tool_call_index:
-                        assistant_message["tool_calls"].append({
-                            "id": "",
-                            "type": "function",
-                            "function": {"name": "", "arguments": ""}
-                        })
-                    
-                    current_call = assistant_message["tool_calls"][tool_call_index]
-                    
-                    # Update ID if present
-                    if hasattr(tool_call, 'id') and tool_call.id is not None:
-                        current_call["id"] = tool_call.id
-                    
-                    # Update function information if present
-                    if hasattr(tool_call, 'function'):
-                        if hasattr(tool_call.function, 'name') and tool_call.function.name is not None:
-                            current_call["function"]["name"] = tool_call.function.name
-                        if hasattr(tool_call.function, 'arguments') and tool_call.function.arguments is not None:
-                            current_call["function"]["arguments"] += tool_call.function.arguments
-
-        # Clean up any remaining null values before appending
-        if "tool_calls" in assistant_message:
-            for call in assistant_message["tool_calls"]:
-                if not call["id"]:
-                    call["id"] = ""
-                if not call["function"]["name"]:
-                    call["function"]["name"] = ""
-                if not call["function"]["arguments"]:
-                    call["function"]["arguments"] = "{}"
-
         # Log the message structure before appending
         logger.info("Debug - Assistant response: %s", json.dumps(assistant_message, indent=2))
         messages.append(assistant_message)
@@ -142,6 +89,9 @@ class Agent:
                     await broadcast_message("Assistant", f"\n\n🔧 {tool_message}\n\n")
                     
                     tool_result = await call_function(name, args)
+                    if tool_registry.spills(name):
+                        # Large results are stored server-side; the model gets a preview and a handle
+                        tool_result = get_result_store().spill(name, str(tool_result))
                     await asyncio.sleep(0)
                 except Exception as e:
                     error_message = f"Error calling tool {name}: {str(e)}"
@@ -163,81 +113,104 @@ class Agent:
 
 
             if counter >= 10:
-                response_2 = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=messages,
+                await broadcast_message("Assistant", "\n\nThis is the last response from the assistant. The user has reached the maximum number of responses.\n\n")
+                logger.info("Reached maximum number of responses")
+                assistant_message = await self._stream_completion(
+                    messages,
                     tools=tools,
                     tool_choice="auto" if counter < 9 else "none",
-                    stream=True
                 )
-
-                await broadcast_message("Assistant", "\n\nThis is the last response from the assistant. The user has reached the maximum number of responses.\n\n")
-                logger.info("Reached maximum number of responses")
             else:
-                response_2 = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=messages,
+                assistant_message = await self._stream_completion(
+                    messages,
                     tools=tools,
                     tool_choice="auto",
                     parallel_tool_calls=False,
-                    stream=True
                 )
 
+            # Log the message structure before appending
+            logger.info("Debug - Assistant response: %s", json.dumps(assistant_message, indent=2))
+            messages.append(assistant_message)
+            tool_calls = assistant_message.get("tool_calls", [])
+            counter += 1
+
+        # After processing all tool calls and getting final response
+        # Update message history with the complete conversation, with this
+        # turn's large tool results shortened so later prompts stay bounded
+        self.message_history = [self._compact(message) for message in messages]
+        #await broadcast_message("System", "process_query_complete")
+        logger.info("Agent: Completion message sent")
+        return
+
+    @staticmethod
+    def _compact(message: Dict[str, Any]) -> Dict[str, Any]:
+        """Tool message with its content compacted for the history; other messages unchanged."""
+        if message.get("role") != "tool":
+            return message
+        content = get_result_store().compact(message.get("name", ""), message.get("content", ""))
+        return message if content is message.get("content") else {**message, "content": content}
+
+    async def _stream_completion(self, messages: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        """Stream one completion, broadcasting content as it arrives.
+
+        The stream is closed in all cases, so cancelling the surrounding task
+        aborts the HTTP request instead of leaving it to run to completion.
+        """
+        response = await self.backend.stream(messages, **kwargs)
+
+        assistant_message = {"role": "assistant", "content": ""}
+
+        try:
             # Process the streaming response
-            assistant_message = {"role": "assistant", "content": ""}
-            
-            for chunk in response_2:
+            async for chunk in response:
                 delta = chunk.choices[0].delta
-                
+
+                # Handle content chunks
                 if delta.content:
                     content = delta.content
                     assistant_message["content"] += content
                     await broadcast_message("Assistant", content)
                     await asyncio.sleep(0)
-                    
+
+                # Handle tool calls
                 elif hasattr(delta, 'tool_calls') and delta.tool_calls:
                     if "tool_calls" not in assistant_message:
                         assistant_message["tool_calls"] = []
-                    
+
                     for tool_call in delta.tool_calls:
                         tool_call_index = tool_call.index
-                        
+
+                        # Initialize or update tool call
                         while len(assistant_message["tool_calls"]) <= tool_call_index:
                             assistant_message["tool_calls"].append({
                                 "id": "",
                                 "type": "function",
                                 "function": {"name": "", "arguments": ""}
                             })
-                        
+
                         current_call = assistant_message["tool_calls"][tool_call_index]
-                        
+
+                        # Update ID if present
                         if hasattr(tool_call, 'id') and tool_call.id is not None:
                             current_call["id"] = tool_call.id
-                        
+
+                        # Update function information if present
                         if hasattr(tool_call, 'function'):
                             if hasattr(tool_call.function, 'name') and tool_call.function.name is not None:
                                 current_call["function"]["name"] = tool_call.function.name
                             if hasattr(tool_call.function, 'arguments') and tool_call.function.arguments is not None:
                                 current_call["function"]["arguments"] += tool_call.function.arguments
+        finally:
+            await response.close()
 
-            if "tool_calls" in assistant_message:
-                for call in assistant_message["tool_calls"]:
-                    if not call["id"]:
-                        call["id"] = ""
-                    if not call["function"]["name"]:
-                        call["function"]["name"] = ""
-                    if not call["function"]["arguments"]:
-                        call["function"]["arguments"] = "{}"
-
-            # Log the message structure before appending
-            logger.info("Debug - Assistant response: %s", json.dumps(assistant_message, indent=2))
-            messages.append(assistant_message)
-            tool_calls = assistant_message.get("tool_calls", [])
-            counter += 1
+        # Clean up any remaining null values before appending
+        if "tool_calls" in assistant_message:
+            for call in assistant_message["tool_calls"]:
+                if not call["id"]:
+                    call["id"] = ""
+                if not call["function"]["name"]:
+                    call["function"]["name"] = ""
+                if not call["function"]["arguments"]:
+                    call["function"]["arguments"] = "{}"
 
-        # After processing all tool calls and getting final response
-        # Update message history with the complete conversation
-        self.message_history = messages.copy()
-        #await broadcast_message("System", "process_query_complete")
-        logger.info("Agent: Completion message sent")
-        return
+        return assistant_message
@@ -0,0 +1,201 @@
+"""Content-addressed on-disk store for notebook cell outputs.
+
+The agent tools only read cell sources, so outputs (plots, tracebacks, long
+text) are moved out of the in-memory notebook into files named by the SHA-256
+of their canonical JSON. Identical outputs are written once and shared across
+notebooks and versions; in memory each output is replaced by a small reference.
+The ``get_cell_outputs`` tool reads them back when the agent needs them.
+
+The store is capped at ``BLOB_STORE_MAX_BYTES``: once it grows past the cap,
+the least recently used blobs are deleted until it is back under the cap.
+Reading or re-storing a blob marks it as used.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Outputs whose serialized form is at most this many bytes stay inline
+INLINE_OUTPUT_LIMIT = 256
+
+# Total size of stored blobs before the least recently used ones are evicted
+BLOB_STORE_MAX_BYTES = int(os.getenv("BLOB_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+BLOB_REF_KEY = "blob"
+
+
+class BlobStore:
+    """Write-once blob storage keyed by SHA-256 digest, evicting least recently used blobs."""
+
+    def __init__(self, root: str, max_bytes: int = BLOB_STORE_MAX_BYTES):
+        """Initialize the store.
+
+        Args:
+            root: Directory that holds the blobs; created if missing
+            max_bytes: Total blob size above which least recently used blobs are deleted
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # put() runs in worker threads; guards the size accounting and eviction
+        self._lock = threading.Lock()
+        self.stats = {"puts": 0, "dedup_hits": 0, "bytes_written": 0, "gets": 0, "missing": 0,
+                      "evicted": 0, "bytes_evicted": 0, "bytes_stored": self._scan_size()}
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:]
+
+    def _blobs(self):
+        for path in self.root.glob("??/*"):
+            if not path.name.startswith(".tmp-"):
+                yield path
+
+    def _scan_size(self) -> int:
+        total = 0
+        for path in self._blobs():
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        """Mark a blob as recently used."""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` and return its digest. Existing blobs are not rewritten."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        self.stats["puts"] += 1
+        if path.exists():
+            self.stats["dedup_hits"] += 1
+            self._touch(path)
+            return digest
+
+        path.parent.mkdir(exist_ok=True)
+        # Write to a temporary file first so readers never see partial blobs
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self.stats["bytes_written"] += len(data)
+            self.stats["bytes_stored"] += len(data)
+            if self.stats["bytes_stored"] > self.max_bytes:
+                self._evict()
+        return digest
+
+    def _evict(self) -> None:
+        """Delete least recently used blobs until the store is under its cap."""
+        entries = []
+        for path in self._blobs():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort(key=lambda entry: entry[0])
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.stats["evicted"] += 1
+            self.stats["bytes_evicted"] += size
+        self.stats["bytes_stored"] = total
+        logger.info(f"Blob store over {self.max_bytes} bytes; evicted down to {total} bytes")
+
+    def get(self, digest: str) -> bytes:
+        """Read a blob by digest. Raises FileNotFoundError if it was evicted."""
+        self.stats["gets"] += 1
+        path = self._path(digest)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            self.stats["missing"] += 1
+            raise
+        self._touch(path)
+        return data
+
+    def get_json(self, digest: str) -> Any:
+        return json.loads(self.get(digest))
+
+
+def externalize_outputs(cell: Dict[str, Any], store: "BlobStore") -> Dict[str, Any]:
+    """Replace a cell's large outputs with blob references, in place.
+
+    A reference keeps ``output_type`` so code inspecting outputs still sees
+    what kind of output it was.
+    """
+    outputs = cell.get("outputs")
+    if not outputs:
+        return cell
+
+    externalized = []
+    for output in outputs:
+        if not isinstance(output, dict) or BLOB_REF_KEY in output:
+            externalized.append(output)
+            continue
+        data = json.dumps(output, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        if len(data) <= INLINE_OUTPUT_LIMIT:
+            externalized.append(output)
+            continue
+        externalized.append({
+            "output_type": output.get("output_type", "unknown"),
+            BLOB_REF_KEY: store.put(data),
+            "size": len(data),
+        })
+    cell["outputs"] = externalized
+    return cell
+
+
+def rehydrate_outputs(cell: Dict[str, Any], store: "BlobStore") -> Dict[str, Any]:
+    """Return a copy of ``cell`` with blob references replaced by the stored outputs.
+
+    References to evicted blobs are kept as they are.
+    """
+    outputs = cell.get("outputs")
+    if not outputs:
+        return dict(cell)
+    rehydrated = []
+    for output in outputs:
+        if isinstance(output, dict) and BLOB_REF_KEY in output:
+            try:
+                output = store.get_json(output[BLOB_REF_KEY])
+            except FileNotFoundError:
+                logger.warning(f"Output blob {output[BLOB_REF_KEY]} is no longer stored")
+        rehydrated.append(output)
+    return {**cell, "outputs": rehydrated}
+
+
+_blob_store: Optional[BlobStore] = None
+
+def get_blob_store() -> BlobStore:
+    """Get or create the global blob store instance."""
+    global _blob_store
+    if _blob_store is None:
+        root = os.getenv("BLOB_STORE_DIR", os.path.join("uploads", "blobs"))
+        _blob_store = BlobStore(root)
+        logger.info(f"Blob store at {_blob_store.root.resolve()}")
+    return _blob_store
@@ -0,0 +1,222 @@
+"""Long-lived headless Chromium shared by the scraping and screenshot tools.
+
+Launching Chromium takes one to two seconds, often more than the fetch itself,
+so the browser is started once and kept for the life of the server. Pages are
+handed out from a small set of reusable browser contexts with bounded
+concurrency; a context is recycled after ``pages_per_context`` pages or as soon
+as one of its pages crashes, and the browser is relaunched if it disconnects.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from playwright.async_api import async_playwright
+
+logger = logging.getLogger(__name__)
+
+# Maximum pages open at once (also the maximum number of contexts)
+DEFAULT_MAX_PAGES = int(os.getenv("BROWSER_POOL_SIZE", "4"))
+
+# Pages served by one context before it is closed and replaced
+DEFAULT_PAGES_PER_CONTEXT = int(os.getenv("BROWSER_CONTEXT_MAX_PAGES", "50"))
+
+# Error messages meaning the page, context or browser is gone
+_DEAD_TARGET_ERRORS = ("Target closed", "Target page, context or browser has been closed",
+                       "Browser has been closed", "browser has disconnected", "Page crashed")
+
+
+class _PooledContext:
+    """A browser context with the number of pages it has served."""
+
+    __slots__ = ("context", "browser", "pages_served", "broken")
+
+    def __init__(self, context, browser):
+        self.context = context
+        self.browser = browser
+        self.pages_served = 0
+        self.broken = False
+
+
+class BrowserPool:
+    """Shared Chromium instance with a bounded pool of reusable contexts."""
+
+    def __init__(
+        self,
+        max_pages: int = DEFAULT_MAX_PAGES,
+        pages_per_context: int = DEFAULT_PAGES_PER_CONTEXT,
+        launch_options: Optional[Dict[str, Any]] = None,
+        context_options: Optional[Dict[str, Any]] = None,
+    ):
+        """Initialize the pool. The browser is launched on first use.
+
+        Args:
+            max_pages: Maximum number of pages open at the same time
+            pages_per_context: Pages served by a context before it is recycled
+            launch_options: Keyword arguments for ``chromium.launch``
+            context_options: Keyword arguments for ``browser.new_context``
+        """
+        self.max_pages = max_pages
+        self.pages_per_context = pages_per_context
+        self.launch_options = {"headless": True, **(launch_options or {})}
+        self.context_options = context_options or {}
+        self._playwright = None
+        self._browser = None
+        self._idle: List[_PooledContext] = []
+        self._semaphore = asyncio.Semaphore(max_pages)
+        self._lock = asyncio.Lock()
+        self._closed = False
+        self._in_use = 0
+        self._waiting = 0
+        self.stats = {
+            "launches": 0,
+            "disconnects": 0,
+            "contexts_created": 0,
+            "contexts_recycled": 0,
+            "pages_served": 0,
+            "page_crashes": 0,
+            "launch_seconds": 0.0,
+        }
+
+    async def _ensure_browser(self):
+        async with self._lock:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._browser is not None:
+                # Browser died: its contexts are unusable
+                self._idle.clear()
+            started = time.perf_counter()
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(**self.launch_options)
+            self._browser.on("disconnected", self._on_disconnected)
+            elapsed = time.perf_counter() - started
+            self.stats["launches"] += 1
+            self.stats["launch_seconds"] += elapsed
+            logger.info(f"Launched Chromium for the browser pool in {elapsed:.2f}s")
+            return self._browser
+
+    def _on_disconnected(self, browser) -> None:
+        if not self._closed:
+            self.stats["disconnects"] += 1
+            logger.warning("Pooled browser disconnected; it will be relaunched on next use")
+
+    async def _acquire_context(self) -> _PooledContext:
+        browser = await self._ensure_browser()
+        while self._idle:
+            pooled = self._idle.pop()
+            if pooled.browser is browser and not pooled.broken:
+                return pooled
+        context = await browser.new_context(**self.context_options)
+        self.stats["contexts_created"] += 1
+        return _PooledContext(context, browser)
+
+    async def _release_context(self, pooled: _PooledContext) -> None:
+        pooled.pages_served += 1
+        if (pooled.broken or self._closed or pooled.pages_served >= self.pages_per_context
+                or not pooled.browser.is_connected()):
+            self.stats["contexts_recycled"] += 1
+            try:
+                await pooled.context.close()
+            except Exception as e:
+                logger.debug(f"Error closing recycled browser context: {e}")
+            return
+        self._idle.append(pooled)
+
+    @asynccontextmanager
+    async def page(self, viewport: Optional[Dict[str, int]] = None) -> AsyncIterator[Any]:
+        """Borrow a fresh page; it is closed and its context returned on exit.
+
+        Args:
+            viewport: Optional ``{"width": ..., "height": ...}`` for the page
+        """
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_use += 1
+        pooled = None
+        page = None
+        try:
+            pooled = await self._acquire_context()
+            page = await pooled.context.new_page()
+            page.on("crash", lambda _: self._mark_crashed(pooled))
+            if viewport:
+                await page.set_viewport_size(viewport)
+            try:
+                yield page
+            except Exception as e:
+                if any(marker in str(e) for marker in _DEAD_TARGET_ERRORS):
+                    pooled.broken = True
+                raise
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    if pooled is not None:
+                        pooled.broken = True
+                self.stats["pages_served"] += 1
+            if pooled is not None:
+                await self._release_context(pooled)
+            self._in_use -= 1
+            self._semaphore.release()
+
+    def _mark_crashed(self, pooled: _PooledContext) -> None:
+        pooled.broken = True
+        self.stats["page_crashes"] += 1
+        logger.warning("Browser page crashed; recycling its context")
+
+    async def close(self) -> None:
+        """Close all contexts, the browser and Playwright."""
+        async with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            for pooled in idle:
+                try:
+                    await pooled.context.close()
+                except Exception:
+                    pass
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception as e:
+                    logger.debug(f"Error closing pooled browser: {e}")
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+        logger.info("Browser pool closed")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "connected": self._browser is not None and self._browser.is_connected(),
+            "max_pages": self.max_pages,
+            "pages_in_use": self._in_use,
+            "waiting": self._waiting,
+            "idle_contexts": len(self._idle),
+        }
+
+
+_browser_pool: Optional[BrowserPool] = None
+
+def get_browser_pool() -> BrowserPool:
+    """Get or create the global browser pool instance."""
+    global _browser_pool
+    if _browser_pool is None or _browser_pool._closed:
+        _browser_pool = BrowserPool()
+    return _browser_pool
+
+async def close_browser_pool() -> None:
+    """Close the global browser pool if it was created."""
+    global _browser_pool
+    if _browser_pool is not None:
+        pool, _browser_pool = _browser_pool, None
+        await pool.close()
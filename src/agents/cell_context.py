@@ -0,0 +1,336 @@
+"""Token-budgeted retrieval of notebook cells for the agent.
+
+Instead of a fixed number of cells, a request names cell ranges and a token
+budget. Cells are returned whole while they fit; a cell that does not fit is
+shortened with the requested truncation policy, and whatever is left is
+reported through a cursor the agent can pass back to continue. A cursor can
+point into a shortened cell, so the next page continues with its omitted lines.
+Cell tags and notes count against the budget.
+"""
+
+import ast
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from src.agents.notebook_model import Cell, Notebook
+from src.agents.utils import CHARS_PER_TOKEN, estimate_tokens
+
+DEFAULT_TOKEN_BUDGET = 4000
+MAX_TOKEN_BUDGET = 32000
+
+# Do not start another cell with less budget than this left
+MIN_CELL_TOKENS = 64
+
+TRUNCATION_POLICIES = ("full", "head_tail", "signatures")
+
+_SIGNATURE_LINE = re.compile(r"^\s*(?:async\s+def|def|class|import|from\s+\S+\s+import|@)\b")
+
+
+class RetrievalError(ValueError):
+    """Raised for malformed ranges, policies or cursors."""
+
+
+@dataclass
+class RetrievalPage:
+    text: str
+    returned: List[int] = field(default_factory=list)
+    truncated: List[int] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    tokens: int = 0
+
+
+def parse_ranges(spec: str, cell_count: int) -> List[int]:
+    """Expand a range spec like "0-5,8,10-" into cell indices, in order and without duplicates.
+
+    An empty spec or "all" selects every cell; "10-" runs to the last cell.
+    """
+    spec = (spec or "").strip()
+    if not spec or spec.lower() == "all":
+        return list(range(cell_count))
+
+    indices: List[int] = []
+    seen = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = re.fullmatch(r"(\d*)\s*-\s*(\d*)|(\d+)", part)
+        if match is None or part == "-":
+            raise RetrievalError(f"Invalid range {part!r}; use forms like '3', '0-5' or '10-'")
+        if match.group(3) is not None:
+            start = end = int(match.group(3))
+        else:
+            start = int(match.group(1)) if match.group(1) else 0
+            end = int(match.group(2)) if match.group(2) else cell_count - 1
+        if start > end:
+            raise RetrievalError(f"Invalid range {part!r}: start is after end")
+        for index in range(start, min(end, cell_count - 1) + 1):
+            if index not in seen:
+                seen.add(index)
+                indices.append(index)
+    return indices
+
+
+# Lines [start, stop) of a shortened cell that a page did not show
+LineSpan = Tuple[int, int]
+
+
+def encode_cursor(version: int, position: int, lines: Optional[LineSpan] = None) -> str:
+    if lines is not None:
+        return f"{version}:{position}:{lines[0]}-{lines[1]}"
+    return f"{version}:{position}"
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int, Optional[LineSpan]]:
+    """Split a cursor into notebook version, position in the request and the omitted lines, if any."""
+    match = re.fullmatch(r"(\d+):(\d+)(?::(\d+)-(\d+))?", cursor.strip())
+    if match is None:
+        raise RetrievalError(f"Invalid cursor {cursor!r}")
+    version, position = int(match.group(1)), int(match.group(2))
+    if match.group(3) is None:
+        return version, position, None
+    start, stop = int(match.group(3)), int(match.group(4))
+    if start >= stop:
+        raise RetrievalError(f"Invalid cursor {cursor!r}")
+    return version, position, (start, stop)
+
+
+def head_tail(text: str, max_tokens: int) -> str:
+    """Keep the first and last lines of ``text`` within ``max_tokens``."""
+    return _head_tail(text, max_tokens)[0]
+
+
+def _head_tail(text: str, max_tokens: int) -> Tuple[str, Optional[LineSpan]]:
+    """``head_tail`` plus the span of lines it omitted, if any."""
+    lines = text.splitlines()
+    if estimate_tokens(text) <= max_tokens:
+        return text, None
+    # Characters, less room for the omission marker
+    budget = max_tokens * CHARS_PER_TOKEN - 32
+    head: List[str] = []
+    tail: List[str] = []
+    used = 0
+    # Alternate head and tail, giving the head two lines for every tail line
+    i, j = 0, len(lines) - 1
+    turn = 0
+    while i <= j:
+        take_head = turn % 3 != 2
+        line = lines[i] if take_head else lines[j]
+        if used + len(line) + 1 > budget:
+            break
+        used += len(line) + 1
+        if take_head:
+            head.append(line)
+            i += 1
+        else:
+            tail.append(line)
+            j -= 1
+        turn += 1
+    omitted = j - i + 1
+    if not head and not tail:
+        # A single very long line
+        half = max(1, budget // 2)
+        return f"{text[:half]}\n... [{len(text) - 2 * half} characters omitted] ...\n{text[-half:]}", None
+    return "\n".join(head + [f"... [{omitted} lines omitted] ..."] + tail[::-1]), (i, j + 1)
+
+
+def _lines_from(lines: List[str], start: int, stop: int, max_tokens: int) -> Tuple[str, int]:
+    """As many of lines ``start`` to ``stop`` as fit in ``max_tokens``. Returns (text, end line)."""
+    budget = max_tokens * CHARS_PER_TOKEN
+    used = 0
+    end = start
+    while end < stop and used + len(lines[end]) + 1 <= budget:
+        used += len(lines[end]) + 1
+        end += 1
+    if end == start:
+        # A single line longer than the budget
+        return head_tail(lines[start], max_tokens), start + 1
+    return "\n".join(lines[start:end]), end
+
+
+def code_signatures(source: str) -> str:
+    """Imports, class and function signatures with the first docstring line, and top-level names."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        # Notebook magics or partial code: fall back to matching lines
+        return "\n".join(line for line in source.splitlines() if _SIGNATURE_LINE.match(line))
+
+    lines = source.splitlines()
+    out: List[str] = []
+    assigned = set()
+
+    def header(node: ast.AST, indent: str) -> None:
+        for decorator in getattr(node, "decorator_list", []):
+            out.append(indent + "@" + ast.unparse(decorator))
+        # The signature may span several lines; take them up to the body
+        first, last = node.lineno - 1, node.body[0].lineno - 1
+        if last == first:
+            # One-line body: cut the line where the body starts
+            signature = lines[first].encode("utf-8")[:node.body[0].col_offset].decode("utf-8", "ignore").strip()
+        else:
+            signature = " ".join(line.strip() for line in lines[first:last])
+        out.append(indent + signature)
+        docstring = ast.get_docstring(node)
+        if docstring:
+            out.append(f'{indent}    """{docstring.strip().splitlines()[0]}"""')
+
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            out.append(ast.unparse(node))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            header(node, "")
+            out.append("    ...")
+        elif isinstance(node, ast.ClassDef):
+            header(node, "")
+            methods = [child for child in node.body if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            for method in methods:
+                header(method, "    ")
+                out.append("        ...")
+            if not methods:
+                out.append("    ...")
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            line = " = ".join(ast.unparse(target) for target in targets) + " = ..."
+            if line not in assigned:
+                assigned.add(line)
+                out.append(line)
+    return "\n".join(out)
+
+
+def render_cell(index: int, cell: Cell, body: str, note: str = "") -> str:
+    attributes = f' cell="{index}"' + (f' note="{note}"' if note else "")
+    return f"<{cell.cell_type}{attributes}>\n{body}\n</{cell.cell_type}>"
+
+
+def _shorten(cell: Cell, text: str, policy: str, max_tokens: int) -> Tuple[str, str, Optional[LineSpan]]:
+    """Shorten a cell body to ``max_tokens`` with ``policy``.
+
+    Returns (body, note, omitted): the lines of ``text`` left out between the
+    head and tail of the body, or None if the body is not made of them.
+    """
+    if policy == "signatures" and cell.cell_type == "code":
+        signatures = code_signatures(text)
+        if signatures and estimate_tokens(signatures) <= max_tokens:
+            return signatures, f"signatures only, {cell.line_count} lines", None
+        if signatures:
+            return head_tail(signatures, max_tokens), f"truncated, {cell.line_count} lines", None
+    body, omitted = _head_tail(text, max_tokens)
+    return body, f"truncated, {cell.line_count} lines", omitted
+
+
+def _cursor_note(index: int, resume: Optional[LineSpan], more: int, cursor: str) -> str:
+    if resume is not None:
+        following = f", followed by {more} more requested cell(s)" if more else ""
+        return (
+            f"Lines {resume[0] + 1}-{resume[1]} of cell {index} were not shown{following}; "
+            f"call again with cursor \"{cursor}\" and the same ranges to read on."
+        )
+    return (
+        f"{more} more requested cell(s) did not fit in the token budget; "
+        f"call again with cursor \"{cursor}\" and the same ranges to continue."
+    )
+
+
+# Budget kept free for the closing cursor note
+_CURSOR_NOTE_TOKENS = estimate_tokens(
+    "\n" + _cursor_note(99999, (99999, 99999), 99999, encode_cursor(99999, 99999, (99999, 99999)))
+)
+
+
+def retrieve_cells(
+    notebook: Notebook,
+    ranges: str = "",
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    policy: str = "head_tail",
+    cursor: Optional[str] = None,
+    indices: Optional[List[int]] = None,
+) -> RetrievalPage:
+    """Return as many of the requested cells as fit in ``token_budget``.
+
+    Args:
+        notebook: The current notebook version
+        ranges: Range spec for ``parse_ranges``; ignored when ``indices`` is given
+        token_budget: Approximate token limit for the returned text
+        policy: "full" returns whole cells and stops before one that does not fit,
+                "head_tail" shortens such a cell to its first and last lines,
+                "signatures" reduces every code cell to its signatures
+        cursor: Cursor from a previous page of the same request
+        indices: Explicit cell indices instead of ``ranges``
+    """
+    if policy not in TRUNCATION_POLICIES:
+        raise RetrievalError(f"Unknown policy {policy!r}, expected one of {', '.join(TRUNCATION_POLICIES)}")
+    token_budget = max(MIN_CELL_TOKENS, min(token_budget, MAX_TOKEN_BUDGET))
+    requested = list(indices) if indices is not None else parse_ranges(ranges, len(notebook))
+
+    position = 0
+    continued: Optional[LineSpan] = None
+    notes = []
+    if cursor:
+        version, position, continued = decode_cursor(cursor)
+        if version != notebook.version:
+            notes.append(f"Note: the notebook changed since this cursor was issued (version {version} -> {notebook.version}).")
+
+    page = RetrievalPage(text="")
+    parts: List[str] = []
+    # Every part is followed by a newline; notes and the cursor note count too
+    remaining = token_budget - _CURSOR_NOTE_TOKENS - sum(estimate_tokens(note + "\n") for note in notes)
+    resume: Optional[LineSpan] = None
+    while position < len(requested):
+        index = requested[position]
+        if not 0 <= index < len(notebook):
+            marker = f"[Cell {index} - out of range]"
+            if parts and remaining < estimate_tokens(marker + "\n"):
+                break
+            parts.append(marker)
+            remaining -= estimate_tokens(marker + "\n")
+            position += 1
+            continued = None
+            continue
+        if parts and remaining < MIN_CELL_TOKENS:
+            break
+
+        cell = notebook[index]
+        text = cell.source.strip()
+        note = ""
+        # Leave room for the cell tags
+        available = max(1, remaining - estimate_tokens(render_cell(index, cell, "", "lines 00000-00000 of 00000") + "\n"))
+        lines = text.splitlines()
+        if continued is not None and continued[0] < len(lines):
+            # Continue with the lines a previous page left out of a shortened cell
+            start, stop = continued[0], min(continued[1], len(lines))
+            body, end = _lines_from(lines, start, stop, available)
+            note = f"lines {start + 1}-{end} of {len(lines)}"
+            if end < stop:
+                resume = (end, stop)
+        else:
+            if not text:
+                body = "<empty cell>"
+            elif policy == "signatures" and cell.cell_type == "code":
+                body, note, _ = _shorten(cell, text, policy, remaining)
+            else:
+                body = text
+            if estimate_tokens(body) > available:
+                if policy == "full" and page.returned:
+                    break
+                body, note, resume = _shorten(cell, text, "head_tail" if policy == "full" else policy, available)
+        if note.startswith("truncated") or resume is not None:
+            page.truncated.append(index)
+
+        rendered = render_cell(index, cell, body, note)
+        parts.append(rendered)
+        page.returned.append(index)
+        remaining -= estimate_tokens(rendered + "\n")
+        continued = None
+        if resume is not None:
+            break
+        position += 1
+
+    if position < len(requested):
+        page.next_cursor = encode_cursor(notebook.version, position, resume)
+        more = len(requested) - position - (1 if resume is not None else 0)
+        notes.append(_cursor_note(requested[position], resume, more, page.next_cursor))
+    page.text = "\n".join(parts + notes)
+    page.tokens = estimate_tokens(page.text)
+    return page
@@ -0,0 +1,39 @@
+"""Line-level diffs between cell versions.
+
+Proposed edits are sent to the frontend as hunks against a versioned base
+cell instead of the full old and new content, so the payload grows with the
+size of the edit rather than the size of the cell.
+"""
+
+from difflib import SequenceMatcher
+from typing import Any, Dict, List
+
+
+def split_lines(text: str) -> List[str]:
+    """Split on "\\n" only, keeping line endings (mirrored by the frontend)."""
+    lines = text.split("\n")
+    result = [line + "\n" for line in lines[:-1]]
+    if lines[-1]:
+        result.append(lines[-1])
+    return result
+
+
+def compute_line_hunks(old: str, new: str) -> List[Dict[str, Any]]:
+    """Hunks turning ``old`` into ``new``.
+
+    Each hunk replaces the lines ``old`` starting at line ``start`` of the
+    original text with the lines ``new``. The removed lines are included so
+    the frontend can verify it applies the hunk to the same base.
+    """
+    a, b = split_lines(old), split_lines(new)
+    hunks = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        hunks.append({"start": i1, "old": a[i1:i2], "new": b[j1:j2]})
+    return hunks
+
+
+def hunks_size(hunks: List[Dict[str, Any]]) -> int:
+    """Approximate serialized size of hunks in characters."""
+    return sum(len(line) + 4 for hunk in hunks for line in hunk["old"] + hunk["new"]) + 24 * len(hunks)
@@ -0,0 +1,310 @@
+"""Apply search/replace patches to cell sources.
+
+Lets the model edit a cell by sending only the changed region instead of
+regenerating the whole cell. A patch is a sequence of blocks in either form:
+
+    <<<<<<< SEARCH
+    lines to find
+    =======
+    replacement lines
+    >>>>>>> REPLACE
+
+or unified-diff hunks (``@@ ... @@`` followed by `` ``/``-``/``+`` lines), whose
+context and removed lines form the search text. Blocks are located with
+progressively looser matching: exact text covering whole lines, then lines
+compared without surrounding whitespace (reindenting the replacement), then
+the most similar window of lines above ``FUZZY_THRESHOLD``. A block that
+matches nowhere (or ambiguously) fails the whole patch with an error naming
+the closest candidate. An empty replacement deletes the matched lines.
+"""
+
+import re
+from dataclasses import dataclass, replace as replace_field
+from difflib import SequenceMatcher
+from typing import List, Optional, Tuple
+
+from src.agents.cell_diff import split_lines
+
+# Minimum similarity for a fuzzy match of a search block
+FUZZY_THRESHOLD = 0.9
+
+# A fuzzy match must beat the runner-up by this much to be unambiguous
+FUZZY_MARGIN = 0.02
+
+_SEARCH_MARKER = re.compile(r"^<{5,9} ?SEARCH\s*$")
+_DIVIDER_MARKER = re.compile(r"^={5,9}\s*$")
+_REPLACE_MARKER = re.compile(r"^>{5,9} ?REPLACE\s*$")
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+class PatchError(ValueError):
+    """Raised when a patch is malformed or a block cannot be located."""
+
+
+@dataclass
+class PatchBlock:
+    """One search/replace edit. ``line_hint`` is a 0-based line number, if known."""
+    search: str
+    replace: str
+    line_hint: Optional[int] = None
+
+
+@dataclass
+class PatchResult:
+    content: str
+    # How each block was located: "exact", "whitespace" or "fuzzy (0.93)"
+    matches: List[str]
+
+
+def parse_patch(patch: str) -> List[PatchBlock]:
+    """Parse search/replace blocks or unified-diff hunks from ``patch``."""
+    lines = split_lines(patch)
+    if any(_SEARCH_MARKER.match(line) for line in lines):
+        blocks = _parse_search_replace(lines)
+    elif any(_HUNK_HEADER.match(line) for line in lines):
+        blocks = _parse_unified(lines)
+    else:
+        raise PatchError("Patch contains no SEARCH/REPLACE blocks or unified-diff hunks")
+    if not blocks:
+        raise PatchError("Patch contains no edits")
+    return blocks
+
+
+def _parse_search_replace(lines: List[str]) -> List[PatchBlock]:
+    blocks = []
+    search: List[str] = []
+    replace: List[str] = []
+    state = None  # None, "search" or "replace"
+    for number, line in enumerate(lines, 1):
+        if _SEARCH_MARKER.match(line):
+            if state is not None:
+                raise PatchError(f"Line {number}: SEARCH marker inside an unfinished block")
+            state, search, replace = "search", [], []
+        elif _DIVIDER_MARKER.match(line) and state == "search":
+            state = "replace"
+        elif _REPLACE_MARKER.match(line) and state == "replace":
+            blocks.append(PatchBlock(_join_block(search), _join_block(replace)))
+            state = None
+        elif state == "search":
+            search.append(line)
+        elif state == "replace":
+            replace.append(line)
+    if state is not None:
+        raise PatchError("Unterminated SEARCH/REPLACE block")
+    return blocks
+
+
+def _parse_unified(lines: List[str]) -> List[PatchBlock]:
+    blocks = []
+    current: Optional[Tuple[int, List[str], List[str]]] = None
+    for line in lines:
+        header = _HUNK_HEADER.match(line)
+        if header:
+            if current is not None:
+                blocks.append(_hunk_block(*current))
+            current = (max(int(header.group(1)) - 1, 0), [], [])
+            continue
+        if current is None:
+            continue  # File headers and anything else before the first hunk
+        _, old, new = current
+        body = line[1:]
+        if line.startswith("-"):
+            old.append(body)
+        elif line.startswith("+"):
+            new.append(body)
+        elif line.startswith(" ") or line in ("\n", ""):
+            old.append(body)
+            new.append(body)
+        elif line.startswith("\\"):
+            continue  # "\ No newline at end of file"
+    if current is not None:
+        blocks.append(_hunk_block(*current))
+    return blocks
+
+
+def _hunk_block(start: int, old: List[str], new: List[str]) -> PatchBlock:
+    if not old:
+        raise PatchError(f"Hunk at line {start + 1} has no context or removed lines to anchor it")
+    return PatchBlock(_join_block(old), _join_block(new), line_hint=start)
+
+
+def _join_block(lines: List[str]) -> str:
+    """Join block lines; the newline before the closing marker is not part of the text."""
+    text = "".join(line if line.endswith("\n") else line + "\n" for line in lines)
+    return text[:-1] if text.endswith("\n") else text
+
+
+def apply_patch(source: str, patch: str) -> PatchResult:
+    """Apply every block of ``patch`` to ``source`` in order.
+
+    Raises:
+        PatchError: If the patch is malformed or any block cannot be located
+    """
+    blocks = parse_patch(patch)
+    matches = []
+    # Line hints refer to the original source; earlier blocks may have moved lines
+    delta = 0
+    for number, block in enumerate(blocks, 1):
+        if block.line_hint is not None and delta:
+            block = replace_field(block, line_hint=max(block.line_hint + delta, 0))
+        try:
+            patched, how = apply_block(source, block)
+        except PatchError as e:
+            raise PatchError(f"Block {number} of {len(blocks)}: {e}")
+        delta += patched.count("\n") - source.count("\n")
+        source = patched
+        matches.append(how)
+    return PatchResult(source, matches)
+
+
+def apply_block(source: str, block: PatchBlock) -> Tuple[str, str]:
+    """Replace the region matched by ``block.search`` with ``block.replace``."""
+    search = block.search
+    if not search.strip():
+        if source.strip():
+            raise PatchError("Empty SEARCH text only applies to an empty cell")
+        return block.replace, "exact"
+
+    start = _exact_match(source, search, block.line_hint)
+    if start is not None:
+        end = start + len(search)
+        if not block.replace and not search.endswith("\n"):
+            # Deleting whole lines also removes their line break
+            if end < len(source):
+                end += 1
+            elif start > 0:
+                start -= 1
+        return source[:start] + block.replace + source[end:], "exact"
+
+    lines = split_lines(source)
+    search_lines = split_lines(search)
+    window = _normalized_match(lines, search_lines, block.line_hint)
+    how = "whitespace"
+    if window is None:
+        window, ratio = _fuzzy_match(lines, search_lines, block.line_hint)
+        how = f"fuzzy ({ratio:.2f})"
+
+    first, last = window
+    replace = _reindent(block.replace, search_lines, lines[first:last])
+    matched = "".join(lines[first:last])
+    # Keep the line break after the matched region when the search text had none
+    if matched.endswith("\n") and not search.endswith("\n") and replace and not replace.endswith("\n"):
+        replace += "\n"
+    head, tail = "".join(lines[:first]), "".join(lines[last:])
+    if not replace and not tail and not matched.endswith("\n") and head.endswith("\n"):
+        # Deleting the last line removes the line break before it
+        head = head[:-1]
+    return head + replace + tail, how
+
+
+def _exact_match(source: str, search: str, hint: Optional[int]) -> Optional[int]:
+    """Start of the exact occurrence of ``search`` covering whole lines.
+
+    Occurrences starting or ending mid-line are ignored, so an indented line
+    is left to the whitespace tier, which reindents the replacement.
+    """
+    positions = []
+    position = source.find(search)
+    while position != -1:
+        end = position + len(search)
+        starts_line = position == 0 or source[position - 1] == "\n"
+        ends_line = search.endswith("\n") or end == len(source) or source[end] == "\n"
+        if starts_line and ends_line:
+            positions.append(position)
+        position = source.find(search, position + 1)
+    if not positions:
+        return None
+    if len(positions) == 1:
+        return positions[0]
+    if hint is None:
+        raise PatchError(
+            f"SEARCH text occurs {len(positions)} times; include more surrounding lines to make it unique"
+        )
+    return min(positions, key=lambda p: abs(source.count("\n", 0, p) - hint))
+
+
+def _normalized_match(lines: List[str], search_lines: List[str], hint: Optional[int]) -> Optional[Tuple[int, int]]:
+    target = [line.strip() for line in search_lines]
+    stripped = [line.strip() for line in lines]
+    size = len(target)
+    candidates = [i for i in range(len(lines) - size + 1) if stripped[i:i + size] == target]
+    if not candidates:
+        return None
+    if len(candidates) > 1 and hint is None:
+        raise PatchError(
+            f"SEARCH text matches {len(candidates)} places when ignoring whitespace; "
+            "include more surrounding lines to make it unique"
+        )
+    first = min(candidates, key=lambda i: abs(i - hint)) if hint is not None else candidates[0]
+    return first, first + size
+
+
+def _fuzzy_match(lines: List[str], search_lines: List[str], hint: Optional[int]) -> Tuple[Tuple[int, int], float]:
+    target = "".join(line.strip() + "\n" for line in search_lines)
+    size = len(search_lines)
+    scored = []
+    # Allow the matched region to be one line shorter or longer than the search text
+    for length in {max(size - 1, 1), size, size + 1}:
+        for first in range(max(len(lines) - length + 1, 0)):
+            candidate = "".join(line.strip() + "\n" for line in lines[first:first + length])
+            matcher = SequenceMatcher(None, target, candidate, autojunk=False)
+            if matcher.real_quick_ratio() < FUZZY_THRESHOLD or matcher.quick_ratio() < FUZZY_THRESHOLD:
+                scored.append((0.0, first, length))
+                continue
+            scored.append((matcher.ratio(), first, length))
+    if not scored:
+        raise PatchError("SEARCH text is longer than the cell")
+
+    scored.sort(key=lambda s: (-s[0], abs(s[1] - hint) if hint is not None else 0))
+    ratio, first, length = scored[0]
+    if ratio < FUZZY_THRESHOLD:
+        best = _closest_region(lines, search_lines)
+        raise PatchError(f"SEARCH text not found in the cell. Closest region:\n{best}")
+    # Overlapping windows around the same spot are not competitors
+    rivals = [s for s in scored[1:] if abs(s[1] - first) >= size]
+    if rivals and rivals[0][0] > ratio - FUZZY_MARGIN and hint is None:
+        raise PatchError(
+            f"SEARCH text approximately matches several places (lines {first + 1} and {rivals[0][1] + 1}); "
+            "include more surrounding lines to make it unique"
+        )
+    return (first, first + length), ratio
+
+
+def _closest_region(lines: List[str], search_lines: List[str]) -> str:
+    """Lines of the cell most similar to the search text, with line numbers."""
+    size = max(len(search_lines), 1)
+    target = "".join(search_lines)
+    best_ratio, best_first = -1.0, 0
+    for first in range(max(len(lines) - size + 1, 1)):
+        ratio = SequenceMatcher(None, target, "".join(lines[first:first + size]), autojunk=False).ratio()
+        if ratio > best_ratio:
+            best_ratio, best_first = ratio, first
+    region = lines[best_first:best_first + size]
+    numbered = "".join(f"{best_first + n + 1:4d}| {line if line.endswith(chr(10)) else line + chr(10)}"
+                       for n, line in enumerate(region))
+    return f"{numbered}(similarity {best_ratio:.2f})"
+
+
+def _leading(line: str) -> str:
+    return line[:len(line) - len(line.lstrip(" \t"))]
+
+
+def _reindent(replace: str, search_lines: List[str], matched_lines: List[str]) -> str:
+    """Shift the replacement by the indentation difference between search text and match."""
+    search_first = next((line for line in search_lines if line.strip()), None)
+    matched_first = next((line for line in matched_lines if line.strip()), None)
+    if search_first is None or matched_first is None:
+        return replace
+    have, want = _leading(search_first), _leading(matched_first)
+    if have == want:
+        return replace
+    if want.startswith(have):
+        extra = want[len(have):]
+        return "".join(extra + line if line.strip() else line for line in split_lines(replace))
+    if have.startswith(want):
+        cut = len(have) - len(want)
+        return "".join(
+            line[cut:] if line.strip() and _leading(line).startswith(have[:cut]) else line
+            for line in split_lines(replace)
+        )
+    return replace
@@ -0,0 +1,374 @@
+"""Main-content extraction for scraped pages.
+
+A readability-style scorer: boilerplate (navigation, footers, cookie banners,
+sidebars) is pruned, paragraph-like elements award points to their parent and
+grandparent, scores are discounted by link density, and the best container
+plus its strong siblings is rendered as markdown (headings, paragraphs, lists,
+code blocks and tables). Results carry a 0-1 quality score so callers can fall
+back to the full page text when no article was found.
+"""
+
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from src.agents.utils import CHARS_PER_TOKEN, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_XHTML = "{http://www.w3.org/1999/xhtml}"
+
+# Main content shorter than this is not trusted
+MIN_CONTENT_CHARS = 250
+
+# Token budget per scraped page when the caller does not give one
+DEFAULT_PAGE_TOKEN_BUDGET = int(os.getenv("SCRAPE_MAX_TOKENS_PER_PAGE", "2000"))
+
+# Below this quality the full page text is used instead of the extracted content
+MIN_CONTENT_QUALITY = 0.3
+
+# Elements never part of the main content
+_REMOVED_TAGS = {"script", "style", "noscript", "template", "nav", "aside", "form", "iframe", "svg",
+                 "button", "select", "input", "textarea", "dialog", "menu", "object", "embed", "canvas"}
+# Removed unless inside an article or main element, where they hold the title or byline
+_PAGE_CHROME_TAGS = {"header", "footer"}
+
+_UNLIKELY = re.compile(
+    r"banner|breadcrumb|combx|comment|community|cookie|consent|disqus|extra|foot|header|legends|menu|modal"
+    r"|nav|newsletter|popup|promo|related|remark|replies|rss|share|shoutbox|sidebar|skyscraper|social"
+    r"|sponsor|subscribe|advert|agegate|pager|pagination|signup|gdpr", re.IGNORECASE)
+_MAYBE_CANDIDATE = re.compile(r"and|article|body|column|content|main|shadow", re.IGNORECASE)
+_POSITIVE = re.compile(r"article|body|content|entry|hentry|main|page|post|text|blog|story", re.IGNORECASE)
+_NEGATIVE = re.compile(
+    r"hidden|banner|combx|comment|com-|contact|foot|footnote|masthead|meta|outbrain|promo|related"
+    r"|scroll|share|shoutbox|sidebar|skyscraper|sponsor|shopping|tags|tool|widget", re.IGNORECASE)
+
+_HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+_BLOCK_TAGS = {"address", "article", "blockquote", "details", "div", "dl", "fieldset", "figure", "footer",
+               "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "ol", "p", "pre",
+               "section", "table", "ul"}
+_SCORED_TAGS = {"p", "pre", "td", "blockquote"}
+_TAG_WEIGHTS = {"article": 10, "main": 10, "div": 5, "section": 3, "pre": 3, "td": 3, "blockquote": 3,
+                "address": -3, "ol": -3, "ul": -3, "dl": -3, "dd": -3, "dt": -3, "li": -3,
+                "h1": -5, "h2": -5, "h3": -5, "h4": -5, "h5": -5, "h6": -5, "th": -5}
+
+# Rendering nests at most this deep; anything deeper is flattened to text
+_MAX_RENDER_DEPTH = 200
+
+
+@dataclass
+class ExtractedContent:
+    """Main content of a page rendered as markdown."""
+    text: str
+    title: Optional[str]
+    quality: float
+    method: str  # "main_content", or "full_text" when no article was found
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+def _tag(elem) -> str:
+    """Local tag name; empty for comments and processing instructions."""
+    tag = elem.tag
+    if not isinstance(tag, str):
+        return ""
+    return tag[len(_XHTML):] if tag.startswith(_XHTML) else tag
+
+
+def _attr(elem, name: str) -> str:
+    for attr, value in elem.items():
+        if attr == name or attr.endswith("}" + name):
+            return value
+    return ""
+
+
+def _text(elem) -> str:
+    return " ".join("".join(elem.itertext()).split())
+
+
+def _link_density(elem, text_length: int) -> float:
+    if not text_length:
+        return 0.0
+    link_chars = sum(len(_text(a)) for a in elem.iter(f"{_XHTML}a"))
+    return min(1.0, link_chars / text_length)
+
+
+def _remove(parent, child) -> None:
+    """Remove ``child`` but keep its tail text in the document."""
+    if child.tail and child.tail.strip():
+        index = list(parent).index(child)
+        if index > 0:
+            previous = parent[index - 1]
+            previous.tail = (previous.tail or "") + child.tail
+        else:
+            parent.text = (parent.text or "") + child.tail
+    parent.remove(child)
+
+
+def _prune(root) -> None:
+    """Remove boilerplate elements in place."""
+    stack = [(root, False)]
+    while stack:
+        elem, in_article = stack.pop()
+        in_article = in_article or _tag(elem) in ("article", "main")
+        for child in list(elem):
+            tag = _tag(child)
+            signature = f"{_attr(child, 'class')} {_attr(child, 'id')} {_attr(child, 'role')}"
+            if (not tag
+                    or tag in _REMOVED_TAGS
+                    or (tag in _PAGE_CHROME_TAGS and not in_article)
+                    or any(attr == "hidden" for attr in child.keys()) or _attr(child, "aria-hidden") == "true"
+                    or (tag not in ("body", "article", "main", "a")
+                        and _UNLIKELY.search(signature) and not _MAYBE_CANDIDATE.search(signature))):
+                _remove(elem, child)
+            else:
+                stack.append((child, in_article))
+
+
+def _class_weight(elem) -> int:
+    weight = 0
+    for value in (_attr(elem, "class"), _attr(elem, "id")):
+        if value:
+            if _NEGATIVE.search(value):
+                weight -= 25
+            if _POSITIVE.search(value):
+                weight += 25
+    return weight
+
+
+def _score_candidates(root) -> Tuple[Dict, Dict]:
+    """Score containers by the paragraphs they hold. Returns (scores, parent map)."""
+    parents = {child: parent for parent in root.iter() for child in parent}
+    scores: Dict = {}
+    for elem in root.iter():
+        tag = _tag(elem)
+        if tag not in _SCORED_TAGS and not (tag == "div" and not any(_tag(c) in _BLOCK_TAGS for c in elem)):
+            continue
+        text = _text(elem)
+        if len(text) < 25:
+            continue
+        score = 1 + text.count(",") + min(len(text) // 100, 3)
+        parent = parents.get(elem)
+        for ancestor, divisor in ((parent, 1), (parents.get(parent), 2)):
+            if ancestor is None:
+                continue
+            if ancestor not in scores:
+                scores[ancestor] = _TAG_WEIGHTS.get(_tag(ancestor), 0) + _class_weight(ancestor)
+            scores[ancestor] += score / divisor
+    for elem in scores:
+        scores[elem] *= 1 - _link_density(elem, len(_text(elem)))
+    return scores, parents
+
+
+def _select_content(root) -> Tuple[List, float]:
+    """The top candidate with its strong siblings, in document order, and the top score."""
+    scores, parents = _score_candidates(root)
+    if not scores:
+        return [root], 0.0
+    top = max(scores, key=scores.get)
+    top_score = scores[top]
+    parent = parents.get(top)
+    if parent is None:
+        return [top], top_score
+
+    threshold = max(10.0, top_score * 0.2)
+    selected = []
+    for sibling in parent:
+        if sibling is top or scores.get(sibling, -1) >= threshold:
+            selected.append(sibling)
+        elif _tag(sibling) == "p":
+            text = _text(sibling)
+            density = _link_density(sibling, len(text))
+            if (len(text) > 80 and density < 0.25) or (0 < len(text) <= 80 and density == 0 and "." in text):
+                selected.append(sibling)
+    return selected, top_score
+
+
+def _inline_child(child, depth: int) -> str:
+    """Markdown for one element of an inline run: links, code spans, line breaks or plain text."""
+    tag = _tag(child)
+    if not tag:
+        return ""
+    if tag == "br":
+        return "\n"
+    if depth >= _MAX_RENDER_DEPTH:
+        return "".join(child.itertext())
+    if tag == "a":
+        label = " ".join(_inline(child, depth + 1).split())
+        href = _attr(child, "href")
+        if label and href and not href.startswith(("#", "javascript:")):
+            return f"[{label}]({href})"
+        return label
+    if tag == "code":
+        return f"`{_inline(child, depth + 1).strip()}`"
+    return _inline(child, depth + 1)
+
+
+def _inline(elem, depth: int = 0) -> str:
+    """Text of an element's inline content with links as markdown."""
+    parts = [elem.text or ""]
+    for child in elem:
+        parts.append(_inline_child(child, depth))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+
+def _clean(text: str) -> str:
+    return "\n".join(" ".join(line.split()) for line in text.split("\n")).strip()
+
+
+def _render_table(table) -> str:
+    rows = []
+    for row in table.iter(f"{_XHTML}tr"):
+        cells = [_clean(_inline(cell)).replace("\n", " ").replace("|", "\\|")
+                 for cell in row if _tag(cell) in ("td", "th")]
+        if any(cells):
+            rows.append(cells)
+    if not rows:
+        return ""
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    lines = ["| " + " | ".join(rows[0]) + " |", "|" + " --- |" * width]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows[1:])
+    return "\n".join(lines)
+
+
+def _render_code(pre) -> str:
+    language = ""
+    for elem in pre.iter():
+        match = re.search(r"(?:lang|language)-([\w+#-]+)", _attr(elem, "class"))
+        if match:
+            language = match.group(1)
+            break
+    return f"```{language}\n{''.join(pre.itertext()).strip(chr(10))}\n```"
+
+
+def _render_blocks(elem, blocks: List[str], depth: int = 0) -> None:
+    """Append markdown blocks for ``elem``'s children, grouping inline content into paragraphs."""
+    run = [elem.text or ""]
+
+    def flush():
+        paragraph = _clean("".join(run))
+        if paragraph:
+            blocks.append(paragraph)
+        run.clear()
+
+    for child in elem:
+        tag = _tag(child)
+        if tag not in _BLOCK_TAGS or depth >= _MAX_RENDER_DEPTH:
+            run.append(_inline_child(child, depth))
+            run.append(child.tail or "")
+            continue
+
+        flush()
+        if tag in _HEADINGS:
+            heading = " ".join(_text(child).split())
+            if heading:
+                blocks.append("#" * _HEADINGS[tag] + " " + heading)
+        elif tag == "pre":
+            blocks.append(_render_code(child))
+        elif tag == "table":
+            table = _render_table(child)
+            if table:
+                blocks.append(table)
+        elif tag in ("ul", "ol"):
+            items = [_clean(_inline(item)).replace("\n", " ") for item in child if _tag(item) == "li"]
+            marker = "1." if tag == "ol" else "-"
+            lines = [f"{marker} {item}" for item in items if item]
+            if lines:
+                blocks.append("\n".join(lines))
+        elif tag == "blockquote":
+            quoted: List[str] = []
+            _render_blocks(child, quoted, depth + 1)
+            if quoted:
+                blocks.append("\n".join("> " + line for block in quoted for line in block.split("\n")))
+        elif tag == "hr":
+            pass
+        elif tag == "p":
+            paragraph = _clean(_inline(child))
+            if paragraph:
+                blocks.append(paragraph)
+        else:
+            _render_blocks(child, blocks, depth + 1)
+        run.append(child.tail or "")
+    flush()
+
+
+def _title(document) -> Optional[str]:
+    for path in (f".//{_XHTML}h1", f".//{_XHTML}title"):
+        elem = document.find(path)
+        if elem is not None:
+            title = _text(elem)
+            if title:
+                return title
+    return None
+
+
+def extract_content(document) -> ExtractedContent:
+    """Extract the main content of a parsed html5lib document.
+
+    The document is modified in place. Returns content with method
+    ``"full_text"`` and an empty text when no convincing article was found.
+
+    Args:
+        document: Element tree from ``html5lib.parse``
+    """
+    title = _title(document)
+    body = document.find(f".//{_XHTML}body")
+    root = body if body is not None else document
+    page_chars = len(_text(root))
+
+    _prune(root)
+    selected, top_score = _select_content(root)
+    holder = root.makeelement(f"{_XHTML}div", {})
+    holder.extend(selected)
+    blocks: List[str] = []
+    _render_blocks(holder, blocks)
+    text = "\n\n".join(blocks)
+
+    if len(text) < MIN_CONTENT_CHARS:
+        return ExtractedContent(text="", title=title, quality=0.0, method="full_text")
+
+    if title and not text.startswith("#"):
+        text = f"# {title}\n\n{text}"
+    content_chars = len(_text(holder))
+    paragraphs = sum(1 for block in blocks if not block.startswith(("#", "|", "```", "-", "1.", ">")))
+    # Long, link-poor text from a clearly winning container split over several paragraphs
+    quality = (0.35 * min(1.0, content_chars / 1500)
+               + 0.25 * (1 - _link_density(holder, content_chars))
+               + 0.2 * min(1.0, paragraphs / 4)
+               + 0.2 * min(1.0, top_score / 20))
+    if page_chars and content_chars / page_chars < 0.05:
+        # A tiny slice of a large page is more likely a teaser than the article
+        quality *= 0.5
+    return ExtractedContent(text=text, title=title, quality=round(quality, 2), method="main_content")
+
+
+def apply_token_budget(text: str, max_tokens: int) -> Tuple[str, bool]:
+    """Cut text to at most ``max_tokens`` at a paragraph boundary. Returns (text, truncated).
+
+    Args:
+        text: Markdown text with blank lines between blocks
+        max_tokens: Token budget for the returned text, including the truncation note
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text, False
+    budget_chars = max(0, max_tokens * CHARS_PER_TOKEN - 64)  # Room for the note
+    kept: List[str] = []
+    used = 0
+    for block in text.split("\n\n"):
+        if used + len(block) + 2 > budget_chars:
+            room = budget_chars - used - 2
+            if not kept or room > budget_chars // 4:
+                # Keep the start of a long block rather than leaving much of the budget unused
+                kept.append(block[:room].rsplit(" ", 1)[0].rstrip() + " ...")
+            break
+        kept.append(block)
+        used += len(block) + 2
+    result = "\n\n".join(kept)
+    remaining = estimate_tokens(text) - estimate_tokens(result)
+    return f"{result}\n\n[Truncated: about {remaining} more tokens]", True
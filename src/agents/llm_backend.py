@@ -0,0 +1,310 @@
+"""Pluggable chat-completion backends for the agent.
+
+``OpenAIBackend`` streams from the OpenAI API (or any compatible server via
+``OPENAI_BASE_URL``, such as ``mock_llm_server``). ``MockLLMBackend`` replays
+recorded streaming responses, tool calls included, at a configurable
+first-token latency and token rate, so the whole agent loop runs offline and
+deterministically. ``RecordingBackend`` wraps another backend and appends
+every response it streams to a recordings file in the format the mock replays.
+
+Recordings are JSON lines, one response each::
+
+    {"when": "user", "match": "plot", "chunks": [{"content": "Let me look. "},
+     {"tool_calls": [{"index": 0, "id": "call_1", "function": {"name": "list_notebook_cells", "arguments": "{}"}}]}]}
+
+``when`` is the role of the last message ("user" or "tool") and ``match`` an
+optional regex searched in the last user message; the first matching
+recording is replayed.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+
+# Characters per streamed content chunk when replaying, roughly one token
+_CHUNK_CHARS = 4
+
+
+class CompletionStream(ABC):
+    """Async iterator of OpenAI-style chunks that can be closed early."""
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._chunks()
+
+    @abstractmethod
+    def _chunks(self) -> AsyncIterator[Any]:
+        ...
+
+    async def close(self) -> None:
+        """Stop the stream; the default has nothing to release."""
+
+
+class LLMBackend(ABC):
+    """Source of streamed chat completions."""
+
+    name: str = "backend"
+
+    @abstractmethod
+    async def stream(self, messages: List[Dict[str, Any]], **kwargs: Any) -> Any:
+        """Start a streamed completion.
+
+        Returns an async iterable of chunks shaped like OpenAI's
+        ``ChatCompletionChunk`` with an async ``close()``.
+
+        Args:
+            messages: Chat messages
+            **kwargs: Completion options such as ``tools`` and ``tool_choice``
+        """
+
+    async def aclose(self) -> None:
+        """Release the backend's resources."""
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI chat completions; the client is created on first use."""
+
+    name = "openai"
+
+    def __init__(self, model: str = DEFAULT_MODEL, **client_options: Any):
+        """Initialize the backend.
+
+        Args:
+            model: Model name
+            **client_options: Keyword arguments for ``AsyncOpenAI`` (base_url, api_key, ...)
+        """
+        self.model = model
+        self.client_options = client_options
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(**self.client_options)
+        return self._client
+
+    async def stream(self, messages: List[Dict[str, Any]], **kwargs: Any) -> Any:
+        return await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=True,
+            **kwargs
+        )
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+
+
+def _chunk(content: Optional[str] = None, tool_calls: Optional[List[Dict[str, Any]]] = None) -> SimpleNamespace:
+    """An object shaped like an OpenAI ``ChatCompletionChunk`` with a single choice."""
+    calls = None
+    if tool_calls:
+        calls = [
+            SimpleNamespace(
+                index=call.get("index", 0),
+                id=call.get("id"),
+                type="function",
+                function=SimpleNamespace(
+                    name=call.get("function", {}).get("name"),
+                    arguments=call.get("function", {}).get("arguments"),
+                ),
+            )
+            for call in tool_calls
+        ]
+    delta = SimpleNamespace(role="assistant", content=content, tool_calls=calls)
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+
+
+class _ReplayStream(CompletionStream):
+    """Plays recorded chunks back at a first-token latency and token rate."""
+
+    def __init__(self, chunks: List[Dict[str, Any]], first_token_latency: float, tokens_per_second: float):
+        self.recorded = chunks
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self._closed = False
+
+    async def _chunks(self) -> AsyncIterator[Any]:
+        if self.first_token_latency:
+            await asyncio.sleep(self.first_token_latency)
+        started = time.perf_counter()
+        emitted = 0
+        for recorded in self.recorded:
+            pieces: List[SimpleNamespace] = []
+            content = recorded.get("content")
+            if content:
+                pieces.extend(_chunk(content=content[i:i + _CHUNK_CHARS])
+                              for i in range(0, len(content), _CHUNK_CHARS))
+            if recorded.get("tool_calls"):
+                pieces.append(_chunk(tool_calls=recorded["tool_calls"]))
+            for piece in pieces:
+                if self._closed:
+                    return
+                emitted += 1
+                if self.tokens_per_second:
+                    # Sleep only once the schedule is ahead by a millisecond or more
+                    ahead = emitted / self.tokens_per_second - (time.perf_counter() - started)
+                    if ahead >= 0.001:
+                        await asyncio.sleep(ahead)
+                yield piece
+
+    async def close(self) -> None:
+        self._closed = True
+
+
+class MockLLMBackend(LLMBackend):
+    """Replays recorded streaming responses without any network access."""
+
+    name = "mock"
+
+    def __init__(
+        self,
+        recordings: Optional[List[Dict[str, Any]]] = None,
+        first_token_latency: float = 0.0,
+        tokens_per_second: float = 0.0,
+    ):
+        """Initialize the backend.
+
+        Args:
+            recordings: Responses in the recordings format; a plain text reply if empty
+            first_token_latency: Seconds before the first chunk of each response
+            tokens_per_second: Chunk rate while streaming; 0 streams as fast as possible
+        """
+        self.recordings = recordings or []
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs: Any) -> "MockLLMBackend":
+        """Load recordings from a JSON lines file."""
+        with open(path, encoding="utf-8") as f:
+            recordings = [json.loads(line) for line in f if line.strip()]
+        return cls(recordings, **kwargs)
+
+    def select(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Chunks of the first recording matching the conversation state."""
+        when = "tool" if messages and messages[-1].get("role") == "tool" else "user"
+        last_user = next((str(m.get("content") or "") for m in reversed(messages) if m.get("role") == "user"), "")
+        for recording in self.recordings:
+            if recording.get("when", "user") != when:
+                continue
+            pattern = recording.get("match")
+            if pattern and not re.search(pattern, last_user, re.IGNORECASE | re.DOTALL):
+                continue
+            return recording.get("chunks", [])
+        return [{"content": "Mock response." if when == "user" else "Done."}]
+
+    async def stream(self, messages: List[Dict[str, Any]], **kwargs: Any) -> CompletionStream:
+        self.calls += 1
+        chunks = self.select(messages)
+        if kwargs.get("tool_choice") == "none":
+            chunks = [chunk for chunk in chunks if not chunk.get("tool_calls")] or [{"content": "Done."}]
+        return _ReplayStream(chunks, self.first_token_latency, self.tokens_per_second)
+
+
+class _RecordingStream(CompletionStream):
+    def __init__(self, inner: Any, on_complete):
+        self.inner = inner
+        self.on_complete = on_complete
+
+    async def _chunks(self) -> AsyncIterator[Any]:
+        recorded: List[Dict[str, Any]] = []
+        async for chunk in self.inner:
+            delta = chunk.choices[0].delta if chunk.choices else None
+            if delta is not None and getattr(delta, "content", None):
+                if recorded and "content" in recorded[-1]:
+                    recorded[-1]["content"] += delta.content
+                else:
+                    recorded.append({"content": delta.content})
+            if delta is not None and getattr(delta, "tool_calls", None):
+                recorded.append({"tool_calls": [
+                    {"index": call.index, "id": call.id,
+                     "function": {"name": call.function.name if call.function else None,
+                                  "arguments": call.function.arguments if call.function else None}}
+                    for call in delta.tool_calls
+                ]})
+            yield chunk
+        self.on_complete(recorded)
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+
+class RecordingBackend(LLMBackend):
+    """Passes another backend's streams through and appends them to a recordings file.
+
+    Recordings are written without ``match``; add patterns by hand to route
+    replays by query.
+    """
+
+    name = "record"
+
+    def __init__(self, inner: LLMBackend, path: str):
+        """Initialize the backend.
+
+        Args:
+            inner: Backend whose responses are recorded
+            path: JSON lines file the recordings are appended to
+        """
+        self.inner = inner
+        self.path = path
+
+    async def stream(self, messages: List[Dict[str, Any]], **kwargs: Any) -> CompletionStream:
+        when = "tool" if messages and messages[-1].get("role") == "tool" else "user"
+
+        def save(chunks: List[Dict[str, Any]]) -> None:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"when": when, "chunks": chunks}) + "\n")
+
+        return _RecordingStream(await self.inner.stream(messages, **kwargs), save)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+_llm_backend: Optional[LLMBackend] = None
+
+def get_llm_backend() -> LLMBackend:
+    """Get or create the global LLM backend.
+
+    LLM_BACKEND selects "openai" (default), "mock" or "record". The mock reads
+    MOCK_LLM_RECORDINGS and streams with MOCK_LLM_LATENCY seconds to the first
+    token at MOCK_LLM_TOKENS_PER_SECOND; "record" wraps the OpenAI backend and
+    appends to LLM_RECORD_PATH.
+    """
+    global _llm_backend
+    if _llm_backend is None:
+        kind = os.getenv("LLM_BACKEND", "openai")
+        if kind == "mock":
+            options = {
+                "first_token_latency": float(os.getenv("MOCK_LLM_LATENCY", "0")),
+                "tokens_per_second": float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "0")),
+            }
+            path = os.getenv("MOCK_LLM_RECORDINGS")
+            _llm_backend = MockLLMBackend.from_file(path, **options) if path else MockLLMBackend(**options)
+        elif kind == "record":
+            _llm_backend = RecordingBackend(OpenAIBackend(), os.getenv("LLM_RECORD_PATH", "llm_recordings.jsonl"))
+        elif kind == "openai":
+            _llm_backend = OpenAIBackend()
+        else:
+            raise ValueError(f"Unknown LLM_BACKEND {kind!r}; use openai, mock or record")
+        logger.info(f"LLM backend: {_llm_backend.name}")
+    return _llm_backend
+
+def set_llm_backend(backend: Optional[LLMBackend]) -> None:
+    """Replace the global LLM backend (benchmarks and tests)."""
+    global _llm_backend
+    _llm_backend = backend
@@ -0,0 +1,105 @@
+"""Event loop lag monitor.
+
+A background task sleeps for a fixed interval and records how much later than
+requested it wakes up. That delay is time the loop spent running something
+else, so steady or spiky lag means work is blocking the loop: synchronous
+parsing in a handler, a large JSON encode, a slow broadcast. Lags above a
+threshold are counted as stalls.
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+LOOP_STALL_MS = float(os.getenv("LOOP_STALL_MS", "100"))
+
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoopLagMonitor:
+    """Samples the running loop's scheduling delay in the background."""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_SECONDS, stall_ms: float = LOOP_STALL_MS, window: int = 600):
+        """Initialize the monitor.
+
+        Args:
+            interval: Seconds between samples
+            stall_ms: Lag in milliseconds from which a sample counts as a stall
+            window: Number of recent samples kept for percentiles
+        """
+        self.interval = interval
+        self.stall_ms = stall_ms
+        self._lags: Deque[float] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"samples": 0, "stalls": 0, "stalled_ms": 0.0, "max_ms": 0.0}
+
+    def start(self) -> None:
+        """Start sampling on the running loop; does nothing if already running."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, (loop.time() - expected) * 1000))
+
+    def record(self, lag_ms: float) -> None:
+        """Add one lag sample in milliseconds."""
+        self._lags.append(lag_ms)
+        self.stats["samples"] += 1
+        self.stats["max_ms"] = max(self.stats["max_ms"], lag_ms)
+        if lag_ms >= self.stall_ms:
+            self.stats["stalls"] += 1
+            self.stats["stalled_ms"] += lag_ms
+            logger.info(f"Event loop was blocked for {lag_ms:.0f}ms")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Lifetime counters plus percentiles over the recent window (milliseconds)."""
+        lags = list(self._lags)
+        return {
+            **self.stats,
+            "running": self._task is not None and not self._task.done(),
+            "interval_ms": self.interval * 1000,
+            "stall_threshold_ms": self.stall_ms,
+            "recent": {
+                "count": len(lags),
+                "last": lags[-1] if lags else 0.0,
+                "mean": sum(lags) / len(lags) if lags else 0.0,
+                "p50": _percentile(lags, 50),
+                "p95": _percentile(lags, 95),
+                "p99": _percentile(lags, 99),
+                "max": max(lags, default=0.0),
+            },
+        }
+
+
+_loop_monitor: Optional[LoopLagMonitor] = None
+
+def get_loop_monitor() -> LoopLagMonitor:
+    """Get or create the global event loop lag monitor."""
+    global _loop_monitor
+    if _loop_monitor is None:
+        _loop_monitor = LoopLagMonitor()
+    return _loop_monitor
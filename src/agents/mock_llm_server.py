@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""OpenAI-compatible mock chat completions server.
+
+Serves ``POST /v1/chat/completions`` as server-sent events from a
+``MockLLMBackend``, so the real OpenAI client and its HTTP streaming path can
+be exercised offline. Point the assistant at it with::
+
+    python -m src.agents.mock_llm_server --recordings recordings.jsonl --port 8400
+    OPENAI_BASE_URL=http://localhost:8400/v1 OPENAI_API_KEY=mock python run.py
+"""
+
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from src.agents.llm_backend import MockLLMBackend
+
+
+def _serialize(chunk: Any, completion_id: str, model: str, created: int) -> Dict[str, Any]:
+    """Wire format of one replayed chunk."""
+    choice = chunk.choices[0]
+    delta: Dict[str, Any] = {}
+    if choice.delta.content is not None:
+        delta["content"] = choice.delta.content
+    if choice.delta.tool_calls:
+        delta["tool_calls"] = [
+            {"index": call.index, "id": call.id, "type": "function",
+             "function": {"name": call.function.name, "arguments": call.function.arguments}}
+            for call in choice.delta.tool_calls
+        ]
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": choice.finish_reason}],
+    }
+
+
+def create_app(backend: Optional[MockLLMBackend] = None) -> FastAPI:
+    """Build the mock server app.
+
+    Args:
+        backend: Backend whose recordings are served, defaults to a plain-text mock
+    """
+    backend = backend or MockLLMBackend()
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        options = {key: value for key, value in body.items() if key not in ("messages", "model", "stream")}
+        stream = await backend.stream(body.get("messages", []), **options)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "mock")
+        created = int(time.time())
+
+        async def events() -> AsyncIterator[str]:
+            finish_reason = "stop"
+            try:
+                async for chunk in stream:
+                    if chunk.choices[0].delta.tool_calls:
+                        finish_reason = "tool_calls"
+                    yield f"data: {json.dumps(_serialize(chunk, completion_id, model, created))}\n\n"
+                final = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]}
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+            finally:
+                await stream.close()
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]}
+
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve recorded LLM responses over the OpenAI API")
+    parser.add_argument("--recordings", help="JSON lines file of recorded responses")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8400, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Streaming rate, 0 for unthrottled")
+
+    args = parser.parse_args()
+    options = {"first_token_latency": args.latency, "tokens_per_second": args.tokens_per_second}
+    backend = MockLLMBackend.from_file(args.recordings, **options) if args.recordings else MockLLMBackend(**options)
+    uvicorn.run(create_app(backend), host=args.host, port=args.port)
@@ -0,0 +1,271 @@
+"""Compact in-memory notebook model shared by the server, tools and indexes.
+
+Cells and notebooks are treated as immutable: an update produces a new
+Notebook version that reuses the Cell objects of every unchanged cell, so
+keeping a history of versions costs memory proportional to the changed cells
+and "did this cell change since version N" is an identity check.
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def join_source(source: Any) -> str:
+    """Join an nbformat ``source`` field (list of lines or string) into one string."""
+    if isinstance(source, list):
+        return "".join(source)
+    if source is None:
+        return ""
+    return str(source)
+
+
+class Cell:
+    """A notebook cell with its source joined once.
+
+    Uses ``__slots__`` to keep per-cell overhead small; the content hash and
+    line offsets are computed lazily and cached. Cells must not be modified
+    after construction since they are shared between notebook versions.
+    """
+
+    __slots__ = ("cell_type", "source", "metadata", "outputs", "execution_count", "id",
+                 "outputs_known", "_hash", "_line_offsets")
+
+    def __init__(
+        self,
+        cell_type: str,
+        source: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        outputs: Optional[List[Dict[str, Any]]] = None,
+        execution_count: Optional[int] = None,
+        id: Optional[str] = None,
+        outputs_known: bool = True,
+    ):
+        self.cell_type = cell_type
+        self.source = source
+        self.metadata = metadata if metadata is not None else {}
+        self.outputs = outputs if outputs is not None else []
+        self.execution_count = execution_count
+        self.id = id
+        # False when the cell came without outputs or execution count, as in
+        # the frontend's save message; its execution state is then unknown
+        self.outputs_known = outputs_known
+        self._hash: Optional[str] = None
+        self._line_offsets: Optional[Tuple[int, ...]] = None
+
+    @classmethod
+    def from_dict(cls, cell: Dict[str, Any]) -> "Cell":
+        """Create a Cell from an nbformat cell dict."""
+        return cls(
+            cell_type=cell.get("cell_type", "code"),
+            source=join_source(cell.get("source", "")),
+            metadata=cell.get("metadata"),
+            outputs=cell.get("outputs"),
+            execution_count=cell.get("execution_count"),
+            id=cell.get("id"),
+            outputs_known="outputs" in cell or "execution_count" in cell,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert back to an nbformat cell dict with ``source`` as a list of lines."""
+        cell = {
+            "cell_type": self.cell_type,
+            "metadata": self.metadata,
+            "source": self.source.splitlines(keepends=True),
+        }
+        if self.id is not None:
+            cell["id"] = self.id
+        if self.cell_type == "code":
+            cell["execution_count"] = self.execution_count
+            cell["outputs"] = self.outputs
+        return cell
+
+    @property
+    def content_hash(self) -> str:
+        """Hash of the cell type and source, used to detect unchanged cells."""
+        if self._hash is None:
+            digest = hashlib.sha1(self.cell_type.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(self.source.encode("utf-8"))
+            self._hash = digest.hexdigest()
+        return self._hash
+
+    @property
+    def line_offsets(self) -> Tuple[int, ...]:
+        """Character offset at which each line of the source starts."""
+        if self._line_offsets is None:
+            offsets = [0]
+            find = self.source.find
+            index = find("\n")
+            while index != -1:
+                offsets.append(index + 1)
+                index = find("\n", index + 1)
+            if len(offsets) > 1 and offsets[-1] == len(self.source):
+                offsets.pop()  # A trailing newline does not start a new line
+            self._line_offsets = tuple(offsets)
+        return self._line_offsets
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_offsets) if self.source else 0
+
+    def __repr__(self) -> str:
+        return f"Cell({self.cell_type!r}, {len(self.source)} chars)"
+
+
+class Notebook:
+    """An immutable notebook version: a tuple of Cells plus top-level metadata."""
+
+    __slots__ = ("cells", "metadata", "nbformat", "nbformat_minor", "version")
+
+    def __init__(
+        self,
+        cells: Iterable[Cell],
+        metadata: Optional[Dict[str, Any]] = None,
+        nbformat: int = 4,
+        nbformat_minor: int = 5,
+        version: int = 0,
+    ):
+        self.cells: Tuple[Cell, ...] = tuple(cells)
+        self.metadata = metadata if metadata is not None else {}
+        self.nbformat = nbformat
+        self.nbformat_minor = nbformat_minor
+        self.version = version
+
+    @classmethod
+    def from_dict(cls, notebook: Dict[str, Any]) -> "Notebook":
+        """Create a Notebook from an nbformat dict. Items that are already Cells are kept."""
+        return cls(
+            cells=[cell if isinstance(cell, Cell) else Cell.from_dict(cell) for cell in notebook.get("cells", [])],
+            metadata=notebook.get("metadata"),
+            nbformat=notebook.get("nbformat", 4),
+            nbformat_minor=notebook.get("nbformat_minor", 5),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "cells": [cell.to_dict() for cell in self.cells],
+            "metadata": self.metadata,
+            "nbformat": self.nbformat,
+            "nbformat_minor": self.nbformat_minor,
+        }
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __getitem__(self, index: int) -> Cell:
+        return self.cells[index]
+
+    def __iter__(self) -> Iterator[Cell]:
+        return iter(self.cells)
+
+    def with_cells(self, cells: Iterable[Cell], version: int) -> "Notebook":
+        """New version with the given cells, sharing this version's metadata."""
+        return Notebook(cells, self.metadata, self.nbformat, self.nbformat_minor, version)
+
+    def __repr__(self) -> str:
+        return f"Notebook(v{self.version}, {len(self.cells)} cells)"
+
+
+def _same_state(cell: Cell, other: Cell) -> bool:
+    """Whether ``other`` has the source and execution results of the existing ``cell``.
+
+    An incoming cell without outputs only needs the same source, so saves that
+    send sources alone keep the outputs already held on the server.
+    """
+    return (
+        cell.content_hash == other.content_hash
+        and (not other.outputs_known
+             or (cell.execution_count == other.execution_count and cell.outputs == other.outputs))
+    )
+
+
+class NotebookHistory:
+    """Bounded history of notebook versions with structural sharing.
+
+    ``commit`` swaps every incoming cell that matches a cell of the current
+    version in content hash, execution count and outputs for that existing Cell
+    object, so versions share all unchanged cells and only hold a tuple of
+    references each. Incoming cells without outputs match on content hash
+    alone and so keep the existing cell's outputs. Each existing Cell replaces
+    at most one incoming cell.
+    """
+
+    def __init__(self, max_versions: int = 100):
+        self.max_versions = max_versions
+        self._versions: "OrderedDict[int, Notebook]" = OrderedDict()
+        self._next_version = 1
+
+    @property
+    def current(self) -> Optional[Notebook]:
+        if not self._versions:
+            return None
+        return next(reversed(self._versions.values()))
+
+    def get(self, version: int) -> Optional[Notebook]:
+        """A retained version, or None if it was never created or has been evicted."""
+        return self._versions.get(version)
+
+    def commit(self, notebook: Notebook, share: bool = True) -> Notebook:
+        """Store ``notebook`` as the next version.
+
+        Args:
+            notebook: The new notebook content
+            share: Reuse unchanged cells of the current version. Pass False when a
+                   different document is loaded, so its cells keep their own outputs.
+        """
+        current = self.current
+        cells = notebook.cells
+        if current is not None and share:
+            previous = current.cells
+            # Unused cells of the current version by content hash; each is reused at most once
+            by_hash: Dict[str, List[Cell]] = {}
+            for cell in previous:
+                by_hash.setdefault(cell.content_hash, []).append(cell)
+            shared: List[Optional[Cell]] = [None] * len(cells)
+            # Prefer the cell at the same position so duplicates keep their identity
+            for index, cell in enumerate(cells):
+                if index < len(previous) and _same_state(previous[index], cell):
+                    shared[index] = previous[index]
+                    by_hash[cell.content_hash].remove(previous[index])
+            for index, cell in enumerate(cells):
+                if shared[index] is None:
+                    candidates = by_hash.get(cell.content_hash, ())
+                    match = next((c for c in candidates if _same_state(c, cell)), None)
+                    if match is not None:
+                        candidates.remove(match)
+                    shared[index] = match or cell
+            cells = shared
+
+        version = notebook.with_cells(cells, self._next_version)
+        self._next_version += 1
+        self._versions[version.version] = version
+        while len(self._versions) > self.max_versions:
+            self._versions.popitem(last=False)
+        return version
+
+    def locate(self, cell: Cell) -> Optional[int]:
+        """Index of this exact Cell object in the current version, if still present."""
+        current = self.current
+        if current is None:
+            return None
+        for index, candidate in enumerate(current.cells):
+            if candidate is cell:
+                return index
+        return None
+
+    def is_unchanged(self, cell: Cell, index: int) -> bool:
+        """Whether ``cell`` is still at ``index`` in the current version."""
+        current = self.current
+        return current is not None and index < len(current.cells) and current.cells[index] is cell
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of retained versions and of distinct cells they share."""
+        unique = {id(cell) for version in self._versions.values() for cell in version.cells}
+        current = self.current
+        return {
+            "versions": len(self._versions),
+            "current_version": current.version if current is not None else None,
+            "current_cells": len(current.cells) if current is not None else 0,
+            "unique_cells": len(unique),
+        }
@@ -0,0 +1,259 @@
+"""Chunked, optionally compressed notebook uploads.
+
+Large notebooks are sent as a ``notebook_upload_start`` message, a series of
+binary WebSocket frames and a ``notebook_upload_end`` message. The frames are
+decompressed and parsed as they arrive: every cell is decoded with
+``json.loads`` as soon as its closing brace is seen and its raw text is dropped,
+so peak memory stays close to the size of the parsed notebook instead of
+holding the compressed payload, the raw JSON and the parsed document at once.
+"""
+
+import codecs
+import json
+import logging
+import re
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the decompressed size of one notebook
+MAX_NOTEBOOK_BYTES = 512 * 1024 * 1024
+
+# Decompressed bytes handed to the parser at a time, so a highly compressible
+# chunk does not inflate into one huge buffer
+DECOMPRESS_STEP = 1024 * 1024
+
+SUPPORTED_COMPRESSION = ("none", "gzip", "deflate")
+
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+
+
+class NotebookUploadError(Exception):
+    """Raised when an upload is malformed or exceeds its limits."""
+
+
+class IncrementalNotebookParser:
+    """Parse a notebook JSON document incrementally, one cell at a time.
+
+    Only the structure of the document is scanned; string contents are skipped
+    with ``str.find`` so large base64 outputs cost a memchr, not a Python loop.
+    Everything outside the top-level ``cells`` array (metadata, nbformat...) is
+    kept as text and parsed once at the end.
+    """
+
+    def __init__(
+        self,
+        compression: str = "none",
+        on_cell: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        max_bytes: int = MAX_NOTEBOOK_BYTES,
+    ):
+        """Initialize the parser.
+
+        Args:
+            compression: One of "none", "gzip" or "deflate"
+            on_cell: Optional hook applied to every parsed cell; its return value is stored
+            max_bytes: Maximum decompressed size accepted
+        """
+        if compression not in SUPPORTED_COMPRESSION:
+            raise NotebookUploadError(f"Unsupported compression: {compression}")
+        # wbits | 32 auto-detects gzip and zlib headers
+        self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32) if compression != "none" else None
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._on_cell = on_cell
+        self.max_bytes = max_bytes
+        self.decoded_bytes = 0
+
+        self.cells: List[Dict[str, Any]] = []
+        self._skeleton: List[str] = []
+        self._buf = ""
+        self._pos = 0            # next index to scan
+        self._emit_from = 0      # start of skeleton text not yet emitted
+        self._depth = 0
+        self._last_key: Optional[str] = None
+        self._cells_depth: Optional[int] = None   # depth inside the cells array
+        self._cells_done = False
+        self._cell_start: Optional[int] = None
+
+    def feed(self, data: bytes) -> None:
+        """Feed the next chunk of the (possibly compressed) payload."""
+        if self._decompressor is None:
+            self._feed_decompressed(data)
+            return
+        while data:
+            self._feed_decompressed(self._decompressor.decompress(data, DECOMPRESS_STEP))
+            data = self._decompressor.unconsumed_tail
+
+    def _feed_decompressed(self, data: bytes) -> None:
+        self.decoded_bytes += len(data)
+        if self.decoded_bytes > self.max_bytes:
+            raise NotebookUploadError(f"Notebook exceeds {self.max_bytes} bytes")
+        text = self._decoder.decode(data)
+        if text:
+            self._buf += text
+            self._scan()
+            self._trim()
+
+    def _scan(self) -> None:
+        buf = self._buf
+        while True:
+            match = _STRUCTURAL.search(buf, self._pos)
+            if match is None:
+                self._pos = len(buf)
+                return
+            index = match.start()
+            char = buf[index]
+
+            if char == '"':
+                end = self._string_end(buf, index + 1)
+                if end is None:
+                    # Incomplete string: resume from its opening quote next time
+                    self._pos = index
+                    return
+                if self._depth == 1:
+                    self._last_key = json.loads(buf[index:end + 1])
+                self._pos = end + 1
+                continue
+
+            self._pos = index + 1
+            if char in "{[":
+                self._depth += 1
+                if (char == "[" and self._depth == 2 and self._cells_depth is None
+                        and not self._cells_done and self._last_key == "cells"):
+                    # Keep "[" in the skeleton; cells are collected separately
+                    self._skeleton.append(buf[self._emit_from:index + 1])
+                    self._cells_depth = 2
+                elif char == "{" and self._cells_depth is not None and self._depth == self._cells_depth + 1:
+                    self._cell_start = index
+            else:
+                if self._cell_start is not None and self._depth == self._cells_depth + 1:
+                    self._add_cell(buf[self._cell_start:index + 1])
+                    self._cell_start = None
+                elif self._cells_depth is not None and self._depth == self._cells_depth:
+                    # End of the cells array
+                    self._emit_from = index
+                    self._cells_depth = None
+                    self._cells_done = True
+                self._depth -= 1
+                if self._depth < 0:
+                    raise NotebookUploadError("Unbalanced JSON document")
+
+    @staticmethod
+    def _string_end(buf: str, start: int) -> Optional[int]:
+        """Index of the closing quote of a string starting at ``start``, if present."""
+        while True:
+            end = buf.find('"', start)
+            if end == -1:
+                return None
+            backslashes = 0
+            check = end - 1
+            while check >= start and buf[check] == "\\":
+                backslashes += 1
+                check -= 1
+            if backslashes % 2 == 0:
+                return end
+            start = end + 1
+
+    def _add_cell(self, text: str) -> None:
+        try:
+            cell = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise NotebookUploadError(f"Invalid cell {len(self.cells)}: {e}")
+        if self._on_cell is not None:
+            cell = self._on_cell(cell)
+        self.cells.append(cell)
+
+    def _trim(self) -> None:
+        """Drop text that has been parsed or moved to the skeleton."""
+        if self._cells_depth is None:
+            cut = self._pos
+            self._skeleton.append(self._buf[self._emit_from:cut])
+        elif self._cell_start is not None:
+            cut = self._cell_start
+        else:
+            cut = self._pos
+        if cut == 0:
+            return
+        self._buf = self._buf[cut:]
+        self._pos -= cut
+        self._emit_from = 0
+        if self._cell_start is not None:
+            self._cell_start -= cut
+
+    def close(self) -> Dict[str, Any]:
+        """Finish parsing and return the notebook dict."""
+        if self._decompressor is not None:
+            self._feed_decompressed(self._decompressor.flush())
+        tail = self._decoder.decode(b"", final=True)
+        if tail:
+            self._buf += tail
+            self._scan()
+            self._trim()
+        self._skeleton.append(self._buf[self._emit_from:])
+        self._buf = ""
+
+        if not self._cells_done:
+            raise NotebookUploadError("Invalid notebook format: no complete cells array")
+        try:
+            notebook = json.loads("".join(self._skeleton))
+        except json.JSONDecodeError as e:
+            raise NotebookUploadError(f"Failed to parse notebook content: {e}")
+        self._skeleton = []
+        if not isinstance(notebook, dict):
+            raise NotebookUploadError("Invalid notebook format")
+        notebook["cells"] = self.cells
+        return notebook
+
+
+class NotebookUpload:
+    """State of one in-progress chunked upload on a connection."""
+
+    def __init__(
+        self,
+        upload_id: str,
+        path: Optional[str],
+        total_bytes: int,
+        compression: str = "none",
+        event: str = "notebook_opened",
+        on_cell: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    ):
+        self.upload_id = upload_id
+        self.path = path
+        self.total_bytes = total_bytes
+        self.compression = compression
+        self.event = event
+        self.received_bytes = 0
+        self.chunks = 0
+        self.started_at = time.monotonic()
+        self.parser = IncrementalNotebookParser(compression, on_cell=on_cell)
+
+    def add_chunk(self, data: bytes) -> None:
+        """Consume the next binary frame."""
+        self.received_bytes += len(data)
+        self.chunks += 1
+        if self.total_bytes and self.received_bytes > self.total_bytes:
+            raise NotebookUploadError(
+                f"Received {self.received_bytes} bytes, more than the announced {self.total_bytes}"
+            )
+        self.parser.feed(data)
+
+    def progress(self) -> Dict[str, Any]:
+        """Progress message sent back to the uploading client."""
+        return {
+            "type": "upload_progress",
+            "upload_id": self.upload_id,
+            "received": self.received_bytes,
+            "total": self.total_bytes,
+            "cells": len(self.parser.cells),
+        }
+
+    def finish(self) -> Dict[str, Any]:
+        """Complete the upload and return the parsed notebook."""
+        notebook = self.parser.close()
+        elapsed = time.monotonic() - self.started_at
+        logger.info(
+            f"Upload {self.upload_id} complete: {self.received_bytes} bytes in {self.chunks} chunks, "
+            f"{self.parser.decoded_bytes} bytes decoded, {len(notebook['cells'])} cells, {elapsed:.2f}s"
+        )
+        return notebook
@@ -0,0 +1,233 @@
+"""Persistent cache of scraped pages.
+
+Pages are stored in SQLite keyed by normalized URL, with the raw HTML
+(zlib-compressed), the text extracted from it and its main content, so a repeated scrape within
+the TTL is a single indexed lookup with no fetch or parse. Expired entries
+keep their ETag / Last-Modified validators for a conditional re-fetch, and the
+least recently used entries are evicted when the cache exceeds its size cap.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+DEFAULT_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Bumped when the table layout changes; an older cache is discarded
+SCHEMA_VERSION = 2
+
+# Query parameters that do not change page content
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical cache key: lowercase scheme and host, no default port, fragment or tracking parameters."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(_TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+@dataclass
+class CachedPage:
+    url: str
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    expires_at: float
+    content: Optional[str] = None
+    title: Optional[str] = None
+    quality: Optional[float] = None
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class PageCache:
+    """SQLite-backed page cache with TTL, conditional revalidation and LRU eviction."""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL_SECONDS):
+        """Open or create the cache.
+
+        Args:
+            path: SQLite database file; its directory is created if missing
+            max_bytes: Size cap for stored HTML and text
+            ttl: Seconds a page is served without revalidation
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Writes may come from worker threads; the lock serializes all access
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS pages")
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                html BLOB,
+                text TEXT NOT NULL,
+                content TEXT,
+                title TEXT,
+                quality REAL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Look up a page, fresh or expired. Counts a hit only for fresh pages."""
+        key = normalize_url(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, text, etag, last_modified, fetched_at, expires_at, content, title, quality "
+                "FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            page = CachedPage(*row)
+            if page.fresh:
+                self.stats["hits"] += 1
+                self._db.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            else:
+                self.stats["stale"] += 1
+            return page
+
+    def get_html(self, url: str) -> Optional[str]:
+        """Raw HTML of a cached page."""
+        with self._lock:
+            row = self._db.execute("SELECT html FROM pages WHERE key = ?", (normalize_url(url),)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(
+        self,
+        url: str,
+        html: Optional[str],
+        text: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        ttl: Optional[float] = None,
+        content: Optional[str] = None,
+        title: Optional[str] = None,
+        quality: Optional[float] = None,
+    ) -> None:
+        """Store a fetched page and its extracted text, evicting old pages if over the size cap."""
+        now = time.time()
+        blob = zlib.compress(html.encode("utf-8"), 6) if html else None
+        size = (len(blob) if blob else 0) + len(text.encode("utf-8")) + len((content or "").encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        key = normalize_url(url)
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM pages WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, blob, text, content, title, quality, etag, last_modified,
+                 now, now + (self.ttl if ttl is None else ttl), now, size),
+            )
+            self._size += size - (previous[0] if previous else 0)
+            self.stats["stores"] += 1
+            if self._size > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def refresh(self, url: str, ttl: Optional[float] = None) -> None:
+        """Extend a page's lifetime after a 304 Not Modified response."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE pages SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                (now + (self.ttl if ttl is None else ttl), now, normalize_url(url)),
+            )
+            self.stats["revalidated"] += 1
+
+    def _evict(self, target_bytes: int) -> None:
+        """Delete least recently used pages until the total size is at most ``target_bytes``."""
+        rows = self._db.execute("SELECT key, size FROM pages ORDER BY accessed_at").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._size <= target_bytes:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._db.executemany("DELETE FROM pages WHERE key = ?", evicted)
+        self.stats["evictions"] += len(evicted)
+        logger.info(f"Evicted {len(evicted)} pages from the page cache")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM pages")
+            self._size = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["stale"] + self.stats["misses"]
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_page_cache: Optional[PageCache] = None
+
+def get_page_cache() -> PageCache:
+    """Get or create the global page cache instance."""
+    global _page_cache
+    if _page_cache is None:
+        path = os.getenv("PAGE_CACHE_PATH", os.path.join("uploads", "page_cache.sqlite3"))
+        _page_cache = PageCache(path)
+        logger.info(f"Page cache at {os.path.abspath(path)}")
+    return _page_cache
+
+def close_page_cache() -> None:
+    """Close the global page cache's database if it was opened."""
+    global _page_cache
+    if _page_cache is not None:
+        cache, _page_cache = _page_cache, None
+        cache.close()
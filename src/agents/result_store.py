@@ -0,0 +1,153 @@
+"""Server-side storage for oversized tool results.
+
+Tool messages stay in the conversation and are re-sent on every later LLM
+call, so a single large scrape or search result inflates every following
+prompt. Results above ``SPILL_THRESHOLD_TOKENS`` are kept here under a handle;
+the model only gets a preview, the total size and the handle, and pages
+through the rest with the ``read_result`` tool. Tools that budget their own
+output are registered with ``spill=False`` and passed through.
+
+Once a turn is over, its tool results are compacted in the message history:
+anything above ``HISTORY_RESULT_TOKENS`` is replaced by a short preview and a
+handle, so results (including ``read_result`` pages) are only paid for in full
+during the turn that needed them.
+"""
+
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.agents.utils import CHARS_PER_TOKEN, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Results estimated above this many tokens are spilled to the store
+SPILL_THRESHOLD_TOKENS = int(os.getenv("TOOL_RESULT_SPILL_TOKENS", "2000"))
+
+# Characters of a spilled result included inline as a preview
+PREVIEW_CHARS = 2000
+
+# Tool results from earlier turns above this many tokens are compacted in the history
+HISTORY_RESULT_TOKENS = int(os.getenv("TOOL_RESULT_HISTORY_TOKENS", "250"))
+
+# Characters of a compacted result kept in the history
+HISTORY_PREVIEW_CHARS = 400
+
+# Largest page ``read`` returns, so paged reads are never spilled themselves
+MAX_PAGE_CHARS = SPILL_THRESHOLD_TOKENS * CHARS_PER_TOKEN
+
+
+class ResultStore:
+    """Bounded LRU map from handles to tool result text."""
+
+    def __init__(self, max_entries: int = 200, max_chars: int = 32 * 1024 * 1024):
+        """Initialize the store.
+
+        Args:
+            max_entries: Maximum number of stored results
+            max_chars: Maximum total characters held; least recently used results are evicted first
+        """
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._chars = 0
+        self.stats = {"spilled": 0, "passed_through": 0, "reads": 0, "evicted": 0, "chars_spilled": 0,
+                      "compacted": 0, "chars_compacted": 0}
+
+    def put(self, tool: str, text: str) -> str:
+        """Store ``text`` and return its handle."""
+        handle = f"r-{uuid.uuid4().hex[:12]}"
+        self._results[handle] = {"tool": tool, "text": text}
+        self._chars += len(text)
+        while self._results and (len(self._results) > self.max_entries or self._chars > self.max_chars):
+            _, evicted = self._results.popitem(last=False)
+            self._chars -= len(evicted["text"])
+            self.stats["evicted"] += 1
+        return handle
+
+    def get(self, handle: str) -> Optional[str]:
+        entry = self._results.get(handle)
+        if entry is None:
+            return None
+        self._results.move_to_end(handle)
+        return entry["text"]
+
+    def spill(self, tool: str, text: str) -> str:
+        """Return ``text`` unchanged if small, otherwise a preview pointing at a stored handle."""
+        if estimate_tokens(text) <= SPILL_THRESHOLD_TOKENS:
+            self.stats["passed_through"] += 1
+            return text
+
+        handle = self.put(tool, text)
+        preview = _cut(text, 0, PREVIEW_CHARS)
+        self.stats["spilled"] += 1
+        self.stats["chars_spilled"] += len(text)
+        logger.info(f"Spilled {len(text)} characters from {tool} to {handle}")
+        return (
+            f"{preview}\n\n"
+            f"[Result truncated: {len(text)} characters (~{estimate_tokens(text)} tokens) in total, "
+            f"{len(preview)} shown. The full result is stored as handle \"{handle}\"; "
+            f"call read_result with offset {len(preview)} to continue reading.]"
+        )
+
+    def compact(self, tool: str, text: str) -> str:
+        """Shorten a tool result from a finished turn to a preview and a handle."""
+        if estimate_tokens(text) <= HISTORY_RESULT_TOKENS:
+            return text
+        self.stats["compacted"] += 1
+        self.stats["chars_compacted"] += len(text)
+        if tool == "read_result":
+            # The page is already stored; the tool call in the history names its handle and offset
+            return ("[Page of a stored result read in an earlier turn. Call read_result with the "
+                    "same handle and offset to read it again.]")
+        handle = self.put(tool, text)
+        preview = _cut(text, 0, HISTORY_PREVIEW_CHARS)
+        return (
+            f"{preview}\n\n"
+            f"[Result from an earlier turn shortened: {len(text)} characters (~{estimate_tokens(text)} tokens) "
+            f"stored as handle \"{handle}\"; call read_result with offset {len(preview)} to read the rest.]"
+        )
+
+    def read(self, handle: str, offset: int = 0, length: int = MAX_PAGE_CHARS) -> str:
+        """One page of a stored result starting at character ``offset``."""
+        text = self.get(handle)
+        if text is None:
+            return f"Error: unknown or expired result handle \"{handle}\""
+        self.stats["reads"] += 1
+        if not 0 <= offset < len(text):
+            return f"Error: offset {offset} out of range, the result has {len(text)} characters"
+
+        length = max(1, min(length, MAX_PAGE_CHARS))
+        page = _cut(text, offset, length)
+        end = offset + len(page)
+        if end >= len(text):
+            footer = f"[Characters {offset}-{end} of {len(text)}; end of result.]"
+        else:
+            footer = f"[Characters {offset}-{end} of {len(text)}; next offset {end}.]"
+        return f"{page}\n\n{footer}"
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._results), "chars": self._chars}
+
+
+def _cut(text: str, offset: int, length: int) -> str:
+    """Slice ``length`` characters from ``offset``, ending at a line break when one is close."""
+    end = offset + length
+    if end >= len(text):
+        return text[offset:]
+    newline = text.rfind("\n", offset, end)
+    if newline > offset + length // 2:
+        end = newline + 1
+    return text[offset:end]
+
+
+_result_store: Optional[ResultStore] = None
+
+def get_result_store() -> ResultStore:
+    """Get or create the global result store instance."""
+    global _result_store
+    if _result_store is None:
+        _result_store = ResultStore()
+    return _result_store
@@ -0,0 +1,188 @@
+"""Server-wide scheduler for web scrapes.
+
+All sessions share one scheduler. Network fetches are bounded by a global cap
+and a per-domain cap (acquired domain first, so a busy domain does not hold
+global slots), each URL has its own deadline counted from when it holds its
+slots, and a batch returns whatever finished by its deadline instead of
+waiting for the slowest page. Concurrent
+requests for the same URL, from one batch or from different users, share a
+single fetch; a fetch that outlives its batch keeps running and lands in the
+page cache for the next request.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import urlparse
+
+from src.agents.page_cache import normalize_url
+from src.agents.web_scraper import ScrapedPage, scrape_page
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT = int(os.getenv("SCRAPE_MAX_CONCURRENT", "8"))
+DEFAULT_PER_DOMAIN = int(os.getenv("SCRAPE_PER_DOMAIN", "2"))
+# Above the slowest fetch: HTTP timeout (10s), then browser navigation (15s) and settle (1.5s)
+DEFAULT_URL_DEADLINE = float(os.getenv("SCRAPE_URL_DEADLINE", "30"))
+# Below the scrape_websites tool timeout, so partial results get returned; a URL
+# that queued for a slot may still be fetching when it passes
+DEFAULT_BATCH_DEADLINE = float(os.getenv("SCRAPE_BATCH_DEADLINE", "45"))
+
+
+class _DomainSlot:
+    """Concurrency limit for one domain, dropped once no fetch uses it."""
+
+    __slots__ = ("semaphore", "users")
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class ScrapeScheduler:
+    """Shared scrape queue with global and per-domain limits, deadlines and in-flight dedup."""
+
+    def __init__(
+        self,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        per_domain: int = DEFAULT_PER_DOMAIN,
+        url_deadline: float = DEFAULT_URL_DEADLINE,
+        batch_deadline: float = DEFAULT_BATCH_DEADLINE,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            max_concurrent: Maximum fetches running at once across all sessions
+            per_domain: Maximum fetches running at once against one domain
+            url_deadline: Seconds a URL's fetch may take once it holds its slots
+            batch_deadline: Seconds before a batch returns with what has finished
+        """
+        self.max_concurrent = max_concurrent
+        self.per_domain = per_domain
+        self.url_deadline = url_deadline
+        self.batch_deadline = batch_deadline
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._domains: Dict[str, _DomainSlot] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._active = 0
+        self._waiting = 0
+        self.stats = {
+            "requested": 0,
+            "deduplicated": 0,
+            "completed": 0,
+            "failed": 0,
+            "url_timeouts": 0,
+            "batches": 0,
+            "partial_batches": 0,
+        }
+
+    @asynccontextmanager
+    async def _slot(self, domain: str) -> AsyncIterator[None]:
+        """Hold a domain slot and then a global slot for one network fetch."""
+        slot = self._domains.get(domain)
+        if slot is None:
+            slot = self._domains[domain] = _DomainSlot(self.per_domain)
+        slot.users += 1
+        try:
+            self._waiting += 1
+            try:
+                await slot.semaphore.acquire()
+                try:
+                    await self._global.acquire()
+                except BaseException:
+                    slot.semaphore.release()
+                    raise
+            finally:
+                self._waiting -= 1
+            self._active += 1
+            try:
+                yield
+            finally:
+                self._active -= 1
+                self._global.release()
+                slot.semaphore.release()
+        finally:
+            slot.users -= 1
+            if slot.users == 0:
+                self._domains.pop(domain, None)
+
+    async def _run(self, url: str) -> ScrapedPage:
+        domain = (urlparse(url).hostname or "").lower()
+        started = time.perf_counter()
+        try:
+            # Time spent waiting for a slot does not count against the deadline
+            page = await scrape_page(url, lambda: self._slot(domain), fetch_timeout=self.url_deadline)
+        except asyncio.TimeoutError:
+            self.stats["url_timeouts"] += 1
+            logger.warning(f"Scraping {url} exceeded the {self.url_deadline:g}s deadline")
+            return ScrapedPage(url, "", error=f"timed out after {self.url_deadline:g}s")
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"Error scraping {url}: {e}")
+            return ScrapedPage(url, "", error=str(e))
+        self.stats["completed" if page.error is None else "failed"] += 1
+        logger.info(f"Scraped {url} in {time.perf_counter() - started:.2f}s")
+        return page
+
+    def submit(self, url: str) -> asyncio.Task:
+        """Start scraping a URL, or join the fetch already in flight for it."""
+        self.stats["requested"] += 1
+        key = normalize_url(url)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["deduplicated"] += 1
+            return task
+        task = asyncio.create_task(self._run(url))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def scrape(self, urls: List[str], deadline: Optional[float] = None) -> List[ScrapedPage]:
+        """Scrape URLs, returning by the batch deadline with partial results.
+
+        Pages not finished in time come back empty with an error; their fetches
+        continue in the background and are served from the cache next time.
+
+        Args:
+            urls: URLs to scrape; results are in the same order
+            deadline: Seconds to wait for the batch, defaults to the scheduler's batch deadline
+        """
+        deadline = self.batch_deadline if deadline is None else deadline
+        tasks = [self.submit(url) for url in urls]
+        self.stats["batches"] += 1
+        if not tasks:
+            return []
+        # asyncio.wait never cancels the tasks, which other batches may share
+        done, pending = await asyncio.wait(set(tasks), timeout=deadline)
+        if pending:
+            self.stats["partial_batches"] += 1
+            logger.info(f"Scrape batch returned after {deadline:g}s with {len(pending)} pages still loading")
+        return [
+            task.result() if task in done
+            else ScrapedPage(url, "", error=f"still loading after {deadline:g}s; try again shortly")
+            for url, task in zip(urls, tasks)
+        ]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "in_flight": len(self._inflight),
+            "fetching": self._active,
+            "waiting_for_slot": self._waiting,
+            "busy_domains": {domain: slot.users for domain, slot in self._domains.items()},
+            "max_concurrent": self.max_concurrent,
+            "per_domain": self.per_domain,
+        }
+
+
+_scrape_scheduler: Optional[ScrapeScheduler] = None
+
+def get_scrape_scheduler() -> ScrapeScheduler:
+    """Get or create the global scrape scheduler instance."""
+    global _scrape_scheduler
+    if _scrape_scheduler is None:
+        _scrape_scheduler = ScrapeScheduler()
+    return _scrape_scheduler
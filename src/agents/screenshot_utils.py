@@ -1,45 +1,300 @@
 #!/usr/bin/env python3
+"""Webpage screenshots taken with the shared browser pool.
+
+Screenshots are viewport-sized by default, optionally full-page with a height
+cap, and saved as JPEG, PNG or WebP, optionally downscaled. WebP output and
+downscaling need Pillow; without it WebP falls back to JPEG and images are
+kept at their captured size. Files without an explicit output path go to a
+managed directory and are deleted once older than the TTL.
+"""
 
 import asyncio
-from playwright.async_api import async_playwright
+import io
+import logging
+import os
 import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from src.agents.browser_pool import BrowserPool, get_browser_pool
+
+try:
+    from PIL import Image
+except ImportError:  # Optional: WebP output and downscaling
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOT_DIR = os.getenv("SCREENSHOT_DIR", os.path.join(tempfile.gettempdir(), "jupyter-assistant-screenshots"))
+SCREENSHOT_TTL_SECONDS = float(os.getenv("SCREENSHOT_TTL", "3600"))
+IMAGE_FORMATS = ("jpeg", "png", "webp")
+DEFAULT_QUALITY = 80
+NAVIGATION_TIMEOUT_MS = int(os.getenv("SCREENSHOT_NAVIGATION_TIMEOUT_MS", "20000"))
+# After the load event, wait at most this long for the network to go idle
+SETTLE_MS = int(os.getenv("SCREENSHOT_SETTLE_MS", "2000"))
+
+_EXTENSIONS = {"jpeg": ".jpg", "png": ".png", "webp": ".webp"}
+_FORMATS_BY_EXTENSION = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png", ".webp": "webp"}
+
+
+@dataclass
+class ScreenshotResult:
+    url: str
+    path: Optional[str] = None
+    width: int = 0
+    height: int = 0
+    bytes: int = 0
+    image_format: str = "jpeg"
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return f"Error taking screenshot of {self.url}: {self.error}"
+        return (f"Screenshot of {self.url} saved to: {self.path} "
+                f"({self.width}x{self.height} {self.image_format}, {self.bytes / 1024:.0f} KB)")
+
+
+class ScreenshotService:
+    """Concurrent screenshots on the browser pool with compressed output and temp-file cleanup."""
+
+    def __init__(self, directory: str = SCREENSHOT_DIR, ttl: float = SCREENSHOT_TTL_SECONDS,
+                 pool: Optional[BrowserPool] = None):
+        """Initialize the service.
+
+        Args:
+            directory: Where screenshots without an output path are written
+            ttl: Seconds before managed screenshots are deleted
+            pool: Browser pool to use, defaults to the global one
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self._pool = pool
+        self._last_cleanup = 0.0
+        # Loop the pool's browser runs on, for callers in worker threads
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"captured": 0, "failed": 0, "bytes": 0, "seconds": 0.0, "deleted": 0}
+
+    @property
+    def pool(self) -> BrowserPool:
+        return self._pool if self._pool is not None else get_browser_pool()
+
+    async def capture(
+        self,
+        url: str,
+        output_path: Optional[str] = None,
+        width: int = 1280,
+        height: int = 720,
+        full_page: bool = False,
+        max_height: Optional[int] = None,
+        image_format: Optional[str] = None,
+        quality: int = DEFAULT_QUALITY,
+        max_width: Optional[int] = None,
+    ) -> ScreenshotResult:
+        """Take one screenshot. Errors are returned in the result, not raised.
+
+        Args:
+            url: Page to capture
+            output_path: File to write; defaults to a managed temporary file
+            width: Viewport width
+            height: Viewport height
+            full_page: Capture the whole scrollable page instead of the viewport
+            max_height: Cap on the captured height in full-page mode
+            image_format: "jpeg", "png" or "webp"; inferred from the extension of
+                          ``output_path`` if None, otherwise "jpeg"
+            quality: JPEG/WebP quality (1-100)
+            max_width: Downscale images wider than this (needs Pillow)
+        """
+        self.loop = asyncio.get_running_loop()
+        path_format = _FORMATS_BY_EXTENSION.get(os.path.splitext(output_path)[1].lower()) if output_path else None
+        if image_format is None:
+            image_format = path_format or "jpeg"
+        if image_format not in IMAGE_FORMATS:
+            return ScreenshotResult(url, error=f"unsupported format {image_format!r}, use one of {', '.join(IMAGE_FORMATS)}")
+        if path_format is not None and path_format != image_format:
+            return ScreenshotResult(url, error=f"output path {output_path!r} does not match image format {image_format!r}")
+        if image_format == "webp" and Image is None:
+            if output_path:
+                return ScreenshotResult(url, error="WebP output needs Pillow, which is not installed")
+            logger.info("Pillow is not installed; saving JPEG instead of WebP")
+            image_format = "jpeg"
+        self.cleanup_if_due()
+
+        started = time.perf_counter()
+        try:
+            async with self.pool.page(viewport={"width": width, "height": height}) as page:
+                await page.goto(url, wait_until="load", timeout=NAVIGATION_TIMEOUT_MS)
+                try:
+                    await page.wait_for_load_state("networkidle", timeout=SETTLE_MS)
+                except Exception:
+                    pass  # Pages that keep polling never go idle
+                options: Dict[str, Any] = {"full_page": full_page}
+                if full_page and max_height:
+                    page_height = await page.evaluate("document.documentElement.scrollHeight")
+                    options["clip"] = {"x": 0, "y": 0, "width": width, "height": min(page_height, max_height)}
+                # Playwright writes PNG or JPEG; WebP is converted from PNG
+                if image_format == "jpeg":
+                    options.update(type="jpeg", quality=quality)
+                else:
+                    options["type"] = "png"
+                data = await page.screenshot(**options)
+            data, size = await asyncio.to_thread(self._encode, data, image_format, quality, max_width)
+            path = output_path or os.path.join(self.directory, f"{uuid.uuid4().hex}{_EXTENSIONS[image_format]}")
+            await asyncio.to_thread(self._write, path, data)
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"Error taking screenshot of {url}: {e}")
+            return ScreenshotResult(url, image_format=image_format, seconds=time.perf_counter() - started, error=str(e))
+
+        elapsed = time.perf_counter() - started
+        self.stats["captured"] += 1
+        self.stats["bytes"] += len(data)
+        self.stats["seconds"] += elapsed
+        return ScreenshotResult(url, path, size[0], size[1], len(data), image_format, elapsed)
+
+    async def capture_many(self, urls: List[str], **options: Any) -> List[ScreenshotResult]:
+        """Screenshot several pages concurrently, bounded by the browser pool. Options as for ``capture``."""
+        return list(await asyncio.gather(*(self.capture(url, **options) for url in urls)))
+
+    @staticmethod
+    def _encode(data: bytes, image_format: str, quality: int, max_width: Optional[int]):
+        """Convert and downscale captured image bytes. Returns (bytes, (width, height))."""
+        if Image is None:
+            if max_width:
+                logger.info("Pillow is not installed; screenshots are not downscaled")
+            return data, _image_size(data)
+        image = Image.open(io.BytesIO(data))
+        if max_width and image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+        elif image_format != "webp":
+            # Already in the requested format and size
+            return data, image.size
+        buffer = io.BytesIO()
+        if image_format == "png":
+            image.save(buffer, format="PNG", optimize=True)
+        else:
+            image.convert("RGB").save(buffer, format=image_format.upper(), quality=quality)
+        return buffer.getvalue(), image.size
 
-async def take_screenshot(url: str, output_path: str = None, width: int = 1280, height: int = 720) -> str:
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def cleanup(self) -> int:
+        """Delete managed screenshots older than the TTL. Returns the number deleted."""
+        self._last_cleanup = time.time()
+        cutoff = self._last_cleanup - self.ttl
+        deleted = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    deleted += 1
+            except OSError as e:
+                logger.debug(f"Could not delete old screenshot {entry.path}: {e}")
+        if deleted:
+            self.stats["deleted"] += deleted
+            logger.info(f"Deleted {deleted} screenshots older than {self.ttl:g}s")
+        return deleted
+
+    def cleanup_if_due(self) -> None:
+        """Run cleanup at most ten times per TTL period."""
+        if time.time() - self._last_cleanup > self.ttl / 10:
+            self.cleanup()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "directory": self.directory, "ttl": self.ttl}
+
+
+def _image_size(data: bytes):
+    """Width and height from PNG or JPEG bytes without decoding the image."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+    index = 2
+    while index + 9 < len(data):
+        if data[index] != 0xFF:
+            break
+        marker = data[index + 1]
+        length = int.from_bytes(data[index + 2:index + 4], "big")
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return int.from_bytes(data[index + 7:index + 9], "big"), int.from_bytes(data[index + 5:index + 7], "big")
+        index += 2 + length
+    return 0, 0
+
+
+_screenshot_service: Optional[ScreenshotService] = None
+
+def get_screenshot_service() -> ScreenshotService:
+    """Get or create the global screenshot service instance."""
+    global _screenshot_service
+    if _screenshot_service is None:
+        _screenshot_service = ScreenshotService()
+    return _screenshot_service
+
+
+async def take_screenshot(url: str, output_path: str = None, width: int = 1280, height: int = 720, **options) -> str:
     """
-    Take a screenshot of a webpage using Playwright.
-    
+    Take a screenshot of a webpage with the shared browser pool.
+
     Args:
         url (str): The URL to take a screenshot of
-        output_path (str, optional): Path to save the screenshot. If None, saves to a temporary file.
+        output_path (str, optional): Path to save the screenshot. If None, saves to a managed temporary file.
         width (int, optional): Viewport width. Defaults to 1280.
         height (int, optional): Viewport height. Defaults to 720.
-    
+        **options: Further ScreenshotService.capture options (full_page, max_height, image_format, ...)
+
     Returns:
         str: Path to the saved screenshot
     """
-    if output_path is None:
-        # Create a temporary file with .png extension
-        temp_file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-        output_path = temp_file.name
-        temp_file.close()
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page(viewport={'width': width, 'height': height})
-        
-        try:
-            await page.goto(url, wait_until='networkidle')
-            await page.screenshot(path=output_path, full_page=True)
-        finally:
-            await browser.close()
-    
-    return output_path
-
-def take_screenshot_sync(url: str, output_path: str = None, width: int = 1280, height: int = 720) -> str:
+    result = await get_screenshot_service().capture(url, output_path, width, height, **options)
+    if result.error is not None:
+        raise RuntimeError(result.error)
+    return result.path
+
+
+async def _take_screenshot_once(url: str, output_path: str = None, width: int = 1280, height: int = 720, **options) -> str:
+    """Take a screenshot with a private browser that is closed afterwards (command-line use)."""
+    pool = BrowserPool(max_pages=1)
+    try:
+        result = await ScreenshotService(pool=pool).capture(url, output_path, width, height, **options)
+    finally:
+        await pool.close()
+    if result.error is not None:
+        raise RuntimeError(result.error)
+    return result.path
+
+
+def take_screenshot_sync(url: str, output_path: str = None, width: int = 1280, height: int = 720, **options) -> str:
     """
     Synchronous wrapper for take_screenshot.
+
+    From a worker thread of the running server the screenshot is taken on the
+    server's loop and browser pool; without a running server a private browser
+    is used. Must not be called from the event loop thread itself.
     """
-    return asyncio.run(take_screenshot(url, output_path, width, height))
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError("take_screenshot_sync cannot block the event loop; await take_screenshot instead")
+
+    service = _screenshot_service
+    if service is not None and service.loop is not None and service.loop.is_running():
+        future = asyncio.run_coroutine_threadsafe(
+            take_screenshot(url, output_path, width, height, **options), service.loop)
+        return future.result()
+    return asyncio.run(_take_screenshot_once(url, output_path, width, height, **options))
 
 if __name__ == "__main__":
     import argparse
@@ -48,7 +303,12 @@ if __name__ == "__main__":
     parser.add_argument('--output', '-o', help='Output path for screenshot')
     parser.add_argument('--width', '-w', type=int, default=1280, help='Viewport width')
     parser.add_argument('--height', '-H', type=int, default=720, help='Viewport height')
-    
+    parser.add_argument('--full-page', action='store_true', help='Capture the whole page')
+    parser.add_argument('--max-height', type=int, help='Cap on the full-page height')
+    parser.add_argument('--format', choices=IMAGE_FORMATS, help='Image format (default: from the output extension, else jpeg)')
+    parser.add_argument('--max-width', type=int, help='Downscale images wider than this')
+
     args = parser.parse_args()
-    output_path = take_screenshot_sync(args.url, args.output, args.width, args.height)
-    print(f"Screenshot saved to: {output_path}") 
\ No newline at end of file
+    output_path = take_screenshot_sync(args.url, args.output, args.width, args.height, full_page=args.full_page,
+                                       max_height=args.max_height, image_format=args.format, max_width=args.max_width)
+    print(f"Screenshot saved to: {output_path}")
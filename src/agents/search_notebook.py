@@ -8,23 +8,15 @@ from sentence_transformers import SentenceTransformer
 import numpy as np
 import logging 
 from src.agents.state import get_manager
+from src.agents.notebook_model import Cell, Notebook
 
 logger = logging.getLogger(__name__)
 
-@dataclass
-class NotebookCell:
-    """Represents a single cell in a Jupyter notebook."""
-    cell_type: str
-    content: str
-    metadata: Dict[str, Any]
-    execution_count: Optional[int]
-    outputs: List[Dict[str, Any]]
-
 @dataclass(frozen=True)
 class SearchResult:
     """Represents a single search result with its relevance score."""
     cell_index: int
-    cell: NotebookCell
+    cell: Cell
     score: float
 
 class NotebookSearchEngine:
@@ -47,43 +39,49 @@ class NotebookSearchEngine:
             connection_manager: Instance of ConnectionManager for temporary file handling
         """
         self.model = SentenceTransformer(embedding_model)
-        self.notebook_cells: List[NotebookCell] = []
-        self.cell_embeddings: List[np.ndarray] = []
+        self.notebook_cells: List[Cell] = []
+        self.cell_embeddings: np.ndarray = np.empty((0, 0))
+        # Embeddings of cell sources keyed by Cell.content_hash, so re-indexing
+        # only encodes cells that changed since the last call
+        self._embedding_cache: Dict[str, np.ndarray] = {}
         self.manager = connection_manager
-
-    def _create_cell(self, cell: Dict[str, Any]) -> NotebookCell:
-        """Create a NotebookCell instance from a notebook cell dict."""
-        return NotebookCell(
-            cell_type=cell.get("cell_type", "code"),
-            content="".join(cell.get("source", [])) if isinstance(cell.get("source"), list) else str(cell.get("source", "")),
-            metadata=cell.get("metadata", {}),
-            execution_count=cell.get("execution_count"),
-            outputs=cell.get("outputs", [])
-        )
     
-    def index_notebook(self, notebook: Optional[Dict[str, Any]] = None) -> None:
+    def index_notebook(self, notebook: Optional[Notebook] = None) -> None:
         """Index a notebook for searching using batched processing.
         
         Args:
-            notebook: Optional notebook dict. If not provided, will get from manager.
+            notebook: Optional notebook. If not provided, will get from manager.
         """
         if notebook is None:
             notebook = self.manager.get_notebook_content()
-            if not notebook:
+            if notebook is None:
                 logger.error("No notebook content available in manager")
                 return
         
-        if not isinstance(notebook, dict) or "cells" not in notebook:
+        if not isinstance(notebook, Notebook):
             logger.error("Invalid notebook format")
             return
             
-        # Convert cells to NotebookCell objects
-        self.notebook_cells = [self._create_cell(cell) for cell in notebook["cells"]]
+        self.notebook_cells = list(notebook.cells)
         
-        # Get all cell contents at once
-        contents = [cell.content for cell in self.notebook_cells]
-        # Compute embeddings in one go
-        self.cell_embeddings = self.model.encode(contents, show_progress_bar=False)
+        # Encode only cells whose content is not cached yet, in one batch
+        missing = {}
+        for cell in self.notebook_cells:
+            if cell.content_hash not in self._embedding_cache:
+                missing.setdefault(cell.content_hash, cell.source)
+        if missing:
+            embeddings = self.model.encode(list(missing.values()), show_progress_bar=False)
+            self._embedding_cache.update(zip(missing.keys(), embeddings))
+
+        # Drop embeddings of cells that are no longer in the notebook
+        current = {cell.content_hash for cell in self.notebook_cells}
+        for key in [k for k in self._embedding_cache if k not in current]:
+            del self._embedding_cache[key]
+
+        if self.notebook_cells:
+            self.cell_embeddings = np.stack([self._embedding_cache[cell.content_hash] for cell in self.notebook_cells])
+        else:
+            self.cell_embeddings = np.empty((0, 0))
     
     def search(self, query: str, top_k: int = 5, min_score: float = 0.5) -> List[SearchResult]:
         """Perform semantic search within the current notebook.
@@ -123,7 +121,7 @@ class NotebookSearchEngine:
         
         results = []
         for i, cell in enumerate(self.notebook_cells):
-            content = cell.content.lower()
+            content = cell.source.lower()
             # Use any/all with generator expression for better memory efficiency
             matches = (kw in content for kw in keywords_lower)
             
@@ -171,6 +169,6 @@ async def format_search_results(results: List[SearchResult]) -> str:
             f"\n=== Result {i} ===",
             f"Cell Index: {result.cell_index}",
             f"Cell Type: {cell.cell_type}",
-            f"Content:\n{cell.content}"
+            f"Content:\n{cell.source}"
         ])
     return "\n".join(formatted_results)
\ No newline at end of file
@@ -0,0 +1,323 @@
+"""Declarative registry for agent tools.
+
+Tools are plain (async or sync) functions with ``Annotated`` parameters. The
+``@registry.tool`` decorator turns the signature and docstring into a strict
+OpenAI function schema at import time, and ``registry.call`` runs the tool
+under its timeout and concurrency class while recording per-tool metrics.
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import time
+import typing
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOOL_TIMEOUT = 30.0
+
+# Maximum concurrently running tools per concurrency class; None is unlimited
+DEFAULT_CONCURRENCY_LIMITS: Dict[str, Optional[int]] = {
+    "default": None,
+    "notebook": None,   # In-memory notebook reads and proposals
+    "index": 1,         # Embedding model; one search at a time
+    "web": 4,           # Plain HTTP requests
+    "browser": 2,       # Headless browser pages
+}
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+
+class ToolSchemaError(TypeError):
+    """Raised at registration when a signature cannot be expressed as a strict schema."""
+
+
+def _describe(annotation: Any) -> Tuple[Any, Optional[str]]:
+    """Split ``Annotated[T, "description"]`` into T and the description."""
+    if typing.get_origin(annotation) is typing.Annotated:
+        base, *extras = typing.get_args(annotation)
+        description = next((extra for extra in extras if isinstance(extra, str)), None)
+        return base, description
+    return annotation, None
+
+
+def json_schema(annotation: Any) -> Dict[str, Any]:
+    """Strict-mode JSON schema for a Python type annotation."""
+    annotation, description = _describe(annotation)
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin is Union:
+        members = [arg for arg in args if arg is not type(None)]
+        if len(members) != 1:
+            raise ToolSchemaError(f"Only Optional[...] unions are supported, got {annotation}")
+        schema = json_schema(members[0])
+        if len(members) < len(args):
+            schema["type"] = [schema["type"], "null"]
+            if "enum" in schema:
+                schema["enum"] = schema["enum"] + [None]
+    elif origin is typing.Literal:
+        value_types = {type(value) for value in args}
+        if len(value_types) != 1 or next(iter(value_types)) not in _JSON_TYPES:
+            raise ToolSchemaError(f"Literal values must share one JSON type: {annotation}")
+        schema = {"type": _JSON_TYPES[next(iter(value_types))], "enum": list(args)}
+    elif origin in (list, List, Sequence) or annotation is list:
+        if not args:
+            raise ToolSchemaError("List parameters need an item type")
+        schema = {"type": "array", "items": json_schema(args[0])}
+    elif typing.is_typeddict(annotation):
+        hints = typing.get_type_hints(annotation, include_extras=True)
+        schema = {
+            "type": "object",
+            "properties": {name: json_schema(hint) for name, hint in hints.items()},
+            "required": list(hints),
+            "additionalProperties": False,
+        }
+    elif annotation in _JSON_TYPES:
+        schema = {"type": _JSON_TYPES[annotation]}
+    else:
+        # Strict mode needs every object's properties spelled out; use a TypedDict
+        raise ToolSchemaError(f"Unsupported parameter type {annotation}")
+
+    if description:
+        schema["description"] = description
+    return schema
+
+
+def _docstring_description(func: Callable) -> str:
+    """Docstring with line breaks inside paragraphs joined, used as the tool description."""
+    doc = inspect.getdoc(func) or ""
+    paragraphs = [" ".join(line.strip() for line in block.splitlines()) for block in doc.split("\n\n")]
+    return "\n\n".join(p for p in paragraphs if p)
+
+
+@dataclass
+class ToolStats:
+    """Counters and latency histogram for one tool."""
+    calls: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    cancelled: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    wait_seconds: float = 0.0
+    result_chars: int = 0
+    max_result_chars: int = 0
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def record(self, seconds: float, waited: float, result_chars: int, outcome: str) -> None:
+        self.calls += 1
+        if outcome == "error":
+            self.errors += 1
+        elif outcome == "timeout":
+            self.timeouts += 1
+        elif outcome == "cancelled":
+            self.cancelled += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.wait_seconds += waited
+        self.result_chars += result_chars
+        self.max_result_chars = max(self.max_result_chars, result_chars)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{bound:g}" for bound in LATENCY_BUCKETS] + ["inf"]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "latency": {
+                "total": self.total_seconds,
+                "mean": self.total_seconds / self.calls if self.calls else 0.0,
+                "max": self.max_seconds,
+                "histogram": dict(zip(labels, self.buckets)),
+            },
+            "concurrency_wait_total": self.wait_seconds,
+            "result_chars": {
+                "total": self.result_chars,
+                "mean": self.result_chars / self.calls if self.calls else 0.0,
+                "max": self.max_result_chars,
+            },
+        }
+
+
+@dataclass
+class RegisteredTool:
+    name: str
+    func: Callable
+    schema: Dict[str, Any]
+    timeout: float
+    concurrency: str
+    is_async: bool
+    # False for tools that budget their own output; their results are never spilled
+    spill: bool = True
+    stats: ToolStats = field(default_factory=ToolStats)
+
+
+class ToolRegistry:
+    """Tools by name, with their generated schemas, limits and metrics."""
+
+    def __init__(self, concurrency_limits: Optional[Dict[str, Optional[int]]] = None):
+        self.concurrency_limits = dict(DEFAULT_CONCURRENCY_LIMITS)
+        if concurrency_limits:
+            self.concurrency_limits.update(concurrency_limits)
+        self._tools: Dict[str, RegisteredTool] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def tool(
+        self,
+        name: Optional[str] = None,
+        timeout: float = DEFAULT_TOOL_TIMEOUT,
+        concurrency: str = "default",
+        hidden: Sequence[str] = (),
+        description: Optional[str] = None,
+        spill: bool = True,
+    ) -> Callable[[Callable], Callable]:
+        """Register a function as a tool.
+
+        Args:
+            name: Tool name, defaults to the function name
+            timeout: Seconds before the call is abandoned
+            concurrency: Concurrency class limiting how many such tools run at once
+            hidden: Parameters with defaults that are not exposed to the model
+            description: Tool description, defaults to the docstring
+            spill: Whether oversized results go to the result store; pass False
+                for tools that already limit their output to a token budget
+        """
+        def decorator(func: Callable) -> Callable:
+            tool_name = name or func.__name__
+            if tool_name in self._tools:
+                raise ToolSchemaError(f"Tool {tool_name} is already registered")
+            if concurrency not in self.concurrency_limits:
+                raise ToolSchemaError(f"Unknown concurrency class {concurrency!r} for {tool_name}")
+            self._tools[tool_name] = RegisteredTool(
+                name=tool_name,
+                func=func,
+                schema=self._build_schema(tool_name, func, hidden, description),
+                timeout=timeout,
+                concurrency=concurrency,
+                is_async=asyncio.iscoroutinefunction(func),
+                spill=spill,
+            )
+            return func
+        return decorator
+
+    @staticmethod
+    def _build_schema(name: str, func: Callable, hidden: Sequence[str], description: Optional[str]) -> Dict[str, Any]:
+        hints = typing.get_type_hints(func, include_extras=True)
+        properties = {}
+        for param in inspect.signature(func).parameters.values():
+            if param.name in hidden:
+                if param.default is inspect.Parameter.empty:
+                    raise ToolSchemaError(f"{name}: hidden parameter {param.name} needs a default")
+                continue
+            if param.name not in hints:
+                raise ToolSchemaError(f"{name}: parameter {param.name} has no type annotation")
+            properties[param.name] = json_schema(hints[param.name])
+        return {
+            "type": "function",
+            "function": {
+                "name": name,
+                "description": description or _docstring_description(func),
+                "parameters": {
+                    "type": "object",
+                    "properties": properties,
+                    # Strict mode: every property is required, optional ones are nullable
+                    "required": list(properties),
+                    "additionalProperties": False,
+                },
+                "strict": True,
+            },
+        }
+
+    def schemas(self) -> List[Dict[str, Any]]:
+        """Function schemas of all registered tools, in registration order."""
+        return [tool.schema for tool in self._tools.values()]
+
+    def get(self, name: str) -> Optional[RegisteredTool]:
+        return self._tools.get(name)
+
+    def spills(self, name: str) -> bool:
+        """Whether an oversized result of this tool should be spilled to the result store."""
+        tool = self._tools.get(name)
+        return tool is None or tool.spill
+
+    def _semaphore(self, concurrency: str) -> Optional[asyncio.Semaphore]:
+        limit = self.concurrency_limits.get(concurrency)
+        if limit is None:
+            return None
+        if concurrency not in self._semaphores:
+            self._semaphores[concurrency] = asyncio.Semaphore(limit)
+        return self._semaphores[concurrency]
+
+    async def call(self, name: str, args: Union[str, Dict[str, Any]]) -> Any:
+        """Call a tool by name with JSON or dict arguments. Errors are returned as strings."""
+        if isinstance(args, str):
+            try:
+                args = json.loads(args) if args.strip() else {}
+            except json.JSONDecodeError:
+                return f"Error: Invalid JSON arguments - {args}"
+
+        tool = self._tools.get(name)
+        if tool is None:
+            return f"Error: Unknown function {name}"
+
+        started = time.perf_counter()
+        waited = 0.0
+        outcome = "cancelled"  # Unless the call completes or fails below
+        result: Any = None
+        try:
+            semaphore = self._semaphore(tool.concurrency)
+            if semaphore is not None:
+                await semaphore.acquire()
+                waited = time.perf_counter() - started
+            try:
+                # Await async tools, run regular ones in a worker thread so they
+                # neither block the event loop nor escape the timeout
+                if tool.is_async:
+                    result = await asyncio.wait_for(tool.func(**args), tool.timeout)
+                else:
+                    result = await asyncio.wait_for(asyncio.to_thread(tool.func, **args), tool.timeout)
+                outcome = "ok"
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            logger.warning(f"Tool {name} timed out after {tool.timeout}s")
+            result = f"Error: Function {name} timed out after {tool.timeout:g} seconds"
+        except TypeError as e:
+            outcome = "error"
+            result = f"Error: Invalid arguments for {name} - {str(e)}"
+        except Exception as e:
+            outcome = "error"
+            result = f"Error: Function {name} failed - {str(e)}"
+        finally:
+            elapsed = time.perf_counter() - started
+            size = len(str(result)) if result is not None else 0
+            tool.stats.record(elapsed - waited, waited, size, outcome)
+            logger.info(f"Tool {name} finished in {elapsed:.3f}s ({outcome}, {size} chars)")
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-tool call counts, latency histograms and result sizes."""
+        return {
+            "tools": {name: {"concurrency": tool.concurrency, "timeout": tool.timeout, **tool.stats.snapshot()}
+                      for name, tool in self._tools.items()},
+            "concurrency_limits": self.concurrency_limits,
+        }
+
+
+registry = ToolRegistry()
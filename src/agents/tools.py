@@ -1,13 +1,24 @@
 """Tools configuration and implementation for the agent."""
 import json
-from typing import Annotated, Optional, Dict, Any, Union, List
+from typing import Annotated, Optional, Dict, Any, Union, List, Literal, TypedDict
 from dataclasses import dataclass
 import nbformat
 import asyncio
 import ast
-from src.agents.screenshot_utils import take_screenshot, take_screenshot_sync
-from src.agents.web_scraper import process_urls, validate_url
+from src.agents.screenshot_utils import get_screenshot_service
+from src.agents.web_scraper import ScrapedPage, validate_url
+from src.agents.page_cache import normalize_url
+from src.agents.scrape_scheduler import get_scrape_scheduler
+from src.agents.content_extractor import apply_token_budget, DEFAULT_PAGE_TOKEN_BUDGET, MIN_CONTENT_QUALITY
 from src.agents.state import get_manager  # Replace web_server import with state import
+from src.agents.notebook_model import Notebook
+from src.agents.blob_store import get_blob_store, rehydrate_outputs, BLOB_REF_KEY
+from src.agents.cell_diff import compute_line_hunks, hunks_size
+from src.agents.cell_patch import apply_patch, PatchError
+from src.agents.cell_context import retrieve_cells, RetrievalError, DEFAULT_TOKEN_BUDGET
+from src.agents.result_store import get_result_store, MAX_PAGE_CHARS
+from src.agents.tool_registry import registry
+from src.agents.web_search import get_web_search, format_search_results, SearchError
 import logging
 from sumy.parsers.plaintext import PlaintextParser
 from sumy.nlp.tokenizers import Tokenizer
@@ -17,8 +28,6 @@ from sumy.utils import get_stop_words
 from langdetect import detect
 import re
 import nltk  # Import nltk here for downloading resources
-from duckduckgo_search import DDGS
-import time
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +45,7 @@ class NotebookEditResult:
         else:
             return f"Error: {self.message}"
 
-def get_notebook() -> Dict[str, Any]:
+def get_notebook() -> Optional[Notebook]:
     """Get direct reference to the notebook content in memory."""
     manager = get_manager()
     logger.info(f"Got manager: {manager}")
@@ -44,7 +53,7 @@ def get_notebook() -> Dict[str, Any]:
         logger.error("Manager is None!")
         raise RuntimeError("Manager not initialized")
     content = manager.get_notebook_content()
-    logger.info(f"Got notebook content: {bool(content)}")
+    logger.info(f"Got notebook content: {content is not None}")
     return content  # Use the manager's getter method
 import nltk
 from sumy.parsers.plaintext import PlaintextParser
@@ -171,27 +180,37 @@ def get_summary(text: str, word_count: int = 10) -> str:
         logger.error(f"NLTK data paths: {nltk.data.path}")
         return text[:50] + "..."
     
+# Cell summaries keyed by Cell.content_hash; unchanged cells are not re-summarized
+_summary_cache: Dict[str, str] = {}
+MAX_SUMMARY_CACHE = 10000
+
+@registry.tool(timeout=60.0, concurrency="notebook")
 def list_notebook_cells() -> str:
-    """List index, cell type and summary of each notebook cell. Supports multiple languages."""
+    """List index, cell type and summary of each notebook cell."""
     try:
         notebook = get_notebook()
-        if not notebook or "cells" not in notebook:
+        if notebook is None:
             return "No notebook loaded in memory"
 
         toc = []
-        for idx, cell in enumerate(notebook["cells"]):
-            cell_type = cell["cell_type"]
-            # Join the source list into a single string
-            source = "".join(cell["source"]).strip()
+        for idx, cell in enumerate(notebook.cells):
+            cell_type = cell.cell_type
+            source = cell.source.strip()
 
+            cached = _summary_cache.get(cell.content_hash)
+            if cached is not None:
+                summary = cached
             # Generate summary if cell has content
-            if source:
+            elif source:
                 try:
                     # For code cells, use AST to summarize
                     if cell_type == "code":
                         summary = summarize_code(source)  # Use summarize_code function
                     else:
                         summary = get_summary(source, word_count=10)
+                    if len(_summary_cache) >= MAX_SUMMARY_CACHE:
+                        _summary_cache.clear()
+                    _summary_cache[cell.content_hash] = summary
                 except Exception as e:
                     logger.error(f"Error generating summary for cell {idx}: {str(e)}")
                     summary = "<error generating summary>"
@@ -206,50 +225,96 @@ def list_notebook_cells() -> str:
         logger.error(f"Error generating table of contents: {str(e)}")
         return f"Error generating table of contents: {str(e)}"
 
-def get_multiple_cells(cell_indices: List[int]) -> str:
-    """Get the content of multiple cells in the notebook in a well-structured format."""
+@registry.tool(concurrency="notebook", spill=False)
+def get_multiple_cells(
+    cell_indices: Annotated[List[int], "List of cell indices to retrieve"]
+) -> str:
+    """Get the content of multiple cells in the notebook in a well-structured format.
+    Output is limited to about 4000 tokens; long cells are shortened to their first and last lines."""
     try:
-        if len(cell_indices) > 10:
-            return "This is too much, please get less then 10 cell content at once."
         notebook = get_notebook()
         
-        if not notebook or "cells" not in notebook:
+        if notebook is None:
             return "No notebook loaded in memory"
-            
-        formatted_cells = []
         
-        for idx in cell_indices:
-            if 0 <= idx < len(notebook["cells"]):
-                cell = notebook["cells"][idx]
-                # Handle both string and list source formats
-                cell_content = cell["source"]
-                if isinstance(cell_content, list):
-                    cell_content = "".join(cell_content)
-                cell_content = cell_content.strip()
-                
-                if cell_content:
-                    formatted_cells.append(f"<{cell['cell_type']}>\n{cell_content}\n</{cell['cell_type']}>")
-                else:
-                    formatted_cells.append(f"<empty cell>")
-            else:
-                formatted_cells.append(f"[Cell {idx} - out of range]")
-                
-        return "\n".join(formatted_cells)
+        # Bounded by tokens rather than cell count; long cells are cut to head and tail
+        return retrieve_cells(notebook, token_budget=DEFAULT_TOKEN_BUDGET, indices=cell_indices).text
         
     except Exception as e:
         return f"Error getting cells: {str(e)}"
 
+@registry.tool(concurrency="notebook", spill=False)
+def read_cells(
+    ranges: Annotated[str, "Cell ranges such as '0-5,8,12-' ('' or 'all' for every cell)"],
+    token_budget: Annotated[int, "Approximate maximum number of tokens to return, e.g. 4000"] = DEFAULT_TOKEN_BUDGET,
+    policy: Annotated[Literal["full", "head_tail", "signatures"], "How to shorten cells that do not fit"] = "head_tail",
+    cursor: Annotated[Optional[str], "Cursor returned by a previous call with the same ranges, or null"] = None
+) -> str:
+    """Read notebook cells by range within a token budget.
+
+    Returns as many cells as fit; if some did not fit, the result ends with a
+    cursor to pass back (with the same ranges) for the rest, starting with the
+    omitted lines of a shortened cell. Use policy
+    'signatures' to skim code cells as imports and function/class signatures,
+    'head_tail' to shorten cells that do not fit to their first and last lines,
+    or 'full' to only return whole cells."""
+    try:
+        notebook = get_notebook()
+        if notebook is None:
+            return "No notebook loaded in memory"
+        page = retrieve_cells(notebook, ranges, token_budget, policy, cursor)
+        return page.text or "No cells in the requested ranges."
+    except RetrievalError as e:
+        return f"Error: {e}"
+    except Exception as e:
+        return f"Error reading cells: {str(e)}"
+
 def save_notebook(notebook: nbformat.NotebookNode, notebook_path: str) -> None:
     """Save the notebook to file."""
     with open(notebook_path, 'w', encoding='utf-8') as f:
         nbformat.write(notebook, f)
 
+async def _propose_cell_update(manager, notebook: Notebook, cell_index: int, content: str, cell_type: str) -> str:
+    """Broadcast a proposed cell update as line hunks against the current version.
+
+    The full new content is only sent when the hunks would not be smaller.
+    """
+    old_content = notebook[cell_index].source
+    proposal = manager.register_proposal(cell_index, content, cell_type)
+    
+    change = {
+        "type": "update",
+        "id": proposal["id"],
+        "base_version": proposal["base_version"],
+        "index": cell_index,
+        "cell_type": cell_type
+    }
+    hunks = compute_line_hunks(old_content, content)
+    if hunks_size(hunks) < len(content):
+        change["hunks"] = hunks
+    else:
+        change["new_content"] = content
+    
+    await manager.broadcast({
+        "type": "propose_changes",
+        "changes": [change]
+    })
+    
+    message = "Changes proposed successfully"
+    if proposal["conflicts"]:
+        message += f". Note: cell {cell_index} already has {len(proposal['conflicts'])} pending proposal(s); whichever the user accepts first makes the others outdated"
+    return str(NotebookEditResult(
+        success=True,
+        message=message
+    ))
+
+@registry.tool(concurrency="notebook")
 async def update_cell(
     cell_index: Annotated[int, "Index of the cell to update"],
     content: Annotated[str, "New content for the cell"],
-    cell_type: Annotated[str, "Type of cell ('markdown' or 'code')"] = 'markdown'
+    cell_type: Annotated[Literal["markdown", "code"], "Type of cell ('markdown' or 'code')"] = 'markdown'
 ) -> str:
-    """Propose an update to a cell's content at the specified index."""
+    """Update a cell's content at the specified index in the notebook."""
     try:
         notebook = get_notebook()
         manager = get_manager()
@@ -259,60 +324,228 @@ async def update_cell(
                 message="Manager not initialized"
             ))
         
-        if not notebook or "cells" not in notebook:
+        if notebook is None:
             return str(NotebookEditResult(
                 success=False,
                 message="No notebook loaded in memory"
             ))
         
-        if cell_index >= len(notebook["cells"]):
+        if not 0 <= cell_index < len(notebook):
             return str(NotebookEditResult(
                 success=False,
                 message=f"Cell index {cell_index} out of range"
             ))
         
-        old_content = notebook["cells"][cell_index]["source"]
-        
-        changes = [{
-            "type": "update",
-            "index": cell_index,
-            "old_content": old_content,
-            "new_content": content,
-            "cell_type": cell_type
-        }]
+        return await _propose_cell_update(manager, notebook, cell_index, content, cell_type)
         
-        data = {
+    except Exception as e:
+        return str(NotebookEditResult(
+            success=False,
+            message=f"Failed to propose cell update: {str(e)}"
+        ))
+
+@registry.tool(concurrency="notebook")
+async def patch_cell(
+    cell_index: Annotated[int, "Index of the cell to patch"],
+    patch: Annotated[str, "SEARCH/REPLACE blocks or unified-diff hunks to apply to the cell"]
+) -> str:
+    """Edit part of a cell without resending all of it.
+
+    The patch is one or more blocks of the form '<<<<<<< SEARCH\\n<exact lines
+    from the cell>\\n=======\\n<replacement lines>\\n>>>>>>> REPLACE'
+    (unified-diff hunks are also accepted). Each SEARCH text must match the
+    current cell content uniquely; include a few unchanged lines around the
+    change to anchor it. Prefer this over update_cell for small changes to
+    long cells."""
+    try:
+        notebook = get_notebook()
+        manager = get_manager()
+        if manager is None:
+            return str(NotebookEditResult(success=False, message="Manager not initialized"))
+        if notebook is None:
+            return str(NotebookEditResult(success=False, message="No notebook loaded in memory"))
+        if not 0 <= cell_index < len(notebook):
+            return str(NotebookEditResult(success=False, message=f"Cell index {cell_index} out of range"))
+
+        cell = notebook[cell_index]
+        try:
+            result = apply_patch(cell.source, patch)
+        except PatchError as e:
+            return str(NotebookEditResult(
+                success=False,
+                message=f"Patch not applied to cell {cell_index}: {e}\n"
+                        "Fix the SEARCH text to match the cell, or use update_cell to replace the whole cell"
+            ))
+        if result.content == cell.source:
+            return str(NotebookEditResult(success=False, message="Patch leaves the cell unchanged"))
+
+        message = await _propose_cell_update(manager, notebook, cell_index, result.content, cell.cell_type)
+        inexact = [f"block {n} matched {how}" for n, how in enumerate(result.matches, 1) if how != "exact"]
+        if inexact:
+            message += f" ({'; '.join(inexact)})"
+        return message
+    except Exception as e:
+        return str(NotebookEditResult(
+            success=False,
+            message=f"Failed to patch cell: {str(e)}"
+        ))
+
+EDIT_OPERATIONS = ("update", "insert", "delete", "move")
+CELL_TYPES = ("markdown", "code")
+
+class EditOperation(TypedDict):
+    op: Annotated[Literal["update", "insert", "delete", "move"], "Operation to apply"]
+    index: Annotated[int, "Index of the cell the operation applies to"]
+    content: Annotated[Optional[str], "New cell content for update and insert"]
+    cell_type: Annotated[Optional[Literal["markdown", "code"]], "Cell type for update and insert"]
+    to: Annotated[Optional[int], "Target index for move"]
+
+def validate_edits(notebook: Notebook, edits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Validate an ordered list of edit operations against the notebook.
+
+    Operations apply in sequence, so each index refers to the notebook as left
+    by the previous operations. ``insert`` places a new cell before ``index``
+    (``index == len`` appends); ``move`` takes the cell at ``index`` out and
+    reinserts it at ``to``.
+
+    Returns:
+        Normalized operations, each also carrying ``base_index`` (the original
+        index of the cell it touches, or None for cells inserted by the set)
+
+    Raises:
+        ValueError: Describing the first invalid operation
+    """
+    # Simulated notebook: original index, or None for cells inserted by this set
+    layout: List[Optional[int]] = list(range(len(notebook)))
+    cell_types: List[str] = [cell.cell_type for cell in notebook]
+    normalized = []
+    for n, edit in enumerate(edits):
+        op = edit.get("op")
+        index = edit.get("index")
+        if op not in EDIT_OPERATIONS:
+            raise ValueError(f"Edit {n}: unknown op {op!r}, expected one of {', '.join(EDIT_OPERATIONS)}")
+        if not isinstance(index, int):
+            raise ValueError(f"Edit {n}: index must be an integer")
+        upper = len(layout) if op == "insert" else len(layout) - 1
+        if not 0 <= index <= upper:
+            raise ValueError(f"Edit {n} ({op}): index {index} out of range 0-{upper}")
+
+        cell_type = edit.get("cell_type")
+        if cell_type is not None and cell_type not in CELL_TYPES:
+            raise ValueError(f"Edit {n} ({op}): cell_type must be 'markdown' or 'code'")
+        content = edit.get("content")
+        if op in ("update", "insert") and content is not None and not isinstance(content, str):
+            raise ValueError(f"Edit {n} ({op}): content must be a string")
+
+        result = {"op": op, "index": index}
+        if op == "update":
+            if content is None:
+                raise ValueError(f"Edit {n} (update): content is required")
+            cell_types[index] = cell_type or cell_types[index]
+            result.update(content=content, cell_type=cell_types[index], base_index=layout[index])
+        elif op == "insert":
+            cell_type = cell_type or "code"
+            layout.insert(index, None)
+            cell_types.insert(index, cell_type)
+            result.update(content=content or "", cell_type=cell_type, base_index=None)
+        elif op == "delete":
+            result["base_index"] = layout.pop(index)
+            cell_types.pop(index)
+        else:
+            to = edit.get("to")
+            if not isinstance(to, int) or not 0 <= to <= len(layout) - 1:
+                raise ValueError(f"Edit {n} (move): 'to' must be an index in range 0-{len(layout) - 1}")
+            result.update(to=to, base_index=layout[index])
+            layout.insert(to, layout.pop(index))
+            cell_types.insert(to, cell_types.pop(index))
+        normalized.append(result)
+    return normalized
+
+@registry.tool(concurrency="notebook")
+async def apply_edits(
+    edits: Annotated[List[EditOperation], "Ordered edit operations"]
+) -> str:
+    """Propose several cell edits as one atomic change set.
+
+    Operations apply in order and each index refers to the notebook as left by
+    the previous operations: 'update' replaces the content of the cell at
+    index, 'insert' adds a new cell before index (index equal to the cell count
+    appends), 'delete' removes the cell at index, 'move' moves the cell at
+    index to position 'to'. Prefer this over several update_cell calls when
+    changing more than one cell."""
+    try:
+        notebook = get_notebook()
+        manager = get_manager()
+        if manager is None:
+            return str(NotebookEditResult(success=False, message="Manager not initialized"))
+        if notebook is None:
+            return str(NotebookEditResult(success=False, message="No notebook loaded in memory"))
+        if not edits:
+            return str(NotebookEditResult(success=False, message="No edits given"))
+
+        try:
+            operations = validate_edits(notebook, edits)
+        except ValueError as e:
+            return str(NotebookEditResult(success=False, message=f"{e}. No edits were proposed"))
+
+        proposal = manager.register_change_set(operations)
+        changes = []
+        for n, operation in enumerate(operations):
+            change = {k: v for k, v in operation.items() if k not in ("op", "base_index", "content")}
+            change.update(type=operation["op"], id=f"{proposal['id']}:{n}", change_set_id=proposal["id"])
+            if "content" in operation:
+                change["new_content"] = operation["content"]
+            changes.append(change)
+
+        await manager.broadcast({
             "type": "propose_changes",
+            "change_set_id": proposal["id"],
+            "base_version": proposal["base_version"],
+            "atomic": True,
             "changes": changes
-        }
-        await manager.broadcast(data)
-        
+        })
+
+        counts = {op: sum(1 for o in operations if o["op"] == op) for op in EDIT_OPERATIONS}
+        summary = ", ".join(f"{count} {op}" for op, count in counts.items() if count)
+        final_length = len(notebook) + counts["insert"] - counts["delete"]
         return str(NotebookEditResult(
             success=True,
-            message="Changes proposed successfully"
+            message=f"Proposed {len(operations)} edits as one change set ({summary}). "
+                    f"If accepted the notebook will have {final_length} cells"
         ))
-        
     except Exception as e:
         return str(NotebookEditResult(
             success=False,
-            message=f"Failed to propose cell update: {str(e)}"
+            message=f"Failed to propose edits: {str(e)}"
         ))
 
+@registry.tool(concurrency="notebook", spill=False)
+def read_result(
+    handle: Annotated[str, "Handle of the stored tool result"],
+    offset: Annotated[int, "Character offset to start reading from"] = 0,
+    length: Annotated[int, f"Number of characters to read (at most {MAX_PAGE_CHARS})"] = MAX_PAGE_CHARS
+) -> str:
+    """Read more of a large tool result that was truncated and stored under a handle.
+
+    Returns a page of characters starting at offset, and the offset to continue from."""
+    return get_result_store().read(handle, offset, length)
+
+@registry.tool(concurrency="notebook")
 async def get_cell_content(
     index: Annotated[int, "Index of the cell to retrieve"]
 ) -> str:
-    """Get the content of a cell at the specified index."""
+    """Get the content of a cell at the specified index in the notebook."""
     try:
         notebook = get_notebook()
         
-        if not notebook or "cells" not in notebook:
+        if notebook is None:
             return str(NotebookEditResult(
                 success=False,
                 message="No notebook loaded in memory"
             ))
         
-        if 0 <= index < len(notebook["cells"]):
-            content = notebook["cells"][index]["source"]
+        if 0 <= index < len(notebook):
+            content = notebook[index].source
             result = NotebookEditResult(
                 success=True,
                 message=f"Successfully retrieved cell content",
@@ -330,317 +563,248 @@ async def get_cell_content(
         )
     return str(result)
 
+_ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+def _format_output(output: Dict[str, Any]) -> str:
+    """Text form of one cell output; rich media is named rather than included."""
+    output_type = output.get("output_type", "unknown")
+    if BLOB_REF_KEY in output:
+        return f"[{output_type} output is no longer stored]"
+    if output_type == "stream":
+        text = output.get("text", "")
+        return "".join(text) if isinstance(text, list) else str(text)
+    if output_type == "error":
+        traceback = "\n".join(output.get("traceback") or [])
+        return _ANSI_ESCAPE.sub("", traceback) or f"{output.get('ename')}: {output.get('evalue')}"
+    data = output.get("data") or {}
+    if "text/plain" in data:
+        text = data["text/plain"]
+        text = "".join(text) if isinstance(text, list) else str(text)
+    else:
+        text = ""
+    media = [mime for mime in data if mime != "text/plain"]
+    if media:
+        text = (text + "\n" if text else "") + f"[{', '.join(media)} output]"
+    return text or f"[{output_type} output]"
+
+@registry.tool(concurrency="notebook")
+async def get_cell_outputs(
+    index: Annotated[int, "Index of the cell whose outputs to retrieve"]
+) -> str:
+    """Get the outputs of a code cell from its last execution: printed text, results and error tracebacks.
+    Images and other rich outputs are listed by type only."""
+    try:
+        notebook = get_notebook()
+        if notebook is None:
+            return "No notebook loaded in memory"
+        if not 0 <= index < len(notebook):
+            return f"Error: Cell index {index} out of range"
+        cell = notebook[index]
+        if cell.cell_type != "code":
+            return f"Cell {index} is a {cell.cell_type} cell and has no outputs"
+        if not cell.outputs:
+            return f"Cell {index} has no outputs"
+        # Large outputs live in the blob store on disk
+        rehydrated = await asyncio.to_thread(rehydrate_outputs, {"outputs": cell.outputs}, get_blob_store())
+        parts = [f"[output {i}] {_format_output(output)}" for i, output in enumerate(rehydrated["outputs"])]
+        return f"Outputs of cell {index} (execution count {cell.execution_count}):\n" + "\n".join(parts)
+    except Exception as e:
+        return f"Error getting cell outputs: {str(e)}"
+
 def get_weather(location):
     return "Failed to get weather"
 
 
+@registry.tool(timeout=60.0, concurrency="index", hidden=("top_k", "min_score", "match_all"))
 async def search_notebook(
-    query: Annotated[str, "Search query text"],
+    query: Annotated[str, "Query text used for semantic search"],
     keywords: Annotated[Optional[List[str]], "List of keywords for keyword search"],
     top_k: Annotated[int, "Maximum number of results to return"] = 10,
     min_score: Annotated[float, "Minimum similarity score"] = 0.3,
     match_all: Annotated[bool, "For keyword search: whether to require all keywords to match"] = False
 ) -> str:
-    """Search within a Jupyter notebook using semantic search or keyword matching. Return matching cells with their content."""
+    """Search within a Jupyter notebook using semantic search or keyword matching."""
     try:
         # 延迟导入
-        from search_notebook import get_search_engine, format_search_results, NotebookSearchEngine
+        from src.agents.search_notebook import get_search_engine, format_search_results, NotebookSearchEngine
         
         manager = get_manager()
         if manager is None:
             return "Error: Manager not initialized"
             
         notebook = get_notebook()
-        if not notebook:
+        if notebook is None:
             return "Error: No notebook loaded in memory"
             
         search_engine = get_search_engine()
         if not isinstance(search_engine, NotebookSearchEngine):
             search_engine = NotebookSearchEngine(manager)
             
-        # 直接传入 notebook dict
+        # Only cells changed since the last call are re-encoded
         search_engine.index_notebook(notebook)
+        if not search_engine.notebook_cells:
+            return "No matching cells found."
         
         results_semantic = search_engine.search(query, top_k, min_score)
-        results_keywords = search_engine.keyword_search(keywords, match_all)
+        results_keywords = search_engine.keyword_search(keywords, match_all) if keywords else []
         
         return await format_search_results(results_semantic + results_keywords)
         
     except Exception as e:
         return f"Error searching notebook: {str(e)}"
 
+def _format_scraped_page(page: ScrapedPage, token_budget: int) -> str:
+    """Main content of a scraped page (full text if no article was found), cut to the token budget."""
+    if page.error is not None and not page.text:
+        return f"\n=== Content from {page.url} (unavailable: {page.error}) ===\n{'=' * 80}"
+    content = page.content
+    if content is not None and content.text and content.quality >= MIN_CONTENT_QUALITY:
+        text, quality = content.text, content.quality
+    else:
+        text, quality = page.text, (content.quality if content is not None else 0.0)
+    text, truncated = apply_token_budget(text, token_budget)
+    header = f"=== Content from {page.url} (quality {quality:.2f}{', truncated' if truncated else ''}) ==="
+    return f"\n{header}\n{text}\n{'=' * 80}"
+
+# Combined token budget of one scrape_websites or research result, split across its pages
+MAX_WEB_RESULT_TOKENS = 6000
+
+def _page_budget(requested: Optional[int], default: int, pages: int) -> int:
+    """Per-page token budget: the requested or default one, shrunk so all pages fit the combined budget."""
+    return max(100, min(requested or default, MAX_WEB_RESULT_TOKENS // max(1, pages)))
+
+# Not in the "browser" class: the shared scrape scheduler bounds fetches across all calls.
+# Output is budgeted per page, so it is not spilled to the result store.
+@registry.tool(timeout=60.0, concurrency="default", spill=False)
 async def scrape_websites(
     urls: Annotated[List[str], "List of URLs to scrape"],
-    max_concurrent: Annotated[int, "Maximum number of concurrent browser instances"] = 5
+    max_tokens_per_page: Annotated[Optional[int], f"Token budget for each page's text. Defaults to {DEFAULT_PAGE_TOKEN_BUDGET}."] = None
 ) -> str:
-    """Scrape content from multiple websites concurrently and return formatted text content."""
+    """Scrape content from multiple websites concurrently and return the main content of each page.
+
+    Navigation, footers, banners and sidebars are left out. Each page is cut to
+    the token budget (smaller when many URLs share the combined budget of
+    about 6000 tokens) and reported with a quality score from 0 to 1; a low score
+    means no article was found and the full page text is returned instead.
+    Pages that take too long are reported as still loading; asking again
+    shortly returns them from the cache.
+    """
     try:
         # Validate URLs
         valid_urls = [url for url in urls if validate_url(url)]
         if not valid_urls:
             return "Error: No valid URLs provided"
-            
+        budget = _page_budget(max_tokens_per_page, DEFAULT_PAGE_TOKEN_BUDGET, len(valid_urls))
+
         # Process URLs and get results
-        results = await process_urls(valid_urls, max_concurrent)
-        
-        # Format output
-        formatted_output = []
-        for url, text in zip(valid_urls, results):
-            formatted_output.append(f"\n=== Content from {url} ===\n{text}\n{'=' * 80}")
-            
-        return "\n".join(formatted_output)
-        
+        pages = await get_scrape_scheduler().scrape(valid_urls)
+
+        return "\n".join(_format_scraped_page(page, budget) for page in pages)
+
     except Exception as e:
         return f"Error during web scraping: {str(e)}"
 
+ImageFormat = Literal["jpeg", "png", "webp"]
+
+@registry.tool(timeout=45.0, concurrency="browser")
 async def take_webpage_screenshot(
     url: Annotated[str, "The URL to take a screenshot of"],
     output_path: Annotated[Optional[str], "Path to save the screenshot. If None, saves to a temporary file"] = None,
-    width: Annotated[int, "Viewport width"] = 1280,
-    height: Annotated[int, "Viewport height"] = 720
+    width: Annotated[int, "Viewport width. Defaults to 1280."] = 1280,
+    height: Annotated[int, "Viewport height. Defaults to 720."] = 720,
+    full_page: Annotated[bool, "Capture the whole scrollable page instead of the viewport. Defaults to false."] = False,
+    max_height: Annotated[Optional[int], "Cap on the captured height for full-page screenshots"] = None,
+    image_format: Annotated[Optional[ImageFormat], "Image format. Defaults to the extension of output_path, else jpeg."] = None,
+    max_width: Annotated[Optional[int], "Downscale the image to at most this width"] = None
 ) -> str:
     """Take a screenshot of a webpage using Playwright and return the path to the saved image."""
-    try:
-        result = await take_screenshot(url, output_path, width, height)
-        return f"Screenshot saved successfully to: {result}"
-    except Exception as e:
-        return f"Error taking screenshot: {str(e)}"
+    result = await get_screenshot_service().capture(
+        url, output_path, width, height, full_page=full_page, max_height=max_height,
+        image_format=image_format, max_width=max_width)
+    return str(result)
 
-def take_webpage_screenshot_sync(
-    url: Annotated[str, "The URL to take a screenshot of"],
-    output_path: Annotated[Optional[str], "Path to save the screenshot. If None, saves to a temporary file"] = None,
-    width: Annotated[int, "Viewport width"] = 1280,
-    height: Annotated[int, "Viewport height"] = 720
+@registry.tool(timeout=45.0, concurrency="browser")
+async def take_webpage_screenshots(
+    urls: Annotated[List[str], "The URLs to take screenshots of"],
+    width: Annotated[int, "Viewport width. Defaults to 1280."] = 1280,
+    height: Annotated[int, "Viewport height. Defaults to 720."] = 720,
+    full_page: Annotated[bool, "Capture the whole scrollable page instead of the viewport. Defaults to false."] = False,
+    max_height: Annotated[Optional[int], "Cap on the captured height for full-page screenshots"] = None,
+    image_format: Annotated[Optional[ImageFormat], "Image format. Defaults to jpeg."] = None,
+    max_width: Annotated[Optional[int], "Downscale images to at most this width"] = None
+) -> str:
+    """Take screenshots of several webpages concurrently and return the path to each saved image."""
+    if not urls:
+        return "Error: No URLs provided"
+    results = await get_screenshot_service().capture_many(
+        urls, width=width, height=height, full_page=full_page, max_height=max_height,
+        image_format=image_format, max_width=max_width)
+    return "\n".join(str(result) for result in results)
+
+@registry.tool(concurrency="web")
+async def search_with_retry(
+    query: Annotated[str, "Search query"],
+    max_results: Annotated[int, "Maximum number of results to return"] = 10,
+    max_retries: Annotated[int, "Maximum number of retry attempts"] = 3
 ) -> str:
-    """Take a screenshot of a webpage synchronously using Playwright and return the path to the saved image."""
+    """Search the web using DuckDuckGo and return formatted results with URLs and snippets."""
     try:
-        result = take_screenshot_sync(url, output_path, width, height)
-        return f"Screenshot saved successfully to: {result}"
-    except Exception as e:
-        return f"Error taking screenshot: {str(e)}"
-    
-def search_with_retry(query, max_results=10, max_retries=3):
-    """
-    Search using DuckDuckGo and return results with URLs and text snippets.
+        results = await get_web_search().search(query, max_results, max_retries)
+    except SearchError as e:
+        return str(e)
+    return format_search_results(results)
+
+# Upper bound on pages fetched by one research call
+MAX_RESEARCH_PAGES = 8
+RESEARCH_TOKENS_PER_PAGE = 1500
+
+# The timeout leaves the search time on top of the scheduler's batch deadline
+@registry.tool(timeout=75.0, concurrency="default", spill=False)
+async def research(
+    query: Annotated[str, "Search query"],
+    num_pages: Annotated[int, "Number of top results whose pages are fetched, at most 8. Defaults to 3."] = 3,
+    max_tokens_per_page: Annotated[Optional[int], f"Token budget for each fetched page. Defaults to {RESEARCH_TOKENS_PER_PAGE}."] = None
+) -> str:
+    """Search the web and read the top results in one step.
+
+    Runs the search, fetches the top result pages concurrently and returns
+    their main content together with the remaining search results, all within
+    about 6000 tokens. Prefer this over search_with_retry followed by
+    scrape_websites.
     """
-    for attempt in range(max_retries):
+    try:
+        results = await get_web_search().search(query, max_results=max(10, num_pages))
+    except SearchError as e:
+        return str(e)
+    if not results:
+        return "No results found"
 
-        try:
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=max_results))
-                
-            if not results:
-                return "No results found"
-            
-            # Format results into a readable string
-            formatted_results = []
-            for i, r in enumerate(results, 1):
-                formatted_results.append(f"\n=== Result {i} ===")
-                formatted_results.append(f"URL: {r.get('href', 'N/A')}")
-                formatted_results.append(f"Title: {r.get('title', 'N/A')}")
-                formatted_results.append(f"Snippet: {r.get('body', 'N/A')}")
-            
-            return "\n".join(formatted_results)
-                
-        except Exception as e:
-            if attempt == max_retries - 1:  # If last attempt
-                return f"Search failed after {max_retries} attempts: {str(e)}"
-            time.sleep(1)  # Wait 1 second before retry
-tools = [{
-    "type": "function",
-    "function": {
-        "name": "update_cell",
-        "description": "Update a cell's content at the specified index in the notebook.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "cell_index": {"type": "integer", "description": "Index of the cell to update"},
-                "content": {"type": "string", "description": "New content for the cell"},
-                "cell_type": {"type": "string", "enum": ["markdown", "code"], "description": "Type of cell ('markdown' or 'code')"}
-            },
-            "required": ["cell_index", "content", "cell_type"],
-            "additionalProperties": False
-        },
-        "strict": True
-    }
-}, {
-    "type": "function",
-    "function": {
-        "name": "get_cell_content",
-        "description": "Get the content of a cell at the specified index in the notebook.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "index": {"type": "integer", "description": "Index of the cell to retrieve"}
-            },
-            "required": ["index"],
-            "additionalProperties": False
-        },
-        "strict": True
-    }
-}, {
-    "type": "function", 
-    "function": {
-        "name": "get_multiple_cells",
-        "description": "Get the content of multiple cells in the notebook in a well-structured format.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "cell_indices": {"type": "array", "items": {"type": "integer"}, "description": "List of cell indices to retrieve"}
-            },
-            "required": ["cell_indices"],
-            "additionalProperties": False
-        },
-        "strict": True
-    }
-}, {
-    "type": "function",
-    "function": {
-        "name": "search_with_retry",
-        "description": "Search the web using DuckDuckGo and return formatted results with URLs and snippets.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "query": {
-                    "type": "string",
-                    "description": "Search query"
-                },
-                "max_results": {
-                    "type": "integer",
-                    "description": "Maximum number of results to return"
-                },
-                "max_retries": {
-                    "type": "integer",
-                    "description": "Maximum number of retry attempts"
-                }
-            },
-            "required": ["query", "max_results", "max_retries"],
-            "additionalProperties": False
-        },
-        "strict": True
-    }
-}, {
-    "type": "function",
-    "function": {
-        "name": "search_notebook",
-        "description": "Search within a Jupyter notebook using semantic search or keyword matching",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "query": {
-                    "type": "string",
-                    "description": "Query text used semantic search"
-                },
-                "keywords": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "List of keywords for keyword search"
-                }
-            },
-            "required": [
-                "query",
-                "keywords"
-            ],
-            "additionalProperties": False
-        },
-        "strict": True
-    }
-}, {
-    "type": "function",
-    "function": {
-        "name": "take_webpage_screenshot",
-        "description": "Take a screenshot of a webpage using Playwright and return the path to the saved image",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "url": {
-                    "type": "string",
-                    "description": "The URL to take a screenshot of"
-                },
-                "output_path": {
-                    "type": "string",
-                    "description": "Path to save the screenshot. If None, saves to a temporary file."
-                },
-                "width": {
-                    "type": "integer",
-                    "description": "Viewport width. Defaults to 1280."
-                },
-                "height": {
-                    "type": "integer",
-                    "description": "Viewport height. Defaults to 720."
-                }
-            },
-            "required": ["url", "output_path", "width", "height"],
-            "additionalProperties": False
-        },
-        "strict": True
-    }
-}, {
-    "type": "function",
-    "function": {
-        "name": "take_webpage_screenshot_sync",
-        "description": "Take a screenshot of a webpage synchronously using Playwright and return the path to the saved image",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "url": {
-                    "type": "string",
-                    "description": "The URL to take a screenshot of"
-                },
-                "output_path": {
-                    "type": "string",
-                    "description": "Path to save the screenshot. If None, saves to a temporary file."
-                },
-                "width": {
-                    "type": "integer",
-                    "description": "Viewport width. Defaults to 1280."
-                },
-                "height": {
-                    "type": "integer",
-                    "description": "Viewport height. Defaults to 720."
-                }
-            },
-            "required": ["url", "output_path", "width", "height"],
-            "additionalProperties": False
-        },
-        "strict": True
-    }
-}, {
-    "type": "function",
-    "function": {
-        "name": "scrape_websites",
-        "description": "Scrape content from multiple websites concurrently and return formatted text content",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "urls": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "List of URLs to scrape"
-                },
-                "max_concurrent": {
-                    "type": "integer",
-                    "description": "Maximum number of concurrent browser instances. Defaults to 5."
-                }
-            },
-            "required": ["urls", "max_concurrent"],
-            "additionalProperties": False
-        },
-        "strict": True
-    }
-}, {
-    "type": "function",
-    "function": {
-        "name": "list_notebook_cells",
-        "description": "List index, cell type and summery of each notebook cell.",
-        "parameters": {
-            "type": "object",
-            "properties": {},
-            "additionalProperties": False
-        },
-        "strict": True
-    }
-}]
+    # Fetch the first distinct, valid URLs; the rest are listed as snippets
+    fetched, seen = [], set()
+    for result in results:
+        if len(fetched) >= max(1, min(num_pages, MAX_RESEARCH_PAGES)):
+            break
+        key = normalize_url(result.url) if validate_url(result.url) else None
+        if key is not None and key not in seen:
+            seen.add(key)
+            fetched.append(result)
+    others = [result for result in results if result not in fetched
+              and not (validate_url(result.url) and normalize_url(result.url) in seen)]
+
+    pages = await get_scrape_scheduler().scrape([result.url for result in fetched])
+    # Keep room for the snippets of the other results
+    budget = _page_budget(max_tokens_per_page, RESEARCH_TOKENS_PER_PAGE, len(fetched) + 1)
+    sections = [f"Search results for {query!r}: {len(fetched)} pages read, {len(others)} more listed below."]
+    for result, page in zip(fetched, pages):
+        sections.append(f"\n## {result.title}\nSnippet: {result.snippet}")
+        sections.append(_format_scraped_page(page, budget))
+    if others:
+        sections.append("\n## Other results")
+        sections.append(format_search_results(others))
+    return "\n".join(sections)
+
+# Schemas are generated from the signatures of the tools registered above
+tools = registry.schemas()
 
 async def call_function(name, args):
     """Call a function by name with the given arguments.
@@ -652,41 +816,4 @@ async def call_function(name, args):
     Returns:
         str: Result of the function call
     """
-    # Parse JSON string if args is a string
-    if isinstance(args, str):
-        try:
-            args = json.loads(args)
-        except json.JSONDecodeError:
-            return f"Error: Invalid JSON arguments - {args}"
-    
-    try:
-        # Map function names to their implementations
-        function_map = {
-            "update_cell": update_cell,
-            "get_multiple_cells": get_multiple_cells,
-            "get_cell_content": get_cell_content,
-            "search_with_retry": search_with_retry,
-            "search_notebook": search_notebook,
-            "take_webpage_screenshot": take_webpage_screenshot,
-            "take_webpage_screenshot_sync": take_webpage_screenshot_sync,
-            "scrape_websites": scrape_websites,
-            "list_notebook_cells": list_notebook_cells,
-        }
-        
-        if name not in function_map:
-            return f"Error: Unknown function {name}"
-            
-        func = function_map[name]
-        
-        # Call async functions with await, regular functions directly
-        if asyncio.iscoroutinefunction(func):
-            result = await func(**args)
-        else:
-            result = func(**args)
-            
-        return result
-        
-    except TypeError as e:
-        return f"Error: Invalid arguments for {name} - {str(e)}"
-    except Exception as e:
-        return f"Error: Function {name} failed - {str(e)}" 
\ No newline at end of file
+    return await registry.call(name, args)
@@ -3,14 +3,27 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import asyncio
+import json
+import os
 import uvicorn
 
 from pathlib import Path
-from src.agents.search_notebook import NotebookSearchEngine
+from src.agents.search_notebook import get_search_engine
 from src.agents.state import set_manager, get_manager
 from src.agents.agent import Agent
 from src.agents.web_server import ConnectionManager
 from src.agents.utils import broadcast_message
+from src.agents.admission import AdmissionController
+from src.agents.blob_store import get_blob_store
+from src.agents.result_store import get_result_store
+from src.agents.tool_registry import registry as tool_registry
+from src.agents.browser_pool import get_browser_pool, close_browser_pool
+from src.agents.web_scraper import fetch_metrics, close_http_client, close_parse_pool
+from src.agents.page_cache import get_page_cache, close_page_cache
+from src.agents.scrape_scheduler import get_scrape_scheduler
+from src.agents.screenshot_utils import get_screenshot_service
+from src.agents.web_search import get_web_search
+from src.agents.loop_monitor import get_loop_monitor
 import logging
 
 # Set up logging
@@ -32,43 +45,85 @@ app.add_middleware(
 manager = ConnectionManager()
 set_manager(manager)
 
-# Create search engine instance
-search_engine = NotebookSearchEngine(manager)
+# Create the shared search engine instance used by the search_notebook tool
+search_engine = get_search_engine()
 
 # Initialize agent
 agent = Agent()
 
-# User input queue
-user_input_queue = asyncio.Queue()
+# Admission controller in front of the agent (replaces the unbounded input queue)
+admission = AdmissionController(notify=manager.send_system_message)
 
-async def get_user_input() -> str:
-    return await user_input_queue.get()
+# Overall deadline for one agent turn, including all LLM rounds and tool calls
+TURN_DEADLINE_SECONDS = float(os.getenv("AGENT_TURN_DEADLINE", "300"))
+
+# Agent runs in flight, keyed by session id, so they can be cancelled
+running_requests = {}
+
+async def cancel_requests(session_id: str) -> bool:
+    """Cancel a session's pending requests and its in-flight agent run."""
+    cancelled = await admission.cancel_session(session_id) > 0
+    running = running_requests.get(session_id)
+    if running is not None:
+        request, task = running
+        request.cancelled = True
+        task.cancel()
+        cancelled = True
+    return cancelled
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     logger.info("New WebSocket connection request received")
     await manager.connect(websocket)
+    # Read now: broadcast() may disconnect a dead socket and drop its session id
+    session_id = manager.get_session_id(websocket)
     try:
         while True:
-            data = await websocket.receive_json()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                # Binary frames carry chunks of a notebook upload
+                await manager.handle_upload_chunk(websocket, message["bytes"])
+                continue
+
+            data = json.loads(message.get("text") or "{}")
             if data.get("type") in ["notebook_opened", "notebook_updated"]:
-                logger.info(f"Received message: {data.get('type')}  First 50 characters: {data.get('content')[:50]}")
+                logger.info(f"Received message: {data.get('type')}  First 50 characters: {str(data.get('content'))[:50]}")
             else:
                 logger.info(f"Received message: {data.get('type')}")
             if data.get("type") == "notebook_opened":
                 await manager.handle_notebook_opened(websocket, data)
+                continue
             elif data.get("type") == "notebook_updated":
                 await manager.handle_notebook_updated(websocket, data)
+                continue
+            elif data.get("type") == "notebook_upload_start":
+                await manager.handle_upload_start(websocket, data)
+                continue
+            elif data.get("type") == "notebook_upload_end":
+                await manager.handle_upload_end(websocket, data)
+                continue
             elif data.get("type") == "user_input":
                 selected_cells = data.get("selected_cells", "") or ""
                 user_message = data.get("message", "") or ""
                 
                 logger.info(f"Processing user input - Message: {user_message}, Selected cells: {selected_cells}")
-                await user_input_queue.put({
+                await admission.submit(session_id, {
                     "message": user_message.strip(),
                     "selected_cells": selected_cells.strip()
                 })
                 continue
+            elif data.get("type") in ["change_accepted", "change_rejected"]:
+                await manager.handle_change_resolved(websocket, data)
+                continue
+            elif data.get("type") == "request_change_content":
+                await manager.handle_change_content_request(websocket, data)
+                continue
+            elif data.get("type") == "cancel":
+                if not await cancel_requests(session_id):
+                    await manager.send_system_message(session_id, "Nothing to cancel.")
+                continue
             
             await manager.broadcast(data)
     except WebSocketDisconnect:
@@ -76,6 +131,8 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     finally:
+        if session_id:
+            await cancel_requests(session_id)
         await manager.disconnect(websocket)
 
 @app.get("/health")
@@ -83,8 +140,86 @@ async def health_check():
     """Health check endpoint to verify server is running"""
     return {"status": "healthy"}
 
-# Mount static files from frontend/build
-frontend_path = Path(__file__).parent.parent.parent / "frontend" / "build"
+@app.get("/metrics")
+async def metrics():
+    """Queue, scheduling and storage metrics"""
+    return {
+        "queue": admission.metrics(),
+        "blob_store": get_blob_store().stats,
+        "notebook_history": manager.history.stats(),
+        "tool_results": get_result_store().metrics(),
+        "tools": tool_registry.metrics(),
+        "browser_pool": get_browser_pool().metrics(),
+        "fetch_tiers": fetch_metrics(),
+        "page_cache": await asyncio.to_thread(get_page_cache().metrics),
+        "scrape_scheduler": get_scrape_scheduler().metrics(),
+        "screenshots": get_screenshot_service().metrics(),
+        "web_search": get_web_search().metrics(),
+        "event_loop": get_loop_monitor().metrics(),
+    }
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Sample event loop lag for /metrics while the server runs."""
+    get_loop_monitor().start()
+
+@app.on_event("shutdown")
+async def shutdown_browser_pool():
+    """Stop the loop monitor and close the shared Chromium instance, HTTP clients, parse workers and page cache."""
+    await get_loop_monitor().stop()
+    await agent.backend.aclose()
+    await close_http_client()
+    await close_browser_pool()
+    close_parse_pool()
+    close_page_cache()
+
+async def broadcast_status(request, status: str):
+    """Broadcast the lifecycle state of an agent run."""
+    await manager.broadcast({
+        "type": "agent_status",
+        "request_id": request.request_id,
+        "status": status,
+    })
+
+async def process_requests():
+    """Serve admitted user requests with the agent, one at a time.
+
+    Each run is a separate task so a ``cancel`` message can abort the LLM
+    stream and any running tool, and is bounded by TURN_DEADLINE_SECONDS.
+    """
+    while True:
+        request = await admission.get()
+        task = asyncio.create_task(agent.process_query(request.payload))
+        running_requests[request.session_id] = (request, task)
+        try:
+            logger.info(f"Processing input: {request.payload}")
+            await broadcast_status(request, "started")
+            await broadcast_message("System", "Processing your request...\n")
+            await asyncio.wait_for(task, TURN_DEADLINE_SECONDS)
+            await broadcast_status(request, "completed")
+        except asyncio.CancelledError:
+            if not request.cancelled:
+                # The worker itself is being cancelled (server shutdown)
+                task.cancel()
+                raise
+            logger.info(f"Request {request.request_id} cancelled by user")
+            await broadcast_message("System", "\n\nRequest cancelled.\n")
+            await broadcast_status(request, "cancelled")
+        except asyncio.TimeoutError:
+            logger.warning(f"Request {request.request_id} exceeded the {TURN_DEADLINE_SECONDS:g}s turn deadline")
+            await broadcast_message("System", f"\n\nRequest stopped after {TURN_DEADLINE_SECONDS:g} seconds.\n")
+            await broadcast_status(request, "timed_out")
+        except Exception as e:
+            logger.error(f"Error during conversation: {e}")
+            print(f"Error during conversation: {e}")
+            await broadcast_message("System", f"Error: {e}")
+            await broadcast_status(request, "failed")
+        finally:
+            running_requests.pop(request.session_id, None)
+            await admission.complete(request)
+
+# Mount static files from frontend/build, or FRONTEND_BUILD_DIR if set
+frontend_path = Path(os.getenv("FRONTEND_BUILD_DIR") or Path(__file__).parent.parent.parent / "frontend" / "build")
 if not frontend_path.exists():
     logger.error(f"Frontend build directory not found at {frontend_path}")
     raise FileNotFoundError(f"Frontend build directory not found at {frontend_path}")
@@ -144,18 +279,7 @@ async def main():
                 #await broadcast_message("System", "Ready to process queries.")
                 
                 try:
-                    while True:
-                        try:
-                            user_input = await get_user_input()
-                            logger.info(f"Processing input: {user_input}")
-                            await broadcast_message("System", "Processing your request...\n")
-                            result = await agent.process_query(user_input)
-                            #await broadcast_message("System", "Query processing complete")
-                        except Exception as e:
-                            logger.error(f"Error during conversation: {e}")
-                            print(f"Error during conversation: {e}")
-                            await broadcast_message("System", f"Error: {e}")
-                            continue
+                    await process_requests()
                 finally:
                     if server:
                         logger.info("Shutting down server...")
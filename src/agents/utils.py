@@ -11,4 +11,13 @@ async def broadcast_message(agent: str, message: str):
             "content": message,
             "timestamp": datetime.datetime.now().isoformat()
         }
-        await manager.broadcast(data) 
\ No newline at end of file
+        await manager.broadcast(data)
+
+
+# Rough characters-per-token ratio for English text and code with cl100k-style tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token count estimate used for prompt budgeting."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
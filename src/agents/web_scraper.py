@@ -4,13 +4,23 @@ import asyncio
 import argparse
 import sys
 import os
-from typing import List, Optional
-from playwright.async_api import async_playwright
+from typing import Any, AsyncContextManager, Callable, Dict, List, Optional, Tuple
 import html5lib
-from multiprocessing import Pool
+import httpx
+import html
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import time
 from urllib.parse import urlparse
 import logging
+import statistics
+from collections import deque
+from dataclasses import dataclass
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from src.agents.browser_pool import get_browser_pool, close_browser_pool
+from src.agents.content_extractor import ExtractedContent, extract_content
+from src.agents.page_cache import CachedPage, get_page_cache, close_page_cache
 
 # Configure logging
 logging.basicConfig(
@@ -20,139 +30,496 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def fetch_page(url: str, context) -> Optional[str]:
-    """Asynchronously fetch a webpage's content."""
-    page = await context.new_page()
+# Try a plain HTTP GET before the browser; set SCRAPE_HTTP_FAST_PATH=0 to always use the browser
+HTTP_FAST_PATH = os.getenv("SCRAPE_HTTP_FAST_PATH", "1") != "0"
+
+# Largest response body read on the fast path
+MAX_HTTP_BODY_BYTES = 5 * 1024 * 1024
+
+# Worker processes for parse_html, started on first scrape and kept for the server's lifetime
+PARSE_WORKERS = int(os.getenv("SCRAPE_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Resource types the browser tier never downloads; scripts and XHR stay, since
+# pages only reach the browser when their content is rendered client-side.
+# Override with a comma-separated SCRAPE_BLOCK_RESOURCES ("" blocks nothing).
+BLOCKED_RESOURCE_TYPES = frozenset(
+    t.strip() for t in os.getenv("SCRAPE_BLOCK_RESOURCES", "image,media,font,stylesheet,texttrack,manifest").split(",")
+    if t.strip()
+)
+
+# Analytics and ad hosts whose requests are aborted whatever their type
+BLOCKED_HOSTS = re.compile(
+    r"(?:^|\.)(?:google-analytics\.com|googletagmanager\.com|doubleclick\.net|googlesyndication\.com"
+    r"|facebook\.net|hotjar\.com|segment\.(?:io|com)|scorecardresearch\.com|adservice\.google\.com)$"
+)
+
+# Browser wait strategy: navigation completes at SCRAPE_WAIT_UNTIL, then the page
+# gets up to SCRAPE_SETTLE_MS to reach network idle before its content is read
+BROWSER_WAIT_UNTIL = os.getenv("SCRAPE_WAIT_UNTIL", "domcontentloaded")
+BROWSER_SETTLE_MS = int(os.getenv("SCRAPE_SETTLE_MS", "1500"))
+BROWSER_NAVIGATION_TIMEOUT_MS = int(os.getenv("SCRAPE_NAVIGATION_TIMEOUT_MS", "15000"))
+
+# Pages with less visible text than this are assumed to render client-side
+MIN_STATIC_TEXT_CHARS = 200
+
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/120.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.8",
+}
+
+# Markers of client-rendered apps whose static HTML holds no content
+_SPA_MARKERS = re.compile(
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt)["\'][^>]*>\s*</div>'
+    r'|ng-app\b|<app-root\b'
+    r'|(?:enable|requires?) javascript',
+    re.IGNORECASE,
+)
+_NON_CONTENT = re.compile(r"<(script|style|noscript|template)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r"<[^>]+>")
+
+# Per-tier fetch counters; "fallbacks" counts why pages were sent to the browser
+FETCH_STATS: Dict[str, Any] = {
+    "http": {"served": 0, "not_modified": 0, "seconds": 0.0},
+    "browser": {"served": 0, "failed": 0, "seconds": 0.0, "requests_allowed": 0, "requests_blocked": 0},
+    "fallbacks": {},
+}
+
+# Timings of the most recent fetches, one entry per URL
+FETCH_TIMINGS: deque = deque(maxlen=500)
+
+def _record_timing(url: str, tier: str, seconds: float, html_bytes: int, **details: Any) -> None:
+    FETCH_TIMINGS.append({"url": url, "tier": tier, "seconds": round(seconds, 4), "bytes": html_bytes, **details})
+
+def fetch_metrics() -> Dict[str, Any]:
+    """Per-tier counters with latency percentiles and the most recent per-URL timings."""
+    latency = {}
+    for tier in ("http", "browser"):
+        seconds = sorted(entry["seconds"] for entry in FETCH_TIMINGS if entry["tier"] == tier)
+        if seconds:
+            latency[tier] = {
+                "count": len(seconds),
+                "p50": statistics.median(seconds),
+                "p90": seconds[min(len(seconds) - 1, int(len(seconds) * 0.9))],
+                "max": seconds[-1],
+            }
+    return {**FETCH_STATS, "latency": latency, "recent": list(FETCH_TIMINGS)[-20:]}
+
+# Set SCRAPE_PAGE_CACHE=0 to always fetch pages instead of using the on-disk cache
+PAGE_CACHE_ENABLED = os.getenv("SCRAPE_PAGE_CACHE", "1") != "0"
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+@dataclass
+class FetchedPage:
+    """A fetched page with its cache validators. ``not_modified`` means a 304 for the cached copy."""
+    html: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    ttl: Optional[float] = None
+    no_store: bool = False
+    not_modified: bool = False
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get or create the shared HTTP client (keeps connections alive across scrapes)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            headers=HTTP_HEADERS,
+            follow_redirects=True,
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client if it was created."""
+    global _http_client
+    if _http_client is not None:
+        client, _http_client = _http_client, None
+        await client.aclose()
+
+def visible_text_length(html_content: str) -> int:
+    """Rough amount of visible text in an HTML document."""
+    text = _TAG.sub(" ", _NON_CONTENT.sub(" ", html_content))
+    return len(" ".join(html.unescape(text).split()))
+
+def needs_javascript(html_content: str) -> Optional[str]:
+    """Reason the page likely needs a browser to render, or None if the static HTML will do."""
+    if not html_content.strip():
+        return "empty body"
+    text_length = visible_text_length(html_content)
+    if text_length < MIN_STATIC_TEXT_CHARS:
+        return "little static text"
+    if _SPA_MARKERS.search(html_content) and text_length < 4 * MIN_STATIC_TEXT_CHARS:
+        return "single-page app marker"
+    return None
+
+def _count_fallback(reason: str) -> None:
+    fallbacks = FETCH_STATS["fallbacks"]
+    fallbacks[reason] = fallbacks.get(reason, 0) + 1
+
+def _cache_policy(headers) -> Dict[str, Any]:
+    """Validators and lifetime from the response headers; a missing max-age means the cache default."""
+    cache_control = headers.get("cache-control", "").lower()
+    match = _MAX_AGE.search(cache_control)
+    return {
+        "etag": headers.get("etag"),
+        "last_modified": headers.get("last-modified"),
+        "ttl": float(match.group(1)) if match else None,
+        "no_store": "no-store" in cache_control,
+    }
+
+async def fetch_page_http(url: str, cached: Optional[CachedPage] = None) -> Optional[FetchedPage]:
+    """Fetch a page with a plain GET. Returns None if the page should go to the browser.
+
+    Args:
+        url: Page URL
+        cached: Expired cache entry; its validators make the request conditional
+    """
+    started = time.perf_counter()
+    headers = {}
+    if cached is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
     try:
-        logger.info(f"Fetching {url}")
-        await page.goto(url)
-        await page.wait_for_load_state('networkidle')
-        content = await page.content()
-        logger.info(f"Successfully fetched {url}")
-        return content
+        async with get_http_client().stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and cached is not None:
+                FETCH_STATS["http"]["not_modified"] += 1
+                logger.info(f"{url} not modified since it was cached")
+                return FetchedPage("", **_cache_policy(response.headers), not_modified=True)
+            if response.status_code >= 400:
+                _count_fallback(f"HTTP {response.status_code}")
+                return None
+            content_type = response.headers.get("content-type", "").lower()
+            is_html = "html" in content_type or not content_type
+            if not is_html and not content_type.startswith(("text/", "application/json")):
+                _count_fallback("non-text content")
+                return None
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) > MAX_HTTP_BODY_BYTES:
+                    _count_fallback("body too large")
+                    return None
+            text = body.decode(response.encoding or "utf-8", errors="replace")
+            fetched = FetchedPage(text, **_cache_policy(response.headers))
+    except httpx.HTTPError as e:
+        logger.info(f"HTTP fetch of {url} failed ({type(e).__name__}), using the browser")
+        _count_fallback("request error")
+        return None
+
+    if not is_html:
+        # Plain text and JSON: wrap so parse_html keeps the text as is
+        fetched.html = f"<html><body><pre>{html.escape(text)}</pre></body></html>"
+    else:
+        reason = needs_javascript(text)
+        if reason is not None:
+            logger.info(f"{url} needs JavaScript ({reason}), using the browser")
+            _count_fallback(reason)
+            return None
+
+    elapsed = time.perf_counter() - started
+    FETCH_STATS["http"]["served"] += 1
+    FETCH_STATS["http"]["seconds"] += elapsed
+    _record_timing(url, "http", elapsed, len(body))
+    logger.info(f"Fetched {url} over HTTP in {elapsed:.2f}s")
+    return fetched
+
+async def fetch_page(url: str, cached: Optional[CachedPage] = None) -> Optional[FetchedPage]:
+    """Fetch a page, trying a plain HTTP GET first and the browser only when needed.
+
+    Args:
+        url: Page URL
+        cached: Expired cache entry to revalidate on the HTTP tier
+    """
+    if HTTP_FAST_PATH:
+        fetched = await fetch_page_http(url, cached)
+        if fetched is not None:
+            return fetched
+    else:
+        _count_fallback("fast path disabled")
+
+    content = await fetch_page_browser(url)
+    return FetchedPage(content) if content is not None else None
+
+async def fetch_page_browser(url: str) -> Optional[str]:
+    """Asynchronously fetch a webpage's content with a page from the shared browser pool.
+
+    Images, fonts, media, stylesheets and tracker requests are aborted. The page
+    is read once its DOM is ready and the network has settled, or once the
+    settle timeout passes, whichever comes first.
+    """
+    started = time.perf_counter()
+    requests = {"allowed": 0, "blocked": 0}
+
+    async def route_request(route):
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or BLOCKED_HOSTS.search(urlparse(request.url).hostname or ""):
+            requests["blocked"] += 1
+            await route.abort()
+        else:
+            requests["allowed"] += 1
+            await route.continue_()
+
+    content = None
+    settled = True
+    try:
+        async with get_browser_pool().page() as page:
+            logger.info(f"Fetching {url}")
+            await page.route("**/*", route_request)
+            await page.goto(url, wait_until=BROWSER_WAIT_UNTIL, timeout=BROWSER_NAVIGATION_TIMEOUT_MS)
+            loaded = time.perf_counter() - started
+            if BROWSER_SETTLE_MS > 0:
+                try:
+                    await page.wait_for_load_state("networkidle", timeout=BROWSER_SETTLE_MS)
+                except PlaywrightTimeoutError:
+                    # Pages that keep polling never go idle; read what has rendered so far
+                    settled = False
+            content = await page.content()
     except Exception as e:
         logger.error(f"Error fetching {url}: {str(e)}")
-        return None
-    finally:
-        await page.close()
+
+    elapsed = time.perf_counter() - started
+    stats = FETCH_STATS["browser"]
+    stats["served" if content is not None else "failed"] += 1
+    stats["seconds"] += elapsed
+    stats["requests_allowed"] += requests["allowed"]
+    stats["requests_blocked"] += requests["blocked"]
+    if content is not None:
+        _record_timing(url, "browser", elapsed, len(content), loaded=round(loaded, 4), settled=settled,
+                       requests_allowed=requests["allowed"], requests_blocked=requests["blocked"])
+        logger.info(f"Fetched {url} in the browser in {elapsed:.2f}s "
+                    f"({requests['blocked']} of {requests['allowed'] + requests['blocked']} requests blocked)")
+    return content
+
+_XHTML = "{http://www.w3.org/1999/xhtml}"
+_SKIPPED_TAGS = (f"{_XHTML}script", f"{_XHTML}style")
+_ANCHOR_TAG = f"{_XHTML}a"
+
+# Lines containing any of these are dropped as likely noise
+_NOISE_PATTERNS = ('var ', 'function()', '.js', '.css', 'google-analytics', 'disqus', '{', '}')
+
+def _extract_lines(root) -> List[str]:
+    """Text lines of an element tree, indented by depth, with links as markdown.
+
+    One iterative pre-order pass: an element's text is emitted on entry and its
+    tail on exit. Whether the subtree held any text (which decides if the tail
+    is kept) is accumulated on the way back up instead of re-walking the
+    subtree for every element.
+    """
+    result = []
+    seen_texts = set()  # To avoid duplicates
+    # Entries are (element, depth, exiting); has_text holds a flag per open element
+    stack = [(root, 0, False)]
+    has_text: List[bool] = []
+
+    while stack:
+        elem, depth, exiting = stack.pop()
+        if exiting:
+            subtree_has_text = has_text.pop()
+        else:
+            if elem.tag in _SKIPPED_TAGS:
+                # Skip script and style tags, but their text still counts for the parent
+                if has_text and not has_text[-1]:
+                    has_text[-1] = (any(text.strip() for text in elem.itertext())
+                                    or bool(elem.tail and elem.tail.strip()))
+                continue
+
+            text = elem.text.strip() if elem.text else ""
+            if text and text not in seen_texts:
+                if elem.tag == _ANCHOR_TAG:
+                    href = None
+                    for attr, value in elem.items():
+                        if attr.endswith('href'):
+                            href = value
+                            break
+                    if href and not href.startswith(('#', 'javascript:')):
+                        # Format as markdown link
+                        result.append("  " * depth + f"[{text}]({href})")
+                        seen_texts.add(text)
+                else:
+                    result.append("  " * depth + text)
+                    seen_texts.add(text)
+
+            if len(elem):
+                # Come back for the tail once the children are done
+                has_text.append(bool(text))
+                stack.append((elem, depth, True))
+                stack.extend([(child, depth + 1, False) for child in reversed(elem)])
+                continue
+            subtree_has_text = bool(text)
+
+        # Leaving the element: elements without any text are skipped along with their tail
+        tail = elem.tail.strip() if elem.tail else ""
+        if subtree_has_text and tail and tail not in seen_texts:
+            result.append("  " * depth + tail)
+            seen_texts.add(tail)
+        if has_text and not has_text[-1]:
+            has_text[-1] = subtree_has_text or bool(tail)
+
+    return result
+
+def _document_text(document) -> str:
+    """All text of a parsed document, one line per text node, with noise lines dropped."""
+    # Start processing from the body tag, falling back to the entire document
+    body = document.find(f'.//{_XHTML}body')
+    lines = _extract_lines(body if body is not None else document)
+    # Filter out common unwanted patterns
+    return '\n'.join(line for line in lines
+                     if not any(pattern in line.lower() for pattern in _NOISE_PATTERNS))
 
 def parse_html(html_content: Optional[str]) -> str:
     """Parse HTML content and extract text with hyperlinks in markdown format."""
     if not html_content:
         return ""
-    
+
     try:
-        document = html5lib.parse(html_content)
-        result = []
-        seen_texts = set()  # To avoid duplicates
-        
-        def should_skip_element(elem) -> bool:
-            """Check if the element should be skipped."""
-            # Skip script and style tags
-            if elem.tag in ['{http://www.w3.org/1999/xhtml}script', 
-                          '{http://www.w3.org/1999/xhtml}style']:
-                return True
-            # Skip empty elements or elements with only whitespace
-            if not any(text.strip() for text in elem.itertext()):
-                return True
-            return False
-        
-        def process_element(elem, depth=0):
-            """Process an element and its children recursively."""
-            if should_skip_element(elem):
-                return
-            
-            # Handle text content
-            if hasattr(elem, 'text') and elem.text:
-                text = elem.text.strip()
-                if text and text not in seen_texts:
-                    # Check if this is an anchor tag
-                    if elem.tag == '{http://www.w3.org/1999/xhtml}a':
-                        href = None
-                        for attr, value in elem.items():
-                            if attr.endswith('href'):
-                                href = value
-                                break
-                        if href and not href.startswith(('#', 'javascript:')):
-                            # Format as markdown link
-                            link_text = f"[{text}]({href})"
-                            result.append("  " * depth + link_text)
-                            seen_texts.add(text)
-                    else:
-                        result.append("  " * depth + text)
-                        seen_texts.add(text)
-            
-            # Process children
-            for child in elem:
-                process_element(child, depth + 1)
-            
-            # Handle tail text
-            if hasattr(elem, 'tail') and elem.tail:
-                tail = elem.tail.strip()
-                if tail and tail not in seen_texts:
-                    result.append("  " * depth + tail)
-                    seen_texts.add(tail)
-        
-        # Start processing from the body tag
-        body = document.find('.//{http://www.w3.org/1999/xhtml}body')
-        if body is not None:
-            process_element(body)
-        else:
-            # Fallback to processing the entire document
-            process_element(document)
-        
-        # Filter out common unwanted patterns
-        filtered_result = []
-        for line in result:
-            # Skip lines that are likely to be noise
-            if any(pattern in line.lower() for pattern in [
-                'var ', 
-                'function()', 
-                '.js',
-                '.css',
-                'google-analytics',
-                'disqus',
-                '{',
-                '}'
-            ]):
-                continue
-            filtered_result.append(line)
-        
-        return '\n'.join(filtered_result)
+        return _document_text(html5lib.parse(html_content))
     except Exception as e:
         logger.error(f"Error parsing HTML: {str(e)}")
         return ""
 
+def analyze_page(html_content: Optional[str]) -> Tuple[str, Optional[ExtractedContent]]:
+    """Parse a page once for both its full text and its main content (None if extraction failed)."""
+    if not html_content:
+        return "", None
+    try:
+        document = html5lib.parse(html_content)
+        text = _document_text(document)
+    except Exception as e:
+        logger.error(f"Error parsing HTML: {str(e)}")
+        return "", None
+    try:
+        # Runs last: it prunes the document in place
+        return text, extract_content(document)
+    except Exception as e:
+        logger.error(f"Error extracting main content: {str(e)}")
+        return text, None
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Get or create the worker processes that parse fetched pages, kept across scrapes."""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        logger.info(f"Started {PARSE_WORKERS} HTML parse workers")
+    return _parse_pool
+
+def close_parse_pool() -> None:
+    """Shut down the parse workers if they were started."""
+    global _parse_pool
+    if _parse_pool is not None:
+        pool, _parse_pool = _parse_pool, None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+async def _run_in_parse_pool(func, html_content: Optional[str]):
+    """Run a parse function in the worker pool, restarting the pool if a worker died."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_parse_pool(), func, html_content)
+    except BrokenProcessPool:
+        logger.warning("HTML parse worker died; restarting the pool")
+        close_parse_pool()
+        return await loop.run_in_executor(get_parse_pool(), func, html_content)
+
+async def parse_html_async(html_content: Optional[str]) -> str:
+    """Run parse_html in the worker pool."""
+    return await _run_in_parse_pool(parse_html, html_content)
+
+@dataclass
+class ScrapedPage:
+    """Full text of a scraped page and its main content, if one was found."""
+    url: str
+    text: str
+    content: Optional[ExtractedContent] = None
+    error: Optional[str] = None
+
+def _from_cache(url: str, cached: CachedPage) -> ScrapedPage:
+    content = None
+    if cached.quality is not None:
+        method = "main_content" if cached.content else "full_text"
+        content = ExtractedContent(cached.content or "", cached.title, cached.quality, method)
+    return ScrapedPage(url, cached.text, content)
+
+async def scrape_page(
+    url: str,
+    slot: Optional[Callable[[], AsyncContextManager]] = None,
+    fetch_timeout: Optional[float] = None,
+) -> ScrapedPage:
+    """Fetch and parse one URL, using the page cache.
+
+    Fresh cached pages are returned without fetching or parsing; expired ones
+    are revalidated with a conditional GET.
+
+    Args:
+        url: Page URL
+        slot: Factory for a context manager held only around the network fetch,
+            so cache hits are not subject to concurrency limits
+        fetch_timeout: Seconds allowed for the network fetch once the slot is
+            held; raises asyncio.TimeoutError when exceeded
+    """
+    cache = get_page_cache() if PAGE_CACHE_ENABLED else None
+    # SQLite calls share a lock with eviction, so keep them off the event loop
+    cached = await asyncio.to_thread(cache.get, url) if cache is not None else None
+    if cached is not None and cached.fresh:
+        return _from_cache(url, cached)
+
+    revalidate = cached if cached is not None and cached.revalidatable else None
+    if slot is not None:
+        async with slot():
+            fetched = await asyncio.wait_for(fetch_page(url, revalidate), fetch_timeout)
+    else:
+        fetched = await asyncio.wait_for(fetch_page(url, revalidate), fetch_timeout)
+
+    if fetched is None:
+        # Serve the expired copy rather than nothing
+        if cached is not None:
+            return _from_cache(url, cached)
+        return ScrapedPage(url, "", error="fetch failed")
+    if fetched.not_modified:
+        await asyncio.to_thread(cache.refresh, url, fetched.ttl)
+        return _from_cache(url, cached)
+
+    text, content = await _run_in_parse_pool(analyze_page, fetched.html)
+    if cache is not None and not fetched.no_store:
+        await asyncio.to_thread(
+            cache.put, url, fetched.html, text, fetched.etag, fetched.last_modified, fetched.ttl,
+            content=content.text if content else None,
+            title=content.title if content else None,
+            quality=content.quality if content else None,
+        )
+    return ScrapedPage(url, text, content)
+
+async def scrape_pages(urls: List[str], max_concurrent: int = 5) -> List[ScrapedPage]:
+    """Fetch and parse multiple URLs concurrently.
+
+    Pages come from the server-wide browser pool, which also bounds the total
+    number of open pages; ``max_concurrent`` further limits fetches in this call.
+    The server goes through the shared scrape scheduler instead.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrent))
+    return list(await asyncio.gather(*(scrape_page(url, lambda: semaphore) for url in urls)))
+
 async def process_urls(urls: List[str], max_concurrent: int = 5) -> List[str]:
-    """Process multiple URLs concurrently."""
-    async with async_playwright() as p:
-        browser = await p.chromium.launch()
-        try:
-            # Create browser contexts
-            n_contexts = min(len(urls), max_concurrent)
-            contexts = [await browser.new_context() for _ in range(n_contexts)]
-            
-            # Create tasks for each URL
-            tasks = []
-            for i, url in enumerate(urls):
-                context = contexts[i % len(contexts)]
-                task = fetch_page(url, context)
-                tasks.append(task)
-            
-            # Gather results
-            html_contents = await asyncio.gather(*tasks)
-            
-            # Parse HTML contents in parallel
-            with Pool() as pool:
-                results = pool.map(parse_html, html_contents)
-                
-            return results
-            
-        finally:
-            # Cleanup
-            for context in contexts:
-                await context.close()
-            await browser.close()
+    """Process multiple URLs concurrently, returning the full text of each page."""
+    return [page.text for page in await scrape_pages(urls, max_concurrent)]
+
+async def _process_urls_once(urls: List[str], max_concurrent: int) -> List[str]:
+    """Process URLs and close the browser pool, HTTP client, parse workers and page cache afterwards (command-line use)."""
+    try:
+        return await process_urls(urls, max_concurrent)
+    finally:
+        await close_http_client()
+        await close_browser_pool()
+        close_parse_pool()
+        close_page_cache()
+        logger.info(f"Fetch tiers: {fetch_metrics()}")
 
 def validate_url(url: str) -> bool:
     """Validate if the given string is a valid URL."""
@@ -189,7 +556,7 @@ def main():
     
     start_time = time.time()
     try:
-        results = asyncio.run(process_urls(valid_urls, args.max_concurrent))
+        results = asyncio.run(_process_urls_once(valid_urls, args.max_concurrent))
         
         # Print results to stdout
         for url, text in zip(valid_urls, results):
@@ -0,0 +1,235 @@
+"""Web search behind a pluggable async provider.
+
+Searches never block the event loop: the DuckDuckGo client is synchronous, so
+it runs in a worker thread. Failed searches are retried with exponential
+backoff and jitter using ``asyncio.sleep``, and results are kept in a
+TTL-bounded LRU cache keyed by provider and normalized query. The local
+provider answers from an in-memory or JSON corpus with configurable latency
+and failure rate, so caching and retry behaviour can be exercised offline.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("WEB_SEARCH_CACHE_TTL", "900"))
+SEARCH_CACHE_SIZE = 256
+DEFAULT_MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+
+
+@dataclass
+class SearchResult:
+    title: str
+    url: str
+    snippet: str
+
+
+class SearchError(Exception):
+    """Raised when a search fails after all retries."""
+
+
+class SearchProvider(ABC):
+    """Source of web search results."""
+
+    name: str = "provider"
+
+    @abstractmethod
+    async def search(self, query: str, max_results: int) -> List[SearchResult]:
+        """Return up to ``max_results`` results for ``query``; raise on failure."""
+
+
+class DuckDuckGoProvider(SearchProvider):
+    """DuckDuckGo text search; the blocking client runs in a worker thread."""
+
+    name = "duckduckgo"
+
+    async def search(self, query: str, max_results: int) -> List[SearchResult]:
+        return await asyncio.to_thread(self._search_blocking, query, max_results)
+
+    @staticmethod
+    def _search_blocking(query: str, max_results: int) -> List[SearchResult]:
+        from duckduckgo_search import DDGS
+
+        with DDGS() as ddgs:
+            results = list(ddgs.text(query, max_results=max_results))
+        return [SearchResult(r.get("title", "N/A"), r.get("href", "N/A"), r.get("body", "N/A")) for r in results]
+
+
+class LocalSearchProvider(SearchProvider):
+    """Offline stand-in ranking a fixed corpus by term overlap.
+
+    Latency and failures are simulated so backoff and caching can be measured
+    without network access.
+    """
+
+    name = "local"
+
+    def __init__(self, corpus: Optional[List[Dict[str, str]]] = None, latency: float = 0.0,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        """Initialize the provider.
+
+        Args:
+            corpus: Documents with "title", "url" and "snippet" keys
+            latency: Seconds each search takes
+            failure_rate: Probability (0-1) that a search raises
+            seed: Random seed for reproducible failures
+        """
+        self.corpus = corpus or []
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs: Any) -> "LocalSearchProvider":
+        """Load the corpus from a JSON list of {"title", "url", "snippet"} objects."""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    async def search(self, query: str, max_results: int) -> List[SearchResult]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._random.random() < self.failure_rate:
+            raise SearchError("simulated provider failure")
+        terms = set(re.findall(r"\w+", query.lower()))
+        scored = []
+        for index, doc in enumerate(self.corpus):
+            words = set(re.findall(r"\w+", f"{doc.get('title', '')} {doc.get('snippet', '')}".lower()))
+            overlap = len(terms & words)
+            if overlap:
+                scored.append((-overlap, index, doc))
+        scored.sort(key=lambda item: item[:2])
+        return [SearchResult(doc.get("title", ""), doc.get("url", ""), doc.get("snippet", ""))
+                for _, _, doc in scored[:max_results]]
+
+
+class WebSearch:
+    """Cached web search with async retries over a provider."""
+
+    def __init__(
+        self,
+        provider: SearchProvider,
+        cache_ttl: float = SEARCH_CACHE_TTL_SECONDS,
+        cache_size: int = SEARCH_CACHE_SIZE,
+        base_delay: float = BACKOFF_BASE_SECONDS,
+        max_delay: float = BACKOFF_MAX_SECONDS,
+    ):
+        """Initialize the search.
+
+        Args:
+            provider: Where results come from
+            cache_ttl: Seconds a query's results are reused
+            cache_size: Maximum number of cached queries
+            base_delay: Backoff before the first retry, doubled on each further retry
+            max_delay: Upper bound on a single backoff
+        """
+        self.provider = provider
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._cache: "OrderedDict[Tuple[str, str, int], Tuple[float, List[SearchResult]]]" = OrderedDict()
+        self.stats = {"searches": 0, "cache_hits": 0, "retries": 0, "failures": 0, "provider_seconds": 0.0}
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with equal jitter for the given retry attempt (0-based)."""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def search(self, query: str, max_results: int = 10, max_retries: int = DEFAULT_MAX_RETRIES) -> List[SearchResult]:
+        """Search, serving repeated queries from the cache.
+
+        Args:
+            query: Search query
+            max_results: Maximum number of results
+            max_retries: Attempts before giving up
+
+        Raises:
+            SearchError: If every attempt failed
+        """
+        self.stats["searches"] += 1
+        key = (self.provider.name, self._normalize(query), max_results)
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_ttl:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return cached[1]
+
+        attempts = max(1, max_retries)
+        for attempt in range(attempts):
+            started = time.perf_counter()
+            try:
+                results = await self.provider.search(query, max_results)
+                self.stats["provider_seconds"] += time.perf_counter() - started
+                break
+            except Exception as e:
+                self.stats["provider_seconds"] += time.perf_counter() - started
+                if attempt == attempts - 1:
+                    self.stats["failures"] += 1
+                    raise SearchError(f"Search failed after {attempts} attempts: {str(e)}") from e
+                delay = self._backoff(attempt)
+                self.stats["retries"] += 1
+                logger.info(f"Search for {query!r} failed ({e}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+        self._cache[key] = (time.monotonic(), results)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return results
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "provider": self.provider.name, "cached_queries": len(self._cache)}
+
+
+def format_search_results(results: List[SearchResult]) -> str:
+    """Format results into a readable string with URLs and snippets."""
+    if not results:
+        return "No results found"
+    formatted_results = []
+    for i, r in enumerate(results, 1):
+        formatted_results.append(f"\n=== Result {i} ===")
+        formatted_results.append(f"URL: {r.url}")
+        formatted_results.append(f"Title: {r.title}")
+        formatted_results.append(f"Snippet: {r.snippet}")
+    return "\n".join(formatted_results)
+
+
+_web_search: Optional[WebSearch] = None
+
+def get_web_search() -> WebSearch:
+    """Get or create the global web search instance.
+
+    WEB_SEARCH_PROVIDER selects "duckduckgo" (default) or "local"; the local
+    provider reads WEB_SEARCH_LOCAL_CORPUS and simulates WEB_SEARCH_LOCAL_LATENCY
+    seconds per search.
+    """
+    global _web_search
+    if _web_search is None:
+        if os.getenv("WEB_SEARCH_PROVIDER", "duckduckgo") == "local":
+            latency = float(os.getenv("WEB_SEARCH_LOCAL_LATENCY", "0"))
+            corpus_path = os.getenv("WEB_SEARCH_LOCAL_CORPUS")
+            provider = (LocalSearchProvider.from_file(corpus_path, latency=latency) if corpus_path
+                        else LocalSearchProvider(latency=latency))
+        else:
+            provider = DuckDuckGoProvider()
+        _web_search = WebSearch(provider)
+        logger.info(f"Web search provider: {provider.name}")
+    return _web_search
@@ -5,7 +5,11 @@ from typing import List, Dict, Any, Optional
 import logging
 import datetime
 import queue
+import uuid
 from starlette.websockets import WebSocketState
+from src.agents.notebook_upload import NotebookUpload, NotebookUploadError, SUPPORTED_COMPRESSION
+from src.agents.blob_store import get_blob_store, externalize_outputs
+from src.agents.notebook_model import Cell, Notebook, NotebookHistory
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -14,7 +18,11 @@ logger = logging.getLogger(__name__)
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
-        self.notebook_contents: Dict[str, Any] = {}
+        self.session_ids: Dict[WebSocket, str] = {}
+        self.uploads: Dict[WebSocket, NotebookUpload] = {}
+        self.history = NotebookHistory()
+        # Pending proposed changes by id: base version, cell index and base Cell
+        self.proposals: Dict[str, Dict[str, Any]] = {}
         self.input_queue: queue.Queue = queue.Queue()
         self.waiting_for_input: bool = False
         self._lock = asyncio.Lock()
@@ -41,6 +49,7 @@ class ConnectionManager:
         logger.info("New client attempting to connect")
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.session_ids[websocket] = uuid.uuid4().hex
         logger.info(f"Client connected. Total connections: {len(self.active_connections)}")
         await self._send_system_message("Connected to server", websocket=websocket)
 
@@ -48,19 +57,30 @@ class ConnectionManager:
         try:
             if websocket in self.active_connections:
                 self.active_connections.remove(websocket)
-                
-            to_remove = []
-            for path, info in self.notebook_contents.items():
-                if isinstance(info, dict) and info.get('websocket') == websocket:
-                    to_remove.append(path)
-            
-            for path in to_remove:
-                del self.notebook_contents[path]
+            self.session_ids.pop(websocket, None)
+            self.uploads.pop(websocket, None)
                 
             logger.info(f"Client disconnected. Remaining connections: {len(self.active_connections)}")
         except Exception as e:
             logger.error(f"Error during disconnect: {str(e)}", exc_info=True)
 
+    def get_session_id(self, websocket: WebSocket) -> Optional[str]:
+        """Get the session id assigned to a connection"""
+        return self.session_ids.get(websocket)
+
+    def get_websocket(self, session_id: str) -> Optional[WebSocket]:
+        """Get the connection belonging to a session id"""
+        for websocket, sid in self.session_ids.items():
+            if sid == session_id:
+                return websocket
+        return None
+
+    async def send_system_message(self, session_id: str, content: str):
+        """Send a system message to a single session"""
+        websocket = self.get_websocket(session_id)
+        if websocket is not None:
+            await self._send_system_message(content, websocket=websocket)
+
     async def broadcast(self, message: Dict[str, Any]):
         if not self.active_connections:
             logger.warning("No active connections to broadcast to")
@@ -106,11 +126,13 @@ class ConnectionManager:
             if not isinstance(content, dict) or "cells" not in content:
                 logger.error("Invalid notebook format")
                 return
+
+            notebook = await asyncio.to_thread(self._load_notebook, content)
                 
             async with self._lock:
-                self.notebook_contents = content
-                logger.info(f"Notebook loaded with {len(content.get('cells', []))} cells")
-                logger.info(f"First cell content: {content.get('cells', [])[0] if content.get('cells') else 'No cells'}")
+                notebook = self.history.commit(notebook, share=False)
+                logger.info(f"Notebook loaded with {len(notebook)} cells (version {notebook.version})")
+                logger.info(f"First cell content: {notebook[0].source[:200] if len(notebook) else 'No cells'}")
             
         except Exception as e:
             logger.error(f"Error handling notebook opened: {e}")
@@ -139,10 +161,16 @@ class ConnectionManager:
             if not isinstance(content, dict) or "cells" not in content:
                 logger.error("Invalid notebook format")
                 return
+
+            notebook = await asyncio.to_thread(self._load_notebook, content)
             
-            self.notebook_contents = content
-            logger.info(f"Updated notebook with {len(content.get('cells', []))} cells")
-            logger.info(f"First cell content: {content.get('cells', [])[0] if content.get('cells') else 'No cells'}")
+            notebook = self.history.commit(notebook)
+            logger.info(f"Updated notebook with {len(notebook)} cells (version {notebook.version})")
+            logger.info(f"First cell content: {notebook[0].source[:200] if len(notebook) else 'No cells'}")
+
+            stale = self.stale_proposals()
+            if stale:
+                await self.broadcast({"type": "proposals_stale", "ids": stale})
             
         except Exception as e:
             logger.error(f"Error handling notebook update: {e}")
@@ -151,9 +179,185 @@ class ConnectionManager:
                 websocket=websocket
             )
 
-    def get_notebook_content(self) -> Dict[str, Any]:
+    async def handle_upload_start(self, websocket: WebSocket, data: Dict[str, Any]):
+        """Begin a chunked notebook upload; binary frames follow."""
+        upload_id = data.get("upload_id") or uuid.uuid4().hex
+        compression = data.get("compression") or "none"
+        if compression not in SUPPORTED_COMPRESSION:
+            await self._send_upload_error(websocket, upload_id, f"Unsupported compression: {compression}")
+            return
+        if websocket in self.uploads:
+            logger.warning(f"Replacing unfinished upload {self.uploads[websocket].upload_id}")
+        self.uploads[websocket] = NotebookUpload(
+            upload_id=upload_id,
+            path=data.get("path"),
+            total_bytes=int(data.get("size") or 0),
+            compression=compression,
+            event=data.get("event") or "notebook_opened",
+            on_cell=self._load_cell,
+        )
+        logger.info(f"Started upload {upload_id} ({data.get('size')} bytes, compression={compression})")
+
+    async def handle_upload_chunk(self, websocket: WebSocket, chunk: bytes):
+        """Feed one binary frame into the connection's active upload."""
+        upload = self.uploads.get(websocket)
+        if upload is None:
+            logger.error("Received binary frame without an active upload")
+            return
+        try:
+            # Parsing stores cell outputs on disk, so keep it off the event loop
+            await asyncio.to_thread(upload.add_chunk, chunk)
+        except (NotebookUploadError, ValueError) as e:
+            del self.uploads[websocket]
+            await self._send_upload_error(websocket, upload.upload_id, str(e))
+            return
+        await websocket.send_json(upload.progress())
+
+    async def handle_upload_end(self, websocket: WebSocket, data: Dict[str, Any]):
+        """Finish the connection's active upload and load the notebook."""
+        upload = self.uploads.pop(websocket, None)
+        if upload is None or upload.upload_id != data.get("upload_id", upload.upload_id):
+            logger.error("Received notebook_upload_end without a matching upload")
+            return
+        try:
+            content = await asyncio.to_thread(upload.finish)
+        except (NotebookUploadError, ValueError) as e:
+            await self._send_upload_error(websocket, upload.upload_id, str(e))
+            return
+        async with self._lock:
+            notebook = self.history.commit(Notebook.from_dict(content), share=upload.event == "notebook_updated")
+        logger.info(f"Notebook loaded from upload with {len(notebook)} cells ({upload.event})")
+        await websocket.send_json({
+            "type": "upload_complete",
+            "upload_id": upload.upload_id,
+            "cells": len(notebook),
+        })
+
+    def _load_notebook(self, content: Dict[str, Any]) -> Notebook:
+        """Build a Notebook from its JSON form; blocking, so callers run it in a worker thread."""
+        return Notebook.from_dict({**content, "cells": [self._load_cell(c) for c in content["cells"]]})
+
+    def _load_cell(self, cell: Dict[str, Any]) -> Cell:
+        """Build a Cell, moving its outputs to the blob store so only references stay in memory."""
+        if not isinstance(cell, dict):
+            raise ValueError(f"Invalid cell: {type(cell).__name__}")
+        return Cell.from_dict(externalize_outputs(cell, get_blob_store()))
+
+    async def _send_upload_error(self, websocket: WebSocket, upload_id: str, error: str):
+        logger.error(f"Upload {upload_id} failed: {error}")
+        try:
+            await websocket.send_json({"type": "upload_error", "upload_id": upload_id, "error": error})
+        except Exception as e:
+            logger.error(f"Error sending upload error: {e}")
+        await self._send_system_message(f"Error uploading notebook: {error}", websocket=websocket)
+
+    @property
+    def notebook(self) -> Optional[Notebook]:
+        """Current notebook version"""
+        return self.history.current
+
+    def register_proposal(self, index: int, new_content: str, cell_type: str) -> Dict[str, Any]:
+        """Record a proposed change to a cell of the current version.
+
+        Returns the proposal with its ``id`` and ``base_version`` plus the ids of
+        other pending proposals for the same cell, which it conflicts with.
+        """
+        notebook = self.notebook
+        proposal = {
+            "id": uuid.uuid4().hex,
+            "base_version": notebook.version,
+            "index": index,
+            "base_cell": notebook[index],
+            "new_content": new_content,
+            "cell_type": cell_type,
+        }
+        conflicts = [
+            p["id"] for p in self.proposals.values()
+            if p["base_cell"] is proposal["base_cell"]
+        ]
+        self.proposals[proposal["id"]] = proposal
+        while len(self.proposals) > 500:
+            self.proposals.pop(next(iter(self.proposals)))
+        return {**proposal, "conflicts": conflicts}
+
+    def register_change_set(self, operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Record a multi-cell change set proposed against the current version."""
+        notebook = self.notebook
+        proposal = {
+            "id": uuid.uuid4().hex,
+            "base_version": notebook.version,
+            "base_length": len(notebook),
+            # Cells the set touches, by original index
+            "base_cells": {
+                op["base_index"]: notebook[op["base_index"]]
+                for op in operations if op.get("base_index") is not None
+            },
+            "operations": operations,
+        }
+        self.proposals[proposal["id"]] = proposal
+        while len(self.proposals) > 500:
+            self.proposals.pop(next(iter(self.proposals)))
+        return proposal
+
+    def is_proposal_stale(self, proposal: Dict[str, Any]) -> bool:
+        """A proposal is stale once the cells it is based on changed.
+
+        Single-cell proposals only need their base cell to still exist; change
+        sets address cells by index, so they also need the layout unchanged.
+        """
+        if "base_cell" in proposal:
+            return self.history.locate(proposal["base_cell"]) is None
+        notebook = self.notebook
+        return (
+            notebook is None
+            or len(notebook) != proposal["base_length"]
+            or any(not self.history.is_unchanged(cell, index) for index, cell in proposal["base_cells"].items())
+        )
+
+    def stale_proposals(self) -> List[str]:
+        """Ids of pending proposals whose base cell changed since the last check."""
+        stale = []
+        for pid, proposal in self.proposals.items():
+            if not proposal.get("stale") and self.is_proposal_stale(proposal):
+                proposal["stale"] = True
+                stale.append(pid)
+        return stale
+
+    async def handle_change_resolved(self, websocket: WebSocket, data: Dict[str, Any]):
+        """Handle change_accepted / change_rejected from the frontend."""
+        proposal = self.proposals.pop(data.get("changeId"), None)
+        if proposal is None:
+            return
+        if data.get("type") == "change_accepted" and self.is_proposal_stale(proposal):
+            logger.warning(f"Accepted proposal {proposal['id']} is based on outdated version {proposal['base_version']}")
+            target = f"change to cell {proposal['index']}" if "index" in proposal else "change set"
+            await self._send_system_message(
+                f"Warning: the accepted {target} was proposed against an older version "
+                f"of the notebook (version {proposal['base_version']}).",
+                websocket=websocket
+            )
+
+    async def handle_change_content_request(self, websocket: WebSocket, data: Dict[str, Any]):
+        """Resend a proposal with its full content when the client cannot apply its hunks."""
+        proposal = self.proposals.get(data.get("changeId"))
+        if proposal is None or "base_cell" not in proposal:
+            logger.warning(f"Content requested for unknown proposal {data.get('changeId')}")
+            return
+        await websocket.send_json({
+            "type": "propose_changes",
+            "changes": [{
+                "type": "update",
+                "id": proposal["id"],
+                "base_version": proposal["base_version"],
+                "index": proposal["index"],
+                "new_content": proposal["new_content"],
+                "cell_type": proposal["cell_type"],
+            }]
+        })
+
+    def get_notebook_content(self) -> Optional[Notebook]:
         """Direct access to notebook content"""
-        if not self.notebook_contents:
+        if self.notebook is None:
             logger.warning("Attempting to access notebook content when none is loaded")
-        return self.notebook_contents
+        return self.notebook
 
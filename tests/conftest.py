@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Add the project root to Python path so tests can import the src package
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
@@ -0,0 +1,120 @@
+import asyncio
+
+from src.agents.admission import AdmissionController
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def controller(**options):
+    messages = []
+
+    async def notify(session_id, text):
+        messages.append((session_id, text))
+
+    return AdmissionController(notify=notify, **options), messages
+
+
+def test_control_commands_jump_the_queue():
+    async def scenario():
+        admission, _ = controller()
+        await admission.submit("a", {"message": "plot the data"})
+        await admission.submit("b", {"message": "clear_history"})
+        return [(await admission.get()).session_id for _ in range(2)]
+
+    assert run(scenario()) == ["b", "a"]
+
+
+def test_duplicate_pending_request_is_coalesced():
+    async def scenario():
+        admission, messages = controller()
+        first = await admission.submit("a", {"message": "hi"})
+        second = await admission.submit("a", {"message": "hi"})
+        return first, second, messages
+
+    first, second, messages = run(scenario())
+    assert second.status == "coalesced"
+    assert second.request is first.request
+    assert messages[-1] == ("a", "This request is already queued (position 1).")
+
+
+def test_duplicate_of_running_request_is_coalesced():
+    async def scenario():
+        admission, messages = controller()
+        await admission.submit("a", {"message": "hi"})
+        running = await admission.get()
+        result = await admission.submit("a", {"message": "hi"})
+        return running, result, admission.metrics(), messages
+
+    running, result, metrics, messages = run(scenario())
+    assert (result.status, result.request, result.position) == ("coalesced", running, None)
+    assert metrics["pending"] == 0
+    assert messages[-1] == ("a", "This request is already being processed.")
+
+
+def test_replacement_keeps_place_and_enqueue_time():
+    async def scenario():
+        admission, _ = controller()
+        stale = (await admission.submit("a", {"message": "first"})).request
+        await admission.submit("b", {"message": "other"})
+        replaced = await admission.submit("a", {"message": "second"})
+        return stale, replaced, await admission.get()
+
+    stale, replaced, first_out = run(scenario())
+    assert replaced.status == "replaced"
+    assert replaced.position == 1
+    assert replaced.request.enqueued_at == stale.enqueued_at
+    assert first_out is replaced.request
+    assert first_out.payload["message"] == "second"
+
+
+def test_full_queue_rejects():
+    async def scenario():
+        admission, messages = controller(max_pending=2)
+        results = [await admission.submit(session, {"message": "hi"}) for session in "abc"]
+        return [result.status for result in results], messages
+
+    statuses, messages = run(scenario())
+    assert statuses == ["queued", "queued", "rejected"]
+    assert messages[-1] == ("c", "The server is busy. Please try again in a moment.")
+
+
+def test_session_waits_for_its_running_request():
+    async def scenario():
+        admission, _ = controller()
+        first = (await admission.submit("a", {"message": "one"})).request
+        await admission.get()
+        await admission.submit("a", {"message": "two"})
+        await admission.submit("b", {"message": "three"})
+        # "a" is busy, so "b" is served first even though it queued later
+        served = await admission.get()
+        await admission.complete(first)
+        return served.session_id, (await admission.get()).session_id
+
+    assert run(scenario()) == ("b", "a")
+
+
+def test_waiting_sessions_are_told_their_position():
+    async def scenario():
+        admission, messages = controller()
+        await admission.submit("a", {"message": "one"})
+        await admission.submit("b", {"message": "two"})
+        messages.clear()
+        await admission.get()
+        return messages
+
+    assert run(scenario()) == [("b", "Your request is queued (position 1 of 1).")]
+
+
+def test_cancel_session_drops_pending_requests():
+    async def scenario():
+        admission, _ = controller()
+        await admission.submit("a", {"message": "one"})
+        await admission.submit("b", {"message": "two"})
+        dropped = await admission.cancel_session("a")
+        return dropped, admission.metrics()
+
+    dropped, metrics = run(scenario())
+    assert dropped == 1
+    assert (metrics["pending"], metrics["cancelled"]) == (1, 1)
@@ -0,0 +1,72 @@
+import pytest
+
+from src.agents.cell_context import RetrievalError, decode_cursor, retrieve_cells
+from src.agents.notebook_model import Cell, Notebook
+
+
+def notebook(*sources):
+    return Notebook([Cell("code", source) for source in sources])
+
+
+def long_cell(name, lines):
+    return "\n".join(f"{name}_{i} = compute({i}, label='{name}')" for i in range(lines))
+
+
+@pytest.mark.parametrize("budget", [100, 200, 500, 1000])
+@pytest.mark.parametrize("policy", ["full", "head_tail", "signatures"])
+def test_pages_stay_within_budget(budget, policy):
+    nb = notebook(*(long_cell(f"v{i}", 5 + 7 * i) for i in range(12)))
+    cursor = None
+    returned = []
+    for _ in range(1000):
+        page = retrieve_cells(nb, "", budget, policy, cursor)
+        assert page.tokens <= budget
+        returned.extend(page.returned)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert sorted(set(returned)) == list(range(12))
+
+
+def test_shortened_cell_is_continued_from_cursor():
+    nb = notebook(long_cell("x", 80), "y = 1")
+    first = retrieve_cells(nb, "", 300)
+    assert first.truncated == [0]
+    _, position, (start, stop) = decode_cursor(first.next_cursor)
+    assert position == 0 and 0 < start < stop < 80
+    assert f"x_{start - 1} = " in first.text and f"x_{stop} = " in first.text
+
+    second = retrieve_cells(nb, "", 4000, cursor=first.next_cursor)
+    assert f'note="lines {start + 1}-{stop} of 80"' in second.text
+    assert f"x_{start - 1} = " not in second.text
+    assert f"x_{stop} = " not in second.text  # The tail was already shown
+    assert f"x_{stop - 1} = " in second.text
+    assert second.returned == [0, 1]
+    assert second.next_cursor is None
+
+
+def test_continuation_pages_until_omitted_lines_are_read():
+    nb = notebook(long_cell("x", 200))
+    page = retrieve_cells(nb, "", 200)
+    shown = {line for line in page.text.splitlines() if line.startswith("x_")}
+    while page.next_cursor:
+        page = retrieve_cells(nb, "", 200, cursor=page.next_cursor)
+        assert page.tokens <= 200
+        lines = {line for line in page.text.splitlines() if line.startswith("x_")}
+        assert not lines & shown
+        shown |= lines
+    assert len(shown) == 200
+
+
+def test_out_of_range_markers_stay_within_budget():
+    nb = notebook("a = 1")
+    page = retrieve_cells(nb, "", 64, indices=list(range(1, 200)))
+    assert page.tokens <= 64
+    assert page.next_cursor is not None
+
+
+def test_invalid_cursor():
+    with pytest.raises(RetrievalError):
+        retrieve_cells(notebook("a = 1"), cursor="1:x")
+    with pytest.raises(RetrievalError):
+        retrieve_cells(notebook("a = 1"), cursor="1:0:5-5")
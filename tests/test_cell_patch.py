@@ -0,0 +1,111 @@
+import pytest
+
+from src.agents.cell_patch import PatchBlock, PatchError, apply_block, apply_patch, parse_patch
+
+
+def block(search, replace, line_hint=None):
+    return PatchBlock(search, replace, line_hint)
+
+
+def test_exact_match_replaces_whole_lines():
+    source = "a = 1\nb = 2\nc = 3\n"
+    result, how = apply_block(source, block("b = 2", "b = 20"))
+    assert result == "a = 1\nb = 20\nc = 3\n"
+    assert how == "exact"
+
+
+def test_indented_line_is_reindented_not_matched_mid_line():
+    source = "def f():\n    a = 1\n    b = 2\n    return a + b\n"
+    result, how = apply_block(source, block("b = 2", "b = 3\nc = 4"))
+    assert result == "def f():\n    a = 1\n    b = 3\n    c = 4\n    return a + b\n"
+    assert how == "whitespace"
+    compile(result, "<cell>", "exec")
+
+
+def test_exact_match_ignores_occurrence_ending_mid_line():
+    source = "x = 20\nx = 2\n"
+    result, how = apply_block(source, block("x = 2", "x = 5"))
+    assert result == "x = 20\nx = 5\n"
+    assert how == "exact"
+
+
+def test_multiline_exact_match():
+    source = "import os\n\ndef f():\n    return 1\n"
+    result, _ = apply_block(source, block("def f():\n    return 1\n", "def f():\n    return 2\n"))
+    assert result == "import os\n\ndef f():\n    return 2\n"
+
+
+def test_ambiguous_exact_match_needs_hint():
+    source = "x = 1\ny = 0\nx = 1\n"
+    with pytest.raises(PatchError, match="occurs 2 times"):
+        apply_block(source, block("x = 1", "x = 2"))
+    result, _ = apply_block(source, block("x = 1", "x = 2", line_hint=2))
+    assert result == "x = 1\ny = 0\nx = 2\n"
+
+
+def test_whitespace_tier_dedents_replacement():
+    source = "x = 1\ny = 2\n"
+    result, how = apply_block(source, block("    x = 1", "    x = 10\n    z = 0"))
+    assert result == "x = 10\nz = 0\ny = 2\n"
+    assert how == "whitespace"
+
+
+def test_fuzzy_match_reports_ratio():
+    source = "values = load_data(path)\nresult = values.mean()\nprint(result)\n"
+    result, how = apply_block(source, block("values = load_data(path)\nresult = values.mean( )\n", "values = load()\n"))
+    assert result == "values = load()\nprint(result)\n"
+    assert how.startswith("fuzzy")
+
+
+def test_not_found_names_closest_region():
+    with pytest.raises(PatchError, match="Closest region"):
+        apply_block("a = 1\nb = 2\n", block("completely different text", "x"))
+
+
+def test_empty_search_only_fills_empty_cell():
+    assert apply_block("", block("", "print(1)")) == ("print(1)", "exact")
+    with pytest.raises(PatchError):
+        apply_block("x = 1\n", block("", "print(1)"))
+
+
+def test_apply_search_replace_patch():
+    patch = "<<<<<<< SEARCH\nb = 2\n=======\nb = 3\n>>>>>>> REPLACE\n"
+    result = apply_patch("a = 1\nb = 2\n", patch)
+    assert result.content == "a = 1\nb = 3\n"
+    assert result.matches == ["exact"]
+
+
+def test_apply_unified_diff_hunk():
+    patch = "@@ -1,2 +1,2 @@\n a = 1\n-b = 2\n+b = 3\n"
+    assert apply_patch("a = 1\nb = 2\nc = 3\n", patch).content == "a = 1\nb = 3\nc = 3\n"
+
+
+def test_parse_patch_rejects_text_without_blocks():
+    with pytest.raises(PatchError, match="no SEARCH/REPLACE"):
+        parse_patch("just some text")
+
+
+def test_failing_block_is_numbered():
+    patch = ("<<<<<<< SEARCH\na = 1\n=======\na = 2\n>>>>>>> REPLACE\n"
+             "<<<<<<< SEARCH\nnot there at all\n=======\nx\n>>>>>>> REPLACE\n")
+    with pytest.raises(PatchError, match="Block 2 of 2"):
+        apply_patch("a = 1\n", patch)
+
+
+DELETE_X = "<<<<<<< SEARCH\nx = 1\n=======\n>>>>>>> REPLACE\n"
+
+
+@pytest.mark.parametrize("source, expected", [
+    ("x = 1\ny = 2\n", "y = 2\n"),
+    ("if a:\n    x = 1\n    y = 2\n", "if a:\n    y = 2\n"),
+    ("y = 2\nx = 1", "y = 2"),
+    ("if a:\n    y = 2\n    x = 1", "if a:\n    y = 2"),
+])
+def test_empty_replace_deletes_lines(source, expected):
+    assert apply_patch(source, DELETE_X).content == expected
+
+
+def test_line_hint_follows_earlier_blocks():
+    source = "a\nx = 1\nb\nc\nd\nx = 1\ne\n"
+    patch = "@@ -1,1 +1,4 @@\n a\n+n1\n+n2\n+n3\n@@ -6,1 +9,1 @@\n-x = 1\n+x = 2\n"
+    assert apply_patch(source, patch).content == "a\nn1\nn2\nn3\nx = 1\nb\nc\nd\nx = 2\ne\n"
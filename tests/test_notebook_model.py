@@ -0,0 +1,59 @@
+from src.agents.notebook_model import Cell, Notebook, NotebookHistory
+
+
+def code(source, execution_count=None, outputs=None):
+    return {"cell_type": "code", "source": source, "metadata": {},
+            "execution_count": execution_count, "outputs": outputs or []}
+
+
+def saved(source, cell_type="code"):
+    # The frontend's notebook_updated message sends sources only
+    return {"id": "c", "cell_type": cell_type, "source": source}
+
+
+OUTPUT = {"output_type": "stream", "name": "stdout", "text": "3\n"}
+
+
+def open_notebook(history, *cells):
+    return history.commit(Notebook.from_dict({"cells": list(cells)}), share=False)
+
+
+def test_save_without_outputs_keeps_server_outputs():
+    history = NotebookHistory()
+    opened = open_notebook(history, code("print(1 + 2)", 1, [OUTPUT]), {"cell_type": "markdown", "source": "# Title"})
+    updated = history.commit(Notebook.from_dict({"cells": [saved("print(1 + 2)"), saved("# Title", "markdown")]}))
+
+    assert [a is b for a, b in zip(updated.cells, opened.cells)] == [True, True]
+    assert updated[0].outputs == [OUTPUT]
+    assert updated[0].execution_count == 1
+
+
+def test_saved_cell_with_new_source_has_no_outputs():
+    history = NotebookHistory()
+    open_notebook(history, code("print(1 + 2)", 1, [OUTPUT]))
+    updated = history.commit(Notebook.from_dict({"cells": [saved("print(1 + 3)")]}))
+    assert updated[0].outputs == []
+
+
+def test_reexecuted_cell_is_not_shared():
+    history = NotebookHistory()
+    opened = open_notebook(history, code("print(1 + 2)", 1, [OUTPUT]))
+    rerun = {**OUTPUT, "text": "3\n3\n"}
+    updated = history.commit(Notebook.from_dict({"cells": [code("print(1 + 2)", 2, [rerun])]}))
+    assert updated[0] is not opened[0]
+    assert updated[0].outputs == [rerun]
+
+
+def test_duplicate_cells_do_not_share_one_object():
+    history = NotebookHistory()
+    opened = open_notebook(history, code("x = 1"), code("x = 1"))
+    updated = history.commit(Notebook.from_dict({"cells": [saved("x = 1"), saved("x = 1"), saved("x = 1")]}))
+    assert updated[0] is opened[0] and updated[1] is opened[1]
+    assert updated[2] is not opened[0] and updated[2] is not opened[1]
+
+
+def test_line_count_ignores_trailing_newline():
+    assert Cell("code", "").line_count == 0
+    assert Cell("code", "a = 1").line_count == 1
+    assert Cell("code", "a = 1\nb = 2\n").line_count == 2
+    assert Cell("code", "a = 1\n\nb = 2").line_count == 3
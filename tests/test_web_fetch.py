@@ -0,0 +1,104 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("playwright")
+
+from src.agents import web_scraper  # noqa: E402
+
+ARTICLE = "<html><head><title>Guide</title></head><body><article>{}</article></body></html>".format(
+    "".join(f"<p>Paragraph {i} explains how to load and clean the data before training.</p>" for i in range(20))
+)
+SPA = ('<html><head><script src="/bundle.js"></script></head>'
+       '<body><div id="root"></div><noscript>Enable JavaScript</noscript></body></html>')
+
+PAGES = {
+    "/article": ("text/html; charset=utf-8", ARTICLE),
+    "/spa": ("text/html", SPA),
+    "/data.json": ("application/json", '{"rows": 3}'),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in PAGES:
+            self.send_error(404)
+            return
+        content_type, body = PAGES[self.path]
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def run(coroutine):
+    async def with_client():
+        try:
+            return await coroutine
+        finally:
+            await web_scraper.close_http_client()
+    return asyncio.run(with_client())
+
+
+@pytest.fixture
+def browser_calls(monkeypatch):
+    """Replace the browser tier with a stub that records the URLs it is asked for."""
+    calls = []
+
+    async def fetch_page_browser(url):
+        calls.append(url)
+        return "<html><body><p>Rendered by the browser</p></body></html>"
+
+    monkeypatch.setattr(web_scraper, "fetch_page_browser", fetch_page_browser)
+    return calls
+
+
+def test_needs_javascript():
+    assert web_scraper.needs_javascript(ARTICLE) is None
+    assert web_scraper.needs_javascript(SPA) == "little static text"
+    assert web_scraper.needs_javascript("  ") == "empty body"
+    shell_with_text = SPA.replace("<noscript>", "<p>" + "Loading the dashboard, please wait. " * 8 + "</p><noscript>")
+    assert web_scraper.needs_javascript(shell_with_text) == "single-page app marker"
+
+
+def test_static_page_is_served_over_http(server, browser_calls):
+    fetched = run(web_scraper.fetch_page(f"{server}/article"))
+    assert "Paragraph 19" in fetched.html
+    assert browser_calls == []
+
+
+def test_spa_falls_back_to_the_browser(server, browser_calls):
+    assert run(web_scraper.fetch_page_http(f"{server}/spa")) is None
+    fetched = run(web_scraper.fetch_page(f"{server}/spa"))
+    assert "Rendered by the browser" in fetched.html
+    assert browser_calls == [f"{server}/spa"]
+
+
+def test_json_is_wrapped_as_text(server, browser_calls):
+    fetched = run(web_scraper.fetch_page_http(f"{server}/data.json"))
+    assert "{&quot;rows&quot;: 3}" in fetched.html
+    assert browser_calls == []
+
+
+def test_http_errors_fall_back_to_the_browser(server, browser_calls):
+    assert run(web_scraper.fetch_page_http(f"{server}/missing")) is None
+    run(web_scraper.fetch_page(f"{server}/missing"))
+    assert browser_calls == [f"{server}/missing"]